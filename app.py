@@ -5,27 +5,179 @@ This module provides the application factory pattern for creating Flask app inst
 Routes are organized in separate blueprint modules in the routes package.
 """
 
+from typing import Optional
+
 from flask import Flask
+from jinja2 import FileSystemBytecodeCache
+import database
 from database import init_database, add_sample_data
 from routes import register_blueprints
+from routes.serialization import GZIP_MIN_BYTES
+from services.fuzzy_index import build_fuzzy_index
+from services.isbn_index import build_isbn_index
+from services.search_index import build_search_index
+from services.suggest_index import build_suggest_index
+from services.archive_service import LoanArchiver, ARCHIVE_HORIZON_DAYS
+from services.replica_service import ReplicaRefresher, REPLICA_REFRESH_INTERVAL
+from services.related_books import build_related_books, RelatedBooksRefresher, RELATED_BOOKS_REFRESH_INTERVAL
+from services.analytics import RollupAggregator, ROLLUP_INTERVAL
+from services.event_service import ShardEventRelay, SHARD_RELAY_INTERVAL
+from services.availability_cache import open_availability_cache, AvailabilityResyncer, AVAILABILITY_RESYNC_INTERVAL
+from services.catalog_snapshot import (
+    open_catalog_snapshot, CatalogSnapshotRefresher, CATALOG_SNAPSHOT_REFRESH_INTERVAL
+)
+from services.profiling import init_request_profiling
+from services import query_tracer
+from services.query_tracer import init_query_tracing
+from services.library_service import borrow_books_batch, return_books_batch
+from services import admission
+from services.admission import init_admission_control
+from services.write_coalescer import (
+    WriteCoalescer, install_write_coalescer, WRITE_BATCH_MAX_SIZE, WRITE_BATCH_MAX_DELAY
+)
 
 
-def create_app():
+def create_app(config: Optional[dict] = None):
     """
     Application factory function to create and configure Flask app.
     
+    Args:
+        config: Optional settings applied over the defaults below
+    
     Returns:
         Flask: Configured Flask application instance
     """
     app = Flask(__name__)
     app.secret_key = "super secret key"
     
+    # Loan shard files; borrow records and patron accounts are split across them by patron ID
+    app.config['SHARD_DATABASES'] = database.SHARD_DATABASES
+    # Seconds between moves of the shards' loan events into the shared event feed
+    app.config['SHARD_RELAY_INTERVAL'] = SHARD_RELAY_INTERVAL
+    # Binary books snapshot shared by worker processes through mmap and used to build the search indexes;
+    # None loads the catalog from the database in every worker instead
+    app.config['CATALOG_SNAPSHOT'] = None
+    app.config['CATALOG_SNAPSHOT_REFRESH_INTERVAL'] = CATALOG_SNAPSHOT_REFRESH_INTERVAL
+    # File holding every book's available copies, mapped by all worker processes (e.g. under /dev/shm) for
+    # catalog pages and borrow pre-checks; None reads availability from the database. Resynced on start
+    # and every AVAILABILITY_RESYNC_INTERVAL seconds
+    app.config['AVAILABILITY_CACHE'] = None
+    app.config['AVAILABILITY_RESYNC_INTERVAL'] = AVAILABILITY_RESYNC_INTERVAL
+    # Seconds between loan archiving runs; None disables the background archiver
+    app.config['LOAN_ARCHIVE_INTERVAL'] = None
+    app.config['LOAN_ARCHIVE_HORIZON_DAYS'] = ARCHIVE_HORIZON_DAYS
+    # Read-only snapshot file for report queries; None sends reports to the main database
+    app.config['REPLICA_DATABASE'] = database.REPLICA_DATABASE
+    app.config['REPLICA_REFRESH_INTERVAL'] = REPLICA_REFRESH_INTERVAL
+    app.config['REPLICA_MAX_STALENESS'] = database.REPLICA_MAX_STALENESS
+    # Seconds between circulation rollup updates; the stats endpoints only read the rollups, so with None
+    # they stay as they are until something calls update_rollups()
+    app.config['STATS_ROLLUP_INTERVAL'] = ROLLUP_INTERVAL
+    # Seconds between rebuilds of the "patrons also borrowed" table from the loan history. New loans are added
+    # to it as they happen, but a book cut from another's top neighbours only re-enters them at a rebuild;
+    # None builds it once at startup
+    app.config['RELATED_BOOKS_REFRESH_INTERVAL'] = RELATED_BOOKS_REFRESH_INTERVAL
+    # Shared secret for per-request profiles and /admin/profiling; None disables profiling entirely
+    app.config['PROFILING_TOKEN'] = None
+    # Trace each request's SQL and flag N+1 patterns; a slow-query threshold in milliseconds (None: no log)
+    app.config['SQL_TRACE_REQUESTS'] = False
+    app.config['SQL_REPEAT_THRESHOLD'] = query_tracer.REPEAT_THRESHOLD
+    app.config['SQL_SLOW_QUERY_MS'] = None
+    # Send borrows and returns through one writer thread that commits them in batches (group commit)
+    app.config['WRITE_COALESCING'] = False
+    app.config['WRITE_BATCH_MAX_SIZE'] = WRITE_BATCH_MAX_SIZE
+    app.config['WRITE_BATCH_MAX_DELAY'] = WRITE_BATCH_MAX_DELAY
+    # Per-blueprint concurrency limits with bounded wait queues; excess requests get 429/503 with Retry-After
+    app.config['ADMISSION_CONTROL'] = False
+    app.config['ADMISSION_READ_CONCURRENCY'] = admission.READ_CONCURRENCY
+    app.config['ADMISSION_WRITE_CONCURRENCY'] = admission.WRITE_CONCURRENCY
+    app.config['ADMISSION_QUEUE_SIZE'] = admission.QUEUE_SIZE
+    app.config['ADMISSION_QUEUE_TIMEOUT'] = admission.QUEUE_TIMEOUT
+    app.config['ADMISSION_LIMITS'] = {}
+    # Blueprints and endpoints that bypass admission control, so monitoring still answers under load
+    app.config['ADMISSION_EXEMPT'] = ('admin', 'static', 'api.metrics_api')
+    # /api responses at least this many bytes are gzipped for clients that accept it; None never compresses
+    app.config['API_GZIP_MIN_BYTES'] = GZIP_MIN_BYTES
+    # Compiled templates are cached as bytecode here so new worker processes skip compiling them;
+    # None uses Jinja's per-user temporary directory, False turns the cache off
+    app.config['TEMPLATE_BYTECODE_CACHE_DIR'] = None
+    if config:
+        app.config.update(config)
+    
+    # Must be set before the first template is loaded, which creates app.jinja_env
+    if app.config['TEMPLATE_BYTECODE_CACHE_DIR'] is not False:
+        app.jinja_options = {**app.jinja_options,
+                             'bytecode_cache': FileSystemBytecodeCache(app.config['TEMPLATE_BYTECODE_CACHE_DIR'])}
+    
+    if app.config['SHARD_DATABASES']:
+        database.SHARD_DATABASES = list(app.config['SHARD_DATABASES'])
+    
     # Initialize the database
     init_database()
     
     # Add sample data for testing and demonstration
     add_sample_data()
     
+    # Build the in-memory title/author search, ISBN, autocomplete and fuzzy indexes
+    books = None
+    if app.config['CATALOG_SNAPSHOT']:
+        books = list(open_catalog_snapshot(app.config['CATALOG_SNAPSHOT']))
+        app.extensions['catalog_snapshot_refresher'] = CatalogSnapshotRefresher(
+            app.config['CATALOG_SNAPSHOT_REFRESH_INTERVAL'])
+        app.extensions['catalog_snapshot_refresher'].start()
+    build_search_index(books)
+    build_isbn_index(books)
+    build_suggest_index(books)
+    build_fuzzy_index(books)
+    
+    if app.config['AVAILABILITY_CACHE']:
+        open_availability_cache(app.config['AVAILABILITY_CACHE'])
+        if app.config['AVAILABILITY_RESYNC_INTERVAL']:
+            app.extensions['availability_resyncer'] = AvailabilityResyncer(app.config['AVAILABILITY_RESYNC_INTERVAL'])
+            app.extensions['availability_resyncer'].start()
+    
+    if app.config['LOAN_ARCHIVE_INTERVAL']:
+        app.extensions['loan_archiver'] = LoanArchiver(app.config['LOAN_ARCHIVE_INTERVAL'],
+                                                       app.config['LOAN_ARCHIVE_HORIZON_DAYS'])
+        app.extensions['loan_archiver'].start()
+    
+    if app.config['REPLICA_DATABASE']:
+        database.REPLICA_DATABASE = app.config['REPLICA_DATABASE']
+        database.REPLICA_MAX_STALENESS = app.config['REPLICA_MAX_STALENESS']
+        app.extensions['replica_refresher'] = ReplicaRefresher(app.config['REPLICA_REFRESH_INTERVAL'])
+        app.extensions['replica_refresher'].start()
+    
+    if database.SHARD_DATABASES:
+        app.extensions['shard_event_relay'] = ShardEventRelay(app.config['SHARD_RELAY_INTERVAL'])
+        app.extensions['shard_event_relay'].start()
+    
+    if app.config['STATS_ROLLUP_INTERVAL']:
+        app.extensions['rollup_aggregator'] = RollupAggregator(app.config['STATS_ROLLUP_INTERVAL'])
+        app.extensions['rollup_aggregator'].start()
+    
+    build_related_books()
+    if app.config['RELATED_BOOKS_REFRESH_INTERVAL']:
+        app.extensions['related_books_refresher'] = RelatedBooksRefresher(app.config['RELATED_BOOKS_REFRESH_INTERVAL'])
+        app.extensions['related_books_refresher'].start()
+    
+    if app.config['WRITE_COALESCING']:
+        app.extensions['write_coalescer'] = WriteCoalescer(
+            {'borrow': borrow_books_batch, 'return': return_books_batch},
+            app.config['WRITE_BATCH_MAX_SIZE'], app.config['WRITE_BATCH_MAX_DELAY'])
+        install_write_coalescer(app.extensions['write_coalescer'])
+    
+    # Registered first so shed requests skip the other request hooks
+    if app.config['ADMISSION_CONTROL']:
+        app.extensions['admission'] = init_admission_control(app)
+    
+    if app.config['PROFILING_TOKEN']:
+        init_request_profiling(app)
+    
+    if app.config['SQL_TRACE_REQUESTS']:
+        init_query_tracing(app)
+    if app.config['SQL_SLOW_QUERY_MS'] is not None:
+        query_tracer.SLOW_QUERY_MS = app.config['SQL_SLOW_QUERY_MS']
+    
     # Register all route blueprints
     register_blueprints(app)
     
@@ -0,0 +1,136 @@
+"""
+ASGI entry point for the Library Management System.
+
+The JSON API is served natively by routes/async_api.py; every other request
+(the HTML blueprints, /admin and the remaining /api endpoints) goes to the
+Flask app through a WSGI bridge. Run it under any ASGI server, e.g.:
+
+    uvicorn --factory asgi:create_asgi_app
+"""
+
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from app import create_app
+from routes.async_api import AsyncApi, read_body
+from services.async_executor import shutdown_db_executor
+
+# Threads running requests for the Flask app; each holds one for its whole request, as a threaded server would
+WSGI_THREADS = 32
+
+
+class WsgiBridge:
+    """
+    ASGI application that runs a WSGI application on a thread pool. Each request
+    runs start to finish on one thread, so Flask's context locals and streamed
+    responses behave as under a threaded server; body chunks are sent as the
+    app yields them.
+    """
+
+    def __init__(self, wsgi_app, threads: int = WSGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        environ = _environ(scope, await read_body(receive))
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._run, environ, send, loop)
+
+    def _run(self, environ, send, loop) -> None:
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['start'] = {'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+                                 'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                             for name, value in headers]}
+
+        def send_now(message):
+            # Waiting for each send keeps the app from running ahead of a slow client
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        chunks = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in chunks:
+                if chunk:
+                    if 'start' in response:
+                        send_now(response.pop('start'))
+                    send_now({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if 'start' in response:
+                send_now(response.pop('start'))
+            send_now({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+def _environ(scope, body: bytes) -> dict:
+    """WSGI environ for an ASGI http scope."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('127.0.0.1', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope['headers']:
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class LibraryAsgiApp:
+    """The ASGI application: lifespan handling in front of AsyncApi and the WSGI bridge."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.bridge = WsgiBridge(flask_app)
+        self.api = AsyncApi(flask_app, self.bridge)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        return await self.api(scope, receive, send)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self.close)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def close(self) -> None:
+        self.bridge.close()
+        shutdown_db_executor()
+
+
+def create_asgi_app(config: Optional[dict] = None) -> LibraryAsgiApp:
+    """Create the Flask app with config (see app.create_app) and wrap it for ASGI servers."""
+    return LibraryAsgiApp(create_app(config))
@@ -0,0 +1,98 @@
+"""
+Benchmark: /catalog latency during a write storm, with and without admission control
+
+Models a server with WORKERS worker threads pulling requests from one
+accept queue. Clients send a mix of /catalog reads and borrow POSTs whose
+handler stalls for STALL seconds (like PaymentGateway.process_payment
+does), arriving faster than the writes can finish. Reports read latency
+percentiles (from arrival to response), reads completed, and the write
+status codes. Run from the repository root:
+
+    python benchmarks/bench_admission.py
+"""
+
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from app import create_app
+from routes import borrowing_routes
+
+WORKERS = 16
+STALL = 0.5
+DURATION = 5.0
+WRITES_PER_SECOND = 80
+READS_PER_SECOND = 100
+
+
+def stalled_borrow(patron_id, book_id):
+    time.sleep(STALL)
+    return True, "Borrowed"
+
+
+def percentile(samples, pct):
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else float('nan')
+
+
+def run(label, config):
+    app = create_app(config)
+    accept_queue = queue.Queue()
+    read_latencies = []
+    write_statuses = Counter()
+
+    def worker():
+        client = app.test_client()
+        while True:
+            item = accept_queue.get()
+            if item is None:
+                return
+            kind, arrived = item
+            if kind == 'read':
+                client.get('/catalog').close()
+                read_latencies.append(time.perf_counter() - arrived)
+            else:
+                write_statuses[client.post('/borrow', data={'patron_id': '123456', 'book_id': '1'}).status_code] += 1
+
+    workers = [threading.Thread(target=worker) for _ in range(WORKERS)]
+    for thread in workers:
+        thread.start()
+
+    start = time.perf_counter()
+    sent = Counter()
+    while time.perf_counter() - start < DURATION:
+        elapsed = time.perf_counter() - start
+        while sent['write'] < elapsed * WRITES_PER_SECOND:
+            accept_queue.put(('write', time.perf_counter()))
+            sent['write'] += 1
+        while sent['read'] < elapsed * READS_PER_SECOND:
+            accept_queue.put(('read', time.perf_counter()))
+            sent['read'] += 1
+        time.sleep(0.002)
+    for _ in workers:
+        accept_queue.put(None)
+    for thread in workers:
+        thread.join()
+
+    samples = sorted(read_latencies)
+    print(f"  {label:<20} reads p50 {percentile(samples, 50) * 1000:7.0f} ms  "
+          f"p99 {percentile(samples, 99) * 1000:7.0f} ms   writes {dict(sorted(write_statuses.items()))}")
+
+
+def main():
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    borrowing_routes.borrow_book_by_patron = stalled_borrow
+    print(f"{WORKERS} workers, {WRITES_PER_SECOND} stalled writes/s + {READS_PER_SECOND} reads/s for {DURATION:.0f} s")
+    run("no admission control", {})
+    run("admission control", {'ADMISSION_CONTROL': True, 'ADMISSION_WRITE_CONCURRENCY': 4,
+                              'ADMISSION_QUEUE_SIZE': 4, 'ADMISSION_QUEUE_TIMEOUT': 0.25})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: open-loan query time and live file size as loan history grows
+
+Fills borrow_records with increasing amounts of closed history plus a fixed
+set of open loans, times the hot open-loan queries, then archives the
+closed history into an attached file and times them again. Run from the
+repository root:
+
+    python benchmarks/bench_archive.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import (
+    init_database, get_db_connection, get_patron_borrow_count, get_patron_borrowed_books, to_epoch_seconds
+)
+from services.archive_service import archive_old_loans
+
+HISTORY_SIZES = [10_000, 100_000, 1_000_000]
+OPEN_LOANS = 2_000
+BOOKS = 1_000
+REPEAT = 200
+
+
+def populate(history, rng):
+    now = datetime.now()
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+                     [(f"Book {i}", "Author", str(9780000000000 + i), 10, 10) for i in range(BOOKS)])
+    closed = []
+    for _ in range(history):
+        dates = [now - timedelta(days=rng.randint(400, 3000))]
+        dates += [dates[0] + timedelta(days=14), dates[0] + timedelta(days=10)]
+        closed.append((f"{rng.randint(100000, 199999)}", rng.randint(1, BOOKS),
+                       *(d.isoformat() for d in dates), *(to_epoch_seconds(d) for d in dates)))
+    conn.executemany('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date, '
+                     'borrow_epoch, due_epoch, return_epoch) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', closed)
+    due = now + timedelta(days=14)
+    conn.executemany('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, borrow_epoch, due_epoch) '
+                     'VALUES (?, ?, ?, ?, ?, ?)',
+                     [(f"{100000 + i % 400}", rng.randint(1, BOOKS), now.isoformat(), due.isoformat(),
+                       to_epoch_seconds(now), to_epoch_seconds(due)) for i in range(OPEN_LOANS)])
+    conn.commit()
+    conn.close()
+
+
+def time_queries():
+    def overdue_scan():
+        conn = get_db_connection()
+        conn.execute('SELECT * FROM borrow_records WHERE return_date IS NULL AND due_epoch < ?',
+                     (to_epoch_seconds(datetime.now()),)).fetchall()
+        conn.close()
+
+    results = []
+    for fn in (lambda: get_patron_borrow_count("100007"), lambda: get_patron_borrowed_books("100007"), overdue_scan):
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            fn()
+        results.append((time.perf_counter() - start) / REPEAT * 1000)
+    return results
+
+
+def main():
+    rng = random.Random(327)
+    print(f"{'history':>9} {'phase':>8} {'live MiB':>9} {'count ms':>9} {'borrowed ms':>12} {'open scan ms':>13}")
+    for history in HISTORY_SIZES:
+        workdir = tempfile.mkdtemp()
+        database.DATABASE = os.path.join(workdir, 'library.db')
+        database.ARCHIVE_DATABASE = os.path.join(workdir, 'archive.db')
+        init_database()
+        populate(history, rng)
+
+        for phase in ('before', 'after'):
+            if phase == 'after':
+                archive_old_loans(horizon_days=365, batch_size=10_000)
+                conn = get_db_connection()
+                conn.execute('VACUUM')
+                conn.close()
+            size = os.path.getsize(database.DATABASE) / 2**20
+            count_ms, borrowed_ms, scan_ms = time_queries()
+            print(f"{history:>9,} {phase:>8} {size:>9.1f} {count_ms:>9.3f} {borrowed_ms:>12.3f} {scan_ms:>13.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark: concurrent connection capacity, threaded WSGI server vs. the ASGI app
+
+Opens CLIENTS concurrent long-poll requests (/api/events?timeout=POLL_TIMEOUT,
+each one blocked waiting for a change, as a slow SQLite call or payment
+gateway would block it), then times /api/search probes sent while they wait.
+The threaded server runs the Flask app on a fixed pool of WORKERS threads
+(like gunicorn's gthread worker); the ASGI app runs under uvicorn with the
+same number of WSGI bridge threads. Reports how many polls finished within
+POLL_TIMEOUT + 1 seconds and the slowest probe. Needs uvicorn installed.
+Run from the repository root:
+
+    python benchmarks/bench_asgi.py
+"""
+
+import http.client
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+WORKERS = 32
+CLIENT_COUNTS = (32, 128, 512)
+POLL_TIMEOUT = 2.0
+PROBES = 10
+PORT = 8791
+
+
+def serve_threaded(db_path, port):
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+    from app import create_app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args):
+            pass
+
+    class PooledWSGIServer(BaseWSGIServer):
+        request_queue_size = 2048
+        pool = ThreadPoolExecutor(WORKERS)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    database.DATABASE = db_path
+    PooledWSGIServer('127.0.0.1', port, create_app(), handler=QuietHandler).serve_forever()
+
+
+def serve_asgi(db_path, port):
+    import asgi
+    import uvicorn
+
+    database.DATABASE = db_path
+    asgi.WSGI_THREADS = WORKERS
+    uvicorn.run(asgi.create_asgi_app(), host='127.0.0.1', port=port, log_level='error', backlog=2048)
+
+
+def wait_for_port(port):
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def get(port, path, timeout=60):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def measure(port, clients):
+    cursor = 10 ** 9
+    started = time.monotonic()
+    finish_times = []
+
+    def poll():
+        try:
+            if get(port, f'/api/events?since={cursor}&timeout={POLL_TIMEOUT}') == 200:
+                finish_times.append(time.monotonic() - started)
+        except OSError:
+            pass
+
+    with ThreadPoolExecutor(clients) as pool:
+        for _ in range(clients):
+            pool.submit(poll)
+        time.sleep(0.3)
+        probe_ms = []
+        for _ in range(PROBES):
+            probe_start = time.perf_counter()
+            get(port, '/api/search?q=gatsby')
+            probe_ms.append((time.perf_counter() - probe_start) * 1000)
+    on_time = sum(1 for elapsed in finish_times if elapsed <= POLL_TIMEOUT + 1)
+    return on_time, max(probe_ms), max(finish_times, default=float('nan'))
+
+
+def main():
+    print(f"{WORKERS} server threads, long polls of {POLL_TIMEOUT}s, /api/search probes while they wait\n")
+    print(f"{'server':<10}{'clients':>9}{'polls on time':>15}{'probe max ms':>14}{'last poll s':>13}")
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'library.db')
+        for label, target in (('threaded', serve_threaded), ('asgi', serve_asgi)):
+            for clients in CLIENT_COUNTS:
+                server = multiprocessing.Process(target=target, args=(db_path, PORT), daemon=True)
+                server.start()
+                try:
+                    wait_for_port(PORT)
+                    on_time, probe_ms, last = measure(PORT, clients)
+                finally:
+                    server.terminate()
+                    server.join()
+                print(f"{label:<10}{clients:>9}{on_time:>9}/{clients:<5}{probe_ms:>14.1f}{last:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
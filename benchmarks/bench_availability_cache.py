@@ -0,0 +1,116 @@
+"""
+Benchmark: availability reads across worker processes, SQLite vs. the shared availability table
+
+Starts WORKERS fresh processes over a catalog of BOOKS books, all mapping one
+availability table (and the catalog snapshot). Each worker times LOOKUPS
+random availability reads with get_book_by_id (its pooled SQLite connection)
+and with the shared table, and one full catalog pass from iter_all_books and
+from the snapshot plus the table, as the catalog page reads them. Meanwhile
+every worker applies UPDATES random +1/-1 availability changes, so the
+workers contend on the table's file lock; once all are done the table is
+compared with the books table, slot by slot. Run from the repository root:
+
+    python benchmarks/bench_availability_cache.py
+"""
+
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database, get_db_connection, get_all_availability
+from services.availability_cache import HEADER, SLOT_SIZE
+
+BOOKS = 100_000
+WORKERS = 4
+LOOKUPS = 50_000
+UPDATES = 2_000
+
+
+def populate():
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+                     [(f"Book Title Number {i}", f"Author {i % 5000}", str(9780000000000 + i), 1000, 500)
+                      for i in range(BOOKS)])
+    conn.commit()
+    conn.close()
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def worker(db_path, snapshot_path, cache_path, barrier, results):
+    database.DATABASE = db_path
+    from database import get_book_by_id, iter_all_books, update_book_availability
+    from services.availability_cache import open_availability_cache
+    from services.catalog_snapshot import open_catalog_snapshot
+    from services.library_service import iter_catalog_books
+
+    open_catalog_snapshot(snapshot_path)
+    cache = open_availability_cache(cache_path)
+    rng = random.Random(os.getpid())
+    book_ids = [rng.randint(1, BOOKS) for _ in range(LOOKUPS)]
+    barrier.wait()
+
+    sqlite_reads = timed(lambda: [get_book_by_id(book_id)['available_copies'] for book_id in book_ids])
+    shared_reads = timed(lambda: [cache.get(book_id) for book_id in book_ids])
+    sqlite_catalog = timed(lambda: sum(book['available_copies'] for book in iter_all_books()))
+    shared_catalog = timed(lambda: sum(book['available_copies'] for book in iter_catalog_books()))
+    updates = timed(lambda: [update_book_availability(rng.randint(1, BOOKS), rng.choice((-1, 1)))
+                             for _ in range(UPDATES)])
+    barrier.wait()
+    results.put((sqlite_reads, shared_reads, sqlite_catalog, shared_catalog, updates))
+
+
+def main():
+    from services.catalog_snapshot import write_catalog_snapshot
+
+    workdir = tempfile.mkdtemp()
+    database.DATABASE = os.path.join(workdir, 'library.db')
+    init_database()
+    populate()
+    snapshot_path = os.path.join(workdir, 'catalog.snap')
+    cache_path = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else workdir, f'availability-{os.getpid()}')
+    write_catalog_snapshot(snapshot_path)
+
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(WORKERS)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(database.DATABASE, snapshot_path, cache_path, barrier, results))
+                 for _ in range(WORKERS)]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    sqlite_reads, shared_reads, sqlite_catalog, shared_catalog, updates = (statistics.median(column)
+                                                                           for column in zip(*rows))
+
+    print(f"{BOOKS:,} books, {WORKERS} workers, medians per worker\n")
+    print(f"{'read':<28}{'SQLite':>10}{'shared':>10}")
+    print(f"{f'{LOOKUPS // 1000}k availability reads, ms':<28}{sqlite_reads * 1000:>10.1f}{shared_reads * 1000:>10.1f}")
+    print(f"{'catalog pass, ms':<28}{sqlite_catalog * 1000:>10.1f}{shared_catalog * 1000:>10.1f}")
+    print(f"\n{UPDATES:,} updates per worker, each committed and copied to the table: "
+          f"{updates / UPDATES * 1e6:.0f} us per update")
+
+    # Read the file itself: opening it as an AvailabilityCache would resync it first
+    with open(cache_path, 'rb') as f:
+        slots = HEADER.unpack(f.read(HEADER.size))[2]
+        table = array('i', f.read(slots * SLOT_SIZE))
+    os.unlink(cache_path)
+    mismatches = sum(1 for book_id, available in get_all_availability() if table[book_id] != available)
+    print(f"after {WORKERS * UPDATES:,} concurrent updates: {mismatches} slots differ from the books table")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: batch borrow/return vs. the per-item service loop
+
+Borrows and then returns the same burst of loans twice on a fresh
+database: once by calling borrow_book_by_patron/return_book_by_patron per
+item and once through borrow_books_batch/return_books_batch. Run from the
+repository root:
+
+    python benchmarks/bench_batch_returns.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database, insert_book
+from services.library_service import (
+    borrow_book_by_patron,
+    return_book_by_patron,
+    borrow_books_batch,
+    return_books_batch
+)
+
+BURST = 500
+
+
+def fresh_database():
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    init_database()
+    for i in range(BURST):
+        insert_book(f"Book {i}", "Author", f"{9780000000000 + i}", 1, 1)
+    return [(f"{100000 + i // 5}", i + 1) for i in range(BURST)]
+
+
+def timed(fn, items):
+    start = time.perf_counter()
+    fn(items)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{BURST} loans per burst")
+    items = fresh_database()
+    loop_borrow = timed(lambda xs: [borrow_book_by_patron(p, b) for p, b in xs], items)
+    loop_return = timed(lambda xs: [return_book_by_patron(p, b) for p, b in xs], items)
+
+    items = fresh_database()
+    batch_borrow = timed(borrow_books_batch, items)
+    batch_return = timed(return_books_batch, items)
+
+    print(f"{'':8} {'per-item s':>11} {'batch s':>9} {'speedup':>8}")
+    for label, loop, batch in (('borrow', loop_borrow, batch_borrow), ('return', loop_return, batch_return)):
+        print(f"{label:8} {loop:>11.3f} {batch:>9.3f} {loop / batch:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
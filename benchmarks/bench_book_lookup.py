@@ -0,0 +1,72 @@
+"""
+Benchmark: resolving 1,000 book IDs with the per-id loop vs the multi-get
+
+Times get_book_by_id called once per ID (fresh connections, as before the
+query layer, and pooled) against lookup_books_by_ids and the
+/api/books/lookup endpoint, over a catalog of BOOKS books with a tenth of
+the requested IDs missing. Run from the repository root:
+
+    python benchmarks/bench_book_lookup.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from app import create_app
+from database import init_database, get_db_connection, get_book_by_id
+from services.library_service import lookup_books_by_ids
+
+BOOKS = 100_000
+IDS = 1_000
+REPEAT = 20
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    print(f"  {label:<34} {(time.perf_counter() - start) / REPEAT * 1000:10.2f} ms")
+
+
+def populate():
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+                     [(f"Book {i}", f"Author {i % 1000}", str(9780000000000 + i), 3, 3) for i in range(BOOKS)])
+    conn.commit()
+    conn.close()
+
+
+def per_id_fresh_connections(ids):
+    books = []
+    for book_id in ids:
+        conn = get_db_connection()
+        book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+        conn.close()
+        books.append(dict(book) if book else None)
+    return books
+
+
+def main():
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    init_database()
+    populate()
+    rng = random.Random(7)
+    ids = rng.sample(range(1, BOOKS + 1), IDS * 9 // 10) + list(range(BOOKS + 1, BOOKS + 1 + IDS // 10))
+    rng.shuffle(ids)
+    client = create_app().test_client()
+
+    print(f"resolve {IDS:,} IDs ({IDS // 10} missing) from {BOOKS:,} books")
+    timed("per-id loop, connection each", lambda: per_id_fresh_connections(ids))
+    timed("per-id loop, pooled connection", lambda: [get_book_by_id(book_id) for book_id in ids])
+    timed("lookup_books_by_ids", lambda: lookup_books_by_ids(ids))
+    timed("POST /api/books/lookup", lambda: client.post('/api/books/lookup', json={'ids': ids}))
+
+
+if __name__ == '__main__':
+    main()
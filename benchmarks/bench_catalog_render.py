@@ -0,0 +1,92 @@
+"""
+Benchmark: catalog page time to first byte and peak memory, buffered vs streamed
+
+Fills the catalog with BOOKS books (100k by default) and serves /catalog
+through the WSGI interface twice: once rendered in full with
+render_template from get_all_books (as before), once streamed by the
+current route. Reports time to first body chunk, total time and peak
+traced memory for each, plus template load time with and without the
+bytecode cache. Run from the repository root:
+
+    python benchmarks/bench_catalog_render.py [BOOKS]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template
+from jinja2 import FileSystemBytecodeCache
+
+import database
+from app import create_app
+from database import init_database, get_db_connection, get_all_books
+
+BOOKS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+
+def populate():
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+                     [(f"Book {i:06d}", f"Author {i % 1000}", str(9780000000000 + i), 3, i % 4) for i in range(BOOKS)])
+    conn.commit()
+    conn.close()
+
+
+def measure(label, app, path):
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'SERVER_NAME': 'localhost', 'SERVER_PORT': '80',
+               'wsgi.url_scheme': 'http', 'wsgi.input': sys.stdin.buffer, 'wsgi.errors': sys.stderr}
+    tracemalloc.start()
+    start = time.perf_counter()
+    body = app.wsgi_app(environ, lambda status, headers: None)
+    first_byte = None
+    size = 0
+    for chunk in body:
+        if first_byte is None and chunk:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    if hasattr(body, 'close'):
+        body.close()
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  {label:<22} TTFB {first_byte * 1000:8.1f} ms   total {total * 1000:8.1f} ms   "
+          f"peak {peak / 2 ** 20:7.1f} MiB   body {size / 2 ** 20:5.1f} MiB")
+
+
+def template_load(cache_dir):
+    app = create_app({'TEMPLATE_BYTECODE_CACHE_DIR': cache_dir})
+    start = time.perf_counter()
+    for name in ('catalog.html', 'search.html', 'add_book.html', 'return_book.html', 'base.html'):
+        app.jinja_env.get_template(name)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    init_database()
+    populate()
+    app = create_app()
+
+    @app.route('/catalog-buffered')
+    def buffered_catalog():
+        return render_template('catalog.html', books=get_all_books())
+
+    print(f"/catalog with {BOOKS:,} books")
+    measure("render_template", app, '/catalog-buffered')
+    measure("streamed", app, '/catalog')
+
+    cache_dir = tempfile.mkdtemp()
+    FileSystemBytecodeCache(cache_dir).clear()
+    print("loading the five templates in a new app")
+    print(f"  {'no bytecode cache':<22} {template_load(False):8.1f} ms")
+    template_load(cache_dir)
+    print(f"  {'warm bytecode cache':<22} {template_load(cache_dir):8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
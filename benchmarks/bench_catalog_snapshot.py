@@ -0,0 +1,124 @@
+"""
+Benchmark: worker warm start and memory, catalog loaded per worker vs. the mmap snapshot
+
+Starts WORKERS fresh processes at once over a catalog of BOOKS books. Each
+gets an in-memory view of the catalog, either by loading get_all_books()
+into a dict by ID (as the app's index builds do) or by mapping the catalog
+snapshot, then answers LOOKUPS random by-ID lookups and a full title scan
+(the "none" row is a worker with no catalog, for the interpreter baseline).
+Reports the median time to a ready view and the per-worker RSS, PSS
+(shared pages split between the processes mapping them) and private memory,
+read from /proc while every worker is still alive, so Linux only. Run from
+the repository root:
+
+    python benchmarks/bench_catalog_snapshot.py
+"""
+
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database, get_db_connection
+
+BOOKS = 100_000
+WORKERS = 8
+LOOKUPS = 20_000
+
+
+def populate():
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+                     [(f"Book Title Number {i}", f"Author {i % 5000}", str(9780000000000 + i), 3, 3)
+                      for i in range(BOOKS)])
+    conn.commit()
+    conn.close()
+
+
+def memory_kib():
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return fields['Rss'], fields['Pss'], fields['Private_Clean'] + fields['Private_Dirty']
+
+
+def worker(mode, db_path, snapshot_path, barrier, results):
+    database.DATABASE = db_path
+    started = time.perf_counter()
+    if mode == 'none':
+        lookup = scan = lambda *args: None
+    elif mode == 'snapshot':
+        from services.catalog_snapshot import CatalogSnapshot
+        view = CatalogSnapshot(snapshot_path)
+        lookup = view.get
+        scan = lambda: sum(len(book['title']) for book in view)
+    else:
+        from database import get_all_books
+        view = {book['id']: book for book in get_all_books()}
+        lookup = view.get
+        scan = lambda: sum(len(book['title']) for book in view.values())
+    ready = time.perf_counter() - started
+    barrier.wait()
+
+    rng = random.Random(os.getpid())
+    lookup_start = time.perf_counter()
+    for _ in range(LOOKUPS):
+        lookup(rng.randint(1, BOOKS))
+    lookups = time.perf_counter() - lookup_start
+    scan_start = time.perf_counter()
+    scan()
+    scanned = time.perf_counter() - scan_start
+
+    barrier.wait()
+    rss, pss, private = memory_kib()
+    barrier.wait()
+    results.put((ready, lookups, scanned, rss, pss, private))
+
+
+def run(mode, db_path, snapshot_path):
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(WORKERS)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, db_path, snapshot_path, barrier, results))
+                 for _ in range(WORKERS)]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return [statistics.median(column) for column in zip(*rows)]
+
+
+def main():
+    from services.catalog_snapshot import write_catalog_snapshot
+
+    workdir = tempfile.mkdtemp()
+    database.DATABASE = os.path.join(workdir, 'library.db')
+    init_database()
+    populate()
+    snapshot_path = os.path.join(workdir, 'catalog.snap')
+    started = time.perf_counter()
+    write_catalog_snapshot(snapshot_path)
+    print(f"{BOOKS:,} books; snapshot of {os.path.getsize(snapshot_path) / 2**20:.1f} MiB "
+          f"written in {time.perf_counter() - started:.2f} s\n")
+
+    print(f"{WORKERS} workers, medians per worker")
+    print(f"{'view':<10}{'ready ms':>10}{f'{LOOKUPS // 1000}k gets ms':>14}{'scan ms':>10}"
+          f"{'RSS MiB':>10}{'PSS MiB':>10}{'private MiB':>13}")
+    for mode in ('none', 'database', 'snapshot'):
+        ready, lookups, scanned, rss, pss, private = run(mode, database.DATABASE, snapshot_path)
+        print(f"{mode:<10}{ready * 1000:>10.1f}{lookups * 1000:>14.1f}{scanned * 1000:>10.1f}"
+              f"{rss / 1024:>10.1f}{pss / 1024:>10.1f}{private / 1024:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark: circulation statistics over a large synthetic loan history
+
+Generates LOANS loans (10M by default) with SQL, builds the daily rollups,
+then times "top 100 books in the last 30 days" and "average loan length
+by author" three ways: GROUP BY over borrow_records, the rollup tables,
+and LoanColumns arrays already in memory. Also times folding a burst of
+new loan events into the rollups. Run from the repository root:
+
+    python benchmarks/bench_circulation_stats.py [LOANS]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import (
+    init_database, get_db_connection, get_all_books, rebuild_circulation_rollups, to_epoch_seconds,
+    insert_borrow_records_batch
+)
+from services.analytics import LoanColumns, update_rollups, top_books, loan_duration_by_author
+
+LOANS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+BOOKS = 10_000
+AUTHORS = 1_000
+NEW_LOANS = 10_000
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"  {label:<34} {(time.perf_counter() - start) * 1000:10.1f} ms")
+    return result
+
+
+def populate():
+    now = to_epoch_seconds(datetime.now())
+    conn = get_db_connection()
+    conn.execute(f'''
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {BOOKS})
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        SELECT 'Book ' || i, 'Author ' || (i % {AUTHORS}), 9780000000000 + i, 1000000, 1000000 FROM n
+    ''')
+    conn.execute(f'''
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {LOANS}),
+        loans AS (
+            SELECT 100000 + abs(random()) % 50000 as patron_id, 1 + abs(random()) % {BOOKS} as book_id,
+                   {now} - abs(random()) % (3 * 365 * 86400) as borrowed, abs(random()) % (30 * 86400) as kept
+            FROM n
+        )
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date,
+                                    borrow_epoch, due_epoch, return_epoch)
+        SELECT patron_id, book_id,
+               strftime('%Y-%m-%dT%H:%M:%S', borrowed, 'unixepoch'),
+               strftime('%Y-%m-%dT%H:%M:%S', borrowed + 14 * 86400, 'unixepoch'),
+               CASE WHEN borrowed + kept < {now} THEN strftime('%Y-%m-%dT%H:%M:%S', borrowed + kept, 'unixepoch') END,
+               borrowed, borrowed + 14 * 86400, CASE WHEN borrowed + kept < {now} THEN borrowed + kept END
+        FROM loans
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def scan_top_books(since):
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT book_id, COUNT(*) as borrows FROM borrow_records WHERE borrow_epoch >= ?
+        GROUP BY book_id ORDER BY borrows DESC LIMIT 100
+    ''', (since,)).fetchall()
+    conn.close()
+    return rows
+
+
+def scan_duration_by_author():
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT b.author, AVG(br.return_epoch - br.borrow_epoch) / 86400.0 FROM borrow_records br
+        JOIN books b ON br.book_id = b.id WHERE br.return_epoch IS NOT NULL GROUP BY b.author
+    ''').fetchall()
+    conn.close()
+    return rows
+
+
+def main():
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    init_database()
+    print(f"setup with {LOANS:,} loans")
+    timed("generate history", populate)
+    timed("rebuild rollups", rebuild_circulation_rollups)
+    loans = timed("load LoanColumns", LoanColumns.load)
+    authors = {book['id']: book['author'] for book in get_all_books()}
+
+    since = to_epoch_seconds(datetime.now() - timedelta(days=29))
+    print("top 100 books, last 30 days")
+    timed("GROUP BY borrow_records", lambda: scan_top_books(since))
+    timed("rollup tables", lambda: top_books(30, 100))
+    timed("LoanColumns", lambda: loans.top_books(since, 100))
+    print("average loan length by author")
+    timed("GROUP BY borrow_records", scan_duration_by_author)
+    timed("rollup tables", loan_duration_by_author)
+    timed("LoanColumns", lambda: loans.average_loan_days_by(authors))
+
+    now = datetime.now()
+    insert_borrow_records_batch([(f"{200000 + i}", 1 + i % BOOKS, now, now + timedelta(days=14))
+                                 for i in range(NEW_LOANS)])
+    print(f"incremental update after {NEW_LOANS:,} new loans")
+    timed("update_rollups", update_rollups)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark: typo-tolerant search over a 500,000-title catalog, fuzzy index vs. brute force
+
+Builds a synthetic catalog of BOOKS titles and authors made from a vocabulary
+of invented words, indexes it with services.fuzzy_index.FuzzyWordIndex and
+reports the build time, distinct words and memory. Then times QUERIES one-
+and two-word queries, each word a catalog word with one or two random typos,
+and prints the p50/p95/max latency. The brute-force baseline runs edit_distance
+against every distinct word of the vocabulary (already far cheaper than
+against every book) for BRUTE_QUERIES of the same queries, and checks both
+return the same books. Run from the repository root:
+
+    python benchmarks/bench_fuzzy_search.py
+"""
+
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.fuzzy_index import FuzzyWordIndex, edit_distance, max_distance
+
+BOOKS = 500_000
+QUERIES = 2_000
+BRUTE_QUERIES = 20
+SYLLABLES = ['ka', 'lo', 'mi', 'ren', 'sta', 'vo', 'der', 'an', 'li', 'tor', 'bel', 'qu', 'is', 'ne', 'gra', 'phi']
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5))))
+    return sorted(words)
+
+
+def catalog(rng):
+    title_words = vocabulary(rng, 40_000)
+    names = vocabulary(rng, 8_000)
+    for book_id in range(1, BOOKS + 1):
+        title = ' '.join(rng.choice(title_words) for _ in range(rng.randint(2, 5)))
+        yield book_id, title, f"{rng.choice(names)} {rng.choice(names)}"
+
+
+def typo(rng, word):
+    chars = list(word)
+    for _ in range(rng.randint(1, max(1, max_distance(word)))):
+        position = rng.randrange(len(chars))
+        edit = rng.randrange(4)
+        if edit == 0 and len(chars) > 4:
+            del chars[position]
+        elif edit == 1:
+            chars.insert(position, rng.choice(LETTERS))
+        elif edit == 2 or position == len(chars) - 1:
+            chars[position] = rng.choice(LETTERS)
+        else:
+            chars[position], chars[position + 1] = chars[position + 1], chars[position]
+    return ''.join(chars)
+
+
+def brute_force(index, words_by_book, query):
+    """The books matching every query word, checking each vocabulary word with edit_distance."""
+    matching = None
+    for word in query.split():
+        close = {other for other in index._word_ids
+                 if edit_distance(word, other, min(max_distance(word), max_distance(other)))
+                 <= min(max_distance(word), max_distance(other))}
+        books = {book_id for book_id, words in words_by_book.items() if words & close}
+        matching = books if matching is None else matching & books
+    return matching
+
+
+def percentile(samples, fraction):
+    return sorted(samples)[int(fraction * (len(samples) - 1))]
+
+
+def main():
+    rng = random.Random(48)
+    books = list(catalog(rng))
+
+    index = FuzzyWordIndex()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    for book_id, title, author in books:
+        index.add(book_id, (title, author))
+    built = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{BOOKS:,} books, {index.word_count():,} distinct words: index built in {built:.1f} s, "
+          f"peak RSS +{(rss_after - rss_before) / 1024:.0f} MiB\n")
+
+    queries = []
+    for _ in range(QUERIES):
+        book_id, title, author = rng.choice(books)
+        words = (title + ' ' + author).split()
+        queries.append(' '.join(typo(rng, word) for word in rng.sample(words, rng.randint(1, 2))))
+
+    latencies = []
+    hits = 0
+    for query in queries:
+        started = time.perf_counter()
+        hits += len(index.search(query))
+        latencies.append(time.perf_counter() - started)
+    print(f"{'method':<14}{'queries':>9}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    print(f"{'fuzzy index':<14}{QUERIES:>9,}{percentile(latencies, 0.5) * 1000:>10.2f}"
+          f"{percentile(latencies, 0.95) * 1000:>10.2f}{max(latencies) * 1000:>10.2f}")
+
+    words_by_book = {book_id: set(f"{title} {author}".split()) for book_id, title, author in books}
+    brute = []
+    for query in queries[:BRUTE_QUERIES]:
+        started = time.perf_counter()
+        expected = brute_force(index, words_by_book, query)
+        brute.append(time.perf_counter() - started)
+        assert set(index.search(query)) == expected, query
+    print(f"{'brute force':<14}{BRUTE_QUERIES:>9,}{percentile(brute, 0.5) * 1000:>10.0f}"
+          f"{percentile(brute, 0.95) * 1000:>10.0f}{max(brute) * 1000:>10.0f}")
+    print(f"\n{hits / QUERIES:.1f} books per query on average; the first {BRUTE_QUERIES} agree with brute force")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: ISBN index memory footprint and lookup speed for 1M ISBNs
+
+Compares the sorted-array IsbnIndex against a dict of ISBN strings (the
+obvious in-memory alternative) for memory, exact lookups and prefix
+enumeration. Run from the repository root:
+
+    python benchmarks/bench_isbn_index.py
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.isbn_index import IsbnIndex
+
+COUNT = 1_000_000
+LOOKUPS = 100_000
+
+
+def make_isbns(count, rng):
+    values = rng.sample(range(9780000000000, 9800000000000), count)
+    return [str(v) for v in sorted(values)]
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current
+
+
+def main():
+    rng = random.Random(327)
+    isbns = make_isbns(COUNT, rng)
+    probes = rng.sample(isbns, LOOKUPS // 2) + [str(9790000000000 + i) for i in range(LOOKUPS // 2)]
+
+    def build_index():
+        index = IsbnIndex()
+        index.load((isbn, book_id) for book_id, isbn in enumerate(isbns, 1))
+        return index
+
+    def build_dict():
+        return {isbn: book_id for book_id, isbn in enumerate(isbns, 1)}
+
+    index, index_build, index_mem = measure(build_index)
+    mapping, dict_build, dict_mem = measure(build_dict)
+
+    start = time.perf_counter()
+    for isbn in probes:
+        index.get(isbn)
+    index_lookup = (time.perf_counter() - start) / len(probes) * 1e6
+
+    start = time.perf_counter()
+    block = index.prefix("97812")
+    prefix_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for i in range(1000):
+        index.add(str(9799000000000 + i), COUNT + i)
+    insert_us = (time.perf_counter() - start) / 1000 * 1e6
+
+    print(f"ISBNs indexed:            {len(index):,}")
+    print(f"IsbnIndex arrays:         {index.nbytes() / 2**20:8.1f} MiB")
+    print(f"IsbnIndex traced:         {index_mem / 2**20:8.1f} MiB  (build {index_build:.2f} s)")
+    print(f"dict[str, int] traced:    {dict_mem / 2**20:8.1f} MiB  (build {dict_build:.2f} s)")
+    print(f"exact lookup:             {index_lookup:8.2f} us")
+    print(f"incremental insert:       {insert_us:8.2f} us")
+    print(f"prefix '97812':           {len(block):,} ids in {prefix_ms:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
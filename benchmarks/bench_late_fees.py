@@ -0,0 +1,80 @@
+"""
+Benchmark: ISO-text date handling vs. epoch columns with vectorized fees
+
+Part 1 computes days overdue and R5 fees for a large result set the old
+way (fromisoformat per row, datetime.now() per row) and with
+compute_late_fees over due_epoch values, with and without NumPy.
+Part 2 times the overdue filter on ISO text vs. the indexed due_epoch
+column. Run from the repository root:
+
+    python benchmarks/bench_late_fees.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database, get_db_connection, to_epoch_seconds
+from services import late_fees
+from services.late_fees import compute_late_fees, late_fee_for_days
+
+ROWS = 500_000
+OPEN_LOANS = 200_000
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def row_by_row(due_dates):
+    for due in due_dates:
+        days = max((datetime.now() - datetime.fromisoformat(due)).days, 0)
+        late_fee_for_days(days)
+
+
+def main():
+    rng = random.Random(327)
+    now = datetime.now()
+    dues = [now + timedelta(seconds=rng.randint(-60 * 86400, 14 * 86400)) for _ in range(ROWS)]
+    iso = [d.isoformat() for d in dues]
+    epochs = [to_epoch_seconds(d) for d in dues]
+
+    print(f"fees for {ROWS:,} loans")
+    print(f"  ISO text, per row          {timed(lambda: row_by_row(iso)):9.1f} ms")
+    numpy_module = late_fees.np
+    if numpy_module is not None:
+        print(f"  epoch, NumPy               {timed(lambda: compute_late_fees(epochs, to_epoch_seconds(now))):9.1f} ms")
+    late_fees.np = None
+    print(f"  epoch, array module        {timed(lambda: compute_late_fees(epochs, to_epoch_seconds(now))):9.1f} ms")
+    late_fees.np = numpy_module
+
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    init_database()
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, borrow_epoch, due_epoch) '
+                     'VALUES (?, ?, ?, ?, ?, ?)',
+                     [("123456", 1, d.isoformat(), d.isoformat(), e, e) for d, e in zip(dues[:OPEN_LOANS], epochs)])
+    conn.commit()
+
+    cutoff = now - timedelta(days=30)
+    conn.execute('SELECT COUNT(*) FROM borrow_records').fetchone()  # warm the page cache
+    text_ms = timed(lambda: conn.execute('SELECT id FROM borrow_records WHERE return_date IS NULL AND due_date < ?',
+                                         (cutoff.isoformat(),)).fetchall())
+    epoch_ms = timed(lambda: conn.execute('SELECT id FROM borrow_records WHERE return_date IS NULL AND due_epoch < ?',
+                                          (to_epoch_seconds(cutoff),)).fetchall())
+    conn.close()
+    print(f"loans over 30 days overdue among {OPEN_LOANS:,} open loans")
+    print(f"  due_date text scan         {text_ms:9.1f} ms")
+    print(f"  due_epoch index range      {epoch_ms:9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: borrow limit check and borrow latency as loan history grows
+
+For each history size, times the 5-book limit check three ways: the
+original COUNT over borrow_records with no supporting index, the same
+COUNT with the open-loan partial index, and the patrons.open_loan_count
+lookup that get_patron_borrow_count now uses. Also times a full
+borrow_book_by_patron + return cycle. Run from the repository root:
+
+    python benchmarks/bench_patron_accounts.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import (
+    init_database, get_db_connection, get_patron_borrow_count, repair_patron_accounts,
+    update_borrow_record_return_date, to_epoch_seconds
+)
+from services.library_service import borrow_book_by_patron
+
+HISTORY_SIZES = [10_000, 100_000, 1_000_000]
+PATRONS = 5_000
+REPEAT = 300
+
+
+def populate(history, rng):
+    now = datetime.now()
+    conn = get_db_connection()
+    conn.execute('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+                 ("Bench Book", "Author", "9780000000001", 10 ** 9, 10 ** 9))
+    rows = []
+    for _ in range(history):
+        dates = [now - timedelta(days=rng.randint(30, 2000))]
+        dates += [dates[0] + timedelta(days=14), dates[0] + timedelta(days=10)]
+        rows.append((f"{100000 + rng.randrange(PATRONS)}", 1,
+                     *(d.isoformat() for d in dates), *(to_epoch_seconds(d) for d in dates)))
+    conn.executemany('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date, '
+                     'borrow_epoch, due_epoch, return_epoch) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+    repair_patron_accounts()
+
+
+def per_call_ms(fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def legacy_count(patron_id):
+    conn = get_db_connection()
+    conn.execute('SELECT COUNT(*) FROM borrow_records NOT INDEXED WHERE patron_id = ? AND return_date IS NULL',
+                 (patron_id,)).fetchone()
+    conn.close()
+
+
+def indexed_count(patron_id):
+    conn = get_db_connection()
+    conn.execute('SELECT COUNT(*) FROM borrow_records WHERE patron_id = ? AND return_date IS NULL',
+                 (patron_id,)).fetchone()
+    conn.close()
+
+
+def borrow_cycle(patron_id):
+    borrow_book_by_patron(patron_id, 1)
+    update_borrow_record_return_date(patron_id, 1, datetime.now())
+
+
+def main():
+    rng = random.Random(327)
+    print(f"{'history':>9} {'COUNT scan':>11} {'COUNT idx':>10} {'patrons':>8} {'borrow+return':>14}  (ms per call)")
+    for history in HISTORY_SIZES:
+        database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+        init_database()
+        populate(history, rng)
+        patron = "100042"
+        print(f"{history:>9,} {per_call_ms(lambda: legacy_count(patron)):>11.3f} "
+              f"{per_call_ms(lambda: indexed_count(patron)):>10.3f} "
+              f"{per_call_ms(lambda: get_patron_borrow_count(patron)):>8.3f} "
+              f"{per_call_ms(lambda: borrow_cycle(patron)):>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: reconciling 100,000 late fee charges against the stub payment gateway
+
+Fills the payments ledger with CHARGES charges and runs reconcile_payments
+against services.payment_service.PaymentGateway as shipped, whose
+verify_payment_status sleeps 0.3 s per call, at several worker counts under
+RATE_LIMIT calls per second. Prints the throughput of a sample of SAMPLE
+charges per worker count, then reconciles the full ledger with the largest
+pool and checks it against BUDGET_SECONDS. One call at a time would take
+CHARGES * 0.3 s (over 8 hours). Run from the repository root:
+
+    python benchmarks/bench_payment_reconciliation.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database, get_db_connection
+from services.payment_reconciliation import reconcile_payments
+from services.payment_service import PaymentGateway
+
+CHARGES = 100_000
+SAMPLE = 5_000
+WORKER_COUNTS = (64, 256, 1024)
+RATE_LIMIT = 5000.0
+BUDGET_SECONDS = 60.0
+
+
+def populate(count):
+    conn = get_db_connection()
+    now = datetime.now().isoformat()
+    # The stub reports every transaction completed for $10.50
+    conn.executemany('''
+        INSERT INTO payments (transaction_id, kind, patron_id, book_id, amount, created_at)
+        VALUES (?, 'charge', ?, 1, 10.5, ?)
+    ''', [(f"txn_{100000 + i % 900000}_{i}", str(100000 + i % 900000), now) for i in range(count)])
+    conn.commit()
+    conn.close()
+
+
+def reconcile(workers):
+    started = time.perf_counter()
+    run = reconcile_payments(PaymentGateway(), workers=workers, rate_limit=RATE_LIMIT)
+    return run, time.perf_counter() - started
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    print(f"stub gateway (0.3 s per verify_payment_status), rate limit {RATE_LIMIT:.0f}/s\n")
+    print(f"{'workers':>8}{'charges':>10}{'seconds':>10}{'calls/s':>10}")
+    for workers in WORKER_COUNTS:
+        database.DATABASE = os.path.join(workdir, f'sample-{workers}.db')
+        init_database()
+        populate(SAMPLE)
+        run, elapsed = reconcile(workers)
+        print(f"{workers:>8}{run['checked']:>10,}{elapsed:>10.1f}{run['checked'] / elapsed:>10.0f}")
+
+    database.DATABASE = os.path.join(workdir, 'library.db')
+    init_database()
+    populate(CHARGES)
+    run, elapsed = reconcile(WORKER_COUNTS[-1])
+    print(f"{WORKER_COUNTS[-1]:>8}{run['checked']:>10,}{elapsed:>10.1f}{run['checked'] / elapsed:>10.0f}")
+    verdict = 'within' if elapsed <= BUDGET_SECONDS else 'OVER'
+    print(f"\n{run['checked']:,} charges, {run['discrepancies']} discrepancies, "
+          f"{elapsed:.1f} s: {verdict} the {BUDGET_SECONDS:.0f} s budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: per-call connections vs the pooled query layer
+
+Times LOOKUPS single-book lookups with a fresh connection per call (the old
+get_book_by_id) against the pooled connection whose statement cache keeps
+the query compiled, and fetching BATCH books by id with chunked
+IN (?, ?, ...) lists against one json_each statement. Run from the
+repository root:
+
+    python benchmarks/bench_query_layer.py
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database, get_db_connection, get_book_by_id, get_books_by_ids, close_pooled_connection
+
+BOOKS = 100_000
+LOOKUPS = 20_000
+BATCH = 5_000
+CHUNK = 500
+
+
+def timed(label, fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {label:<34} {elapsed * 1000:10.1f} ms")
+
+
+def populate():
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+                     [(f"Book {i}", f"Author {i % 1000}", str(9780000000000 + i), 3, 3) for i in range(BOOKS)])
+    conn.commit()
+    conn.close()
+
+
+def per_call_lookups(ids):
+    for book_id in ids:
+        conn = get_db_connection()
+        conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+        conn.close()
+
+
+def pooled_lookups(ids):
+    for book_id in ids:
+        get_book_by_id(book_id)
+
+
+def chunked_in(ids):
+    conn = get_db_connection()
+    rows = []
+    for start in range(0, len(ids), CHUNK):
+        chunk = ids[start:start + CHUNK]
+        rows += conn.execute(f"SELECT * FROM books WHERE id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+    conn.close()
+    return rows
+
+
+def json_each_batch(ids):
+    conn = get_db_connection()
+    rows = conn.execute('SELECT * FROM books WHERE id IN (SELECT value FROM json_each(?))',
+                        (json.dumps(ids),)).fetchall()
+    conn.close()
+    return rows
+
+
+def main():
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    init_database()
+    populate()
+    rng = random.Random(42)
+    ids = [rng.randint(1, BOOKS) for _ in range(LOOKUPS)]
+    batch = rng.sample(range(1, BOOKS + 1), BATCH)
+
+    print(f"{LOOKUPS:,} single-book lookups")
+    timed("connection per call", lambda: per_call_lookups(ids))
+    timed("pooled connection", lambda: pooled_lookups(ids))
+    print(f"{BATCH:,} books by id")
+    timed(f"IN lists of {CHUNK}", lambda: chunked_in(batch), repeat=10)
+    timed("json_each", lambda: json_each_batch(batch), repeat=10)
+    timed("get_books_by_ids", lambda: get_books_by_ids(batch), repeat=10)
+    close_pooled_connection()
+
+
+if __name__ == '__main__':
+    main()
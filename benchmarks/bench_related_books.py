@@ -0,0 +1,116 @@
+"""
+Benchmark: building and serving "patrons also borrowed" over 1,000,000 loans
+
+Fills a database with BOOKS books and LOANS returned loans by PATRONS patrons,
+book popularity following a Zipf-like curve. Times reading the patron baskets
+and building services.related_books.RelatedBooksIndex with NumPy and with the
+array-module fallback, and reports the peak memory allocated by each build
+(tracemalloc) and the size of the arrays the index keeps. Then compares the
+latency of LOOKUPS related() calls against the co_borrow_counts SQL self-join
+that answers the same question without the index. Run from the repository root:
+
+    python benchmarks/bench_related_books.py
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database, get_db_connection, get_patron_baskets, get_co_borrow_counts, to_epoch_seconds
+from services import related_books
+from services.related_books import RelatedBooksIndex, MAX_BASKET_BOOKS
+
+BOOKS = 50_000
+PATRONS = 60_000
+LOANS = 1_000_000
+LOOKUPS = 10_000
+SCANS = 20
+
+
+def populate(rng):
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+                     [(f"Book {i}", f"Author {i % 5000}", str(9780000000000 + i), 5, 5) for i in range(BOOKS)])
+    weights = [1 / (rank + 10) for rank in range(BOOKS)]
+    book_ids = rng.choices(range(1, BOOKS + 1), weights, k=LOANS)
+    start = datetime(2020, 1, 1)
+    rows = []
+    for i, book_id in enumerate(book_ids):
+        borrowed = start + timedelta(minutes=i)
+        due, returned = borrowed + timedelta(days=14), borrowed + timedelta(days=7)
+        rows.append((str(100000 + rng.randrange(PATRONS)), book_id, borrowed.isoformat(), due.isoformat(),
+                     returned.isoformat(), to_epoch_seconds(borrowed), to_epoch_seconds(due),
+                     to_epoch_seconds(returned)))
+    conn.executemany('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date,
+                                    borrow_epoch, due_epoch, return_epoch)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+
+def build(loans, numpy):
+    saved = related_books.np
+    if not numpy:
+        related_books.np = None
+    try:
+        tracemalloc.start()
+        started = time.perf_counter()
+        index = RelatedBooksIndex()
+        index.build(*loans)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return index, elapsed, peak, index.nbytes()
+    finally:
+        related_books.np = saved
+
+
+def main():
+    rng = random.Random(49)
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    init_database()
+    populate(rng)
+
+    started = time.perf_counter()
+    loans = get_patron_baskets(MAX_BASKET_BOOKS)
+    print(f"{LOANS:,} loans of {BOOKS:,} books by {len(loans[0]):,} patrons; "
+          f"{len(loans[2]):,} distinct (patron, book) pairs read in {time.perf_counter() - started:.1f} s\n")
+
+    print(f"{'build':<8}{'seconds':>10}{'peak MiB':>10}{'kept MiB':>10}")
+    index = None
+    for numpy in ((True, False) if related_books.np is not None else (False,)):
+        built, elapsed, peak, kept = build(loans, numpy)
+        index = index or built
+        print(f"{'numpy' if numpy else 'arrays':<8}{elapsed:>10.1f}{peak / 2**20:>10.1f}{kept / 2**20:>10.1f}")
+
+    book_ids = [rng.randint(1, BOOKS) for _ in range(LOOKUPS)]
+    latencies = []
+    for book_id in book_ids:
+        started = time.perf_counter()
+        index.related(book_id, 10)
+        latencies.append(time.perf_counter() - started)
+    scans = []
+    for book_id in book_ids[:SCANS]:
+        started = time.perf_counter()
+        counts = get_co_borrow_counts(book_id)
+        scans.append(time.perf_counter() - started)
+        expected = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:10]
+        assert index.related(book_id, 10) == expected, book_id
+
+    print(f"\n{'top 10 lookup':<16}{'calls':>8}{'p50 ms':>10}{'max ms':>10}")
+    print(f"{'index':<16}{LOOKUPS:>8,}{statistics.median(latencies) * 1000:>10.4f}{max(latencies) * 1000:>10.4f}")
+    print(f"{'SQL self-join':<16}{SCANS:>8,}{statistics.median(scans) * 1000:>10.1f}{max(scans) * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
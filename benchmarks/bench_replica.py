@@ -0,0 +1,95 @@
+"""
+Benchmark: borrow/return latency while reports run, with and without the replica
+
+A reporting thread repeatedly runs the overdue-loans and borrowing-history
+reports while the main thread times borrow + return cycles. The run is
+repeated with reports on library.db and with reports on a replica refreshed
+in the background. Run from the repository root:
+
+    python benchmarks/bench_replica.py
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import (
+    init_database, get_db_connection, repair_patron_accounts, refresh_replica, to_epoch_seconds,
+    get_overdue_borrow_records, get_patron_borrow_history, insert_borrow_record, update_borrow_record_return_date
+)
+from services.replica_service import ReplicaRefresher
+
+HISTORY = 300_000
+BOOKS = 1_000
+CYCLES = 500
+
+
+def populate(rng):
+    now = datetime.now()
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+                     [(f"Book {i}", "Author", str(9780000000000 + i), 10 ** 6, 10 ** 6) for i in range(BOOKS)])
+    rows = []
+    for i in range(HISTORY):
+        dates = [now - timedelta(days=rng.randint(1, 400))]
+        dates.append(dates[0] + timedelta(days=14))
+        rows.append((f"{100000 + rng.randrange(5000)}", rng.randint(1, BOOKS),
+                     *(d.isoformat() for d in dates), *(to_epoch_seconds(d) for d in dates)))
+    conn.executemany('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, borrow_epoch, due_epoch) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+    repair_patron_accounts()
+
+
+def run(label):
+    stop = threading.Event()
+
+    def reporter():
+        while not stop.is_set():
+            get_overdue_borrow_records(datetime.now())
+            get_patron_borrow_history("100042")
+
+    thread = threading.Thread(target=reporter, daemon=True)
+    thread.start()
+    latencies = []
+    for _ in range(CYCLES):
+        start = time.perf_counter()
+        insert_borrow_record("999999", 1, datetime.now(), datetime.now() + timedelta(days=14))
+        update_borrow_record_return_date("999999", 1, datetime.now())
+        latencies.append((time.perf_counter() - start) * 1000)
+    stop.set()
+    thread.join()
+    latencies.sort()
+    print(f"  {label:<20} p50 {statistics.median(latencies):7.2f} ms   "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:7.2f} ms")
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    database.DATABASE = os.path.join(workdir, 'library.db')
+    init_database()
+    populate(random.Random(327))
+
+    print(f"borrow+return latency with {HISTORY:,} loans and a concurrent report loop")
+    run("reports on primary")
+
+    database.REPLICA_DATABASE = os.path.join(workdir, 'replica.db')
+    refresh_replica()
+    refresher = ReplicaRefresher(interval_seconds=5)
+    refresher.start()
+    run("reports on replica")
+    refresher.stop()
+    print(f"  replica lag at end   {database.get_replica_lag():7.2f} s")
+
+
+if __name__ == '__main__':
+    main()
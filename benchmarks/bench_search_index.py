@@ -0,0 +1,63 @@
+"""
+Benchmark: trigram index vs. linear scan for title substring search
+
+Builds synthetic catalogs of increasing size in memory and times the same
+queries against the index and against the scan search_books_in_catalog
+falls back to. Run from the repository root:
+
+    python benchmarks/bench_search_index.py
+"""
+
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.search_index import TrigramIndex
+
+SIZES = [1_000, 10_000, 100_000]
+QUERIES = ["ockingb", "the great", "zzqx", "orwell"]
+REPEAT = 20
+
+
+def make_titles(count, rng):
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(5000)]
+    titles = [' '.join(rng.choices(words, k=rng.randint(2, 6))).title() for _ in range(count)]
+    titles[count // 2] = "To Kill a Mockingbird"
+    return titles
+
+
+def time_it(fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main():
+    rng = random.Random(327)
+    print(f"{'books':>8} {'scan ms':>10} {'index ms':>10} {'speedup':>8}")
+    for size in SIZES:
+        titles = make_titles(size, rng)
+        books = [{'id': i + 1, 'title': t} for i, t in enumerate(titles)]
+        index = TrigramIndex()
+        for book in books:
+            index.add(book['id'], book['title'])
+
+        def scan():
+            for q in QUERIES:
+                [b for b in books if q in b['title'].lower()]
+
+        def indexed():
+            for q in QUERIES:
+                index.search(q)
+
+        scan_ms, index_ms = time_it(scan), time_it(indexed)
+        print(f"{size:>8} {scan_ms:>10.3f} {index_ms:>10.3f} {scan_ms / index_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: serializing a 10,000-result /api/search response
+
+Encodes the same search body (RESULTS catalog records) with Flask's jsonify,
+as the API did before, and with routes.serialization: the stdlib fallback,
+orjson, MessagePack, a ?fields=id,title projection and gzip. Reports the
+encode time and payload size of each, then times the whole /api/search
+request for the plain, projected and gzipped variants. Needs orjson and
+msgpack installed for their rows. Run from the repository root:
+
+    python benchmarks/bench_serialization.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from app import create_app
+from database import init_database, get_db_connection
+from routes import serialization
+from routes.serialization import render_body
+
+RESULTS = 10_000
+REPEAT = 20
+
+
+def timed(label, fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        size = len(fn())
+    print(f"  {label:<36} {(time.perf_counter() - start) / REPEAT * 1000:8.2f} ms {size / 1024:10.1f} KiB")
+
+
+def populate():
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+                     [(f"Shelf Book {i}", f"Author {i % 1000}", str(9780000000000 + i), 3, 3)
+                      for i in range(RESULTS)])
+    conn.commit()
+    conn.close()
+
+
+def main():
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    init_database()
+    populate()
+    app = create_app()
+    client = app.test_client()
+    body = client.get('/api/search?q=shelf').get_json()
+    orjson = serialization.orjson
+
+    print(f"encode a {body['count']:,}-result search body")
+    with app.app_context():
+        timed("flask jsonify (before)", lambda: app.json.response(body).get_data())
+
+    serialization.orjson = None
+    timed("json module", lambda: render_body(body)[0])
+    serialization.orjson = orjson
+    if orjson is not None:
+        timed("orjson", lambda: render_body(body)[0])
+    if serialization.msgpack is not None:
+        timed("msgpack", lambda: render_body(body, 'application/msgpack')[0])
+    timed("?fields=id,title", lambda: render_body(body, fields='id,title')[0])
+    for level in (1, 5, 9):
+        serialization.GZIP_LEVEL = level
+        timed(f"gzip level {level}", lambda: render_body(body, accept_encoding='gzip')[0])
+    serialization.GZIP_LEVEL = 5
+
+    print(f"\nGET /api/search returning {body['count']:,} books")
+    timed("plain", lambda: client.get('/api/search?q=shelf').data)
+    timed("?fields=id,title", lambda: client.get('/api/search?q=shelf&fields=id,title').data)
+    timed("gzip", lambda: client.get('/api/search?q=shelf', headers={'Accept-Encoding': 'gzip'}).data)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: loan write throughput and a cross-shard report with 1, 2, 4 and 8 shards
+
+THREADS patron threads each run CYCLES loan + return pairs through
+insert_borrow_record / update_borrow_record_return_date, which only write
+the patron's shard (plus the outbox relay into the catalog's event feed),
+and then CYCLES full borrow_book_by_patron / return_book_by_patron cycles,
+which also update book availability in the shared catalog. "unsharded" is
+the single-file layout. The overdue report is then timed over HISTORY open
+loans spread across the shards. Run from the repository root:
+
+    python benchmarks/bench_sharding.py
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import (
+    init_database, get_db_connection, close_pooled_connection, insert_borrow_record,
+    update_borrow_record_return_date, get_overdue_borrow_records, insert_borrow_records_batch
+)
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+THREADS = 16
+CYCLES = 50
+BOOKS = 1_000
+HISTORY = 200_000
+SHARD_COUNTS = (None, 2, 4, 8)
+
+
+def populate():
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+                     [(f"Book {i}", "Author", str(9780000000000 + i), 1000, 1000) for i in range(BOOKS)])
+    conn.commit()
+    conn.close()
+
+
+def loan_writes(thread_index, failures):
+    patron_id = f"{100000 + thread_index}"
+    now = datetime.now()
+    for cycle in range(CYCLES):
+        book_id = 1 + (thread_index * CYCLES + cycle) % BOOKS
+        if not insert_borrow_record(patron_id, book_id, now, now + timedelta(days=14)):
+            failures.append(1)
+        if not update_borrow_record_return_date(patron_id, book_id, now):
+            failures.append(1)
+    close_pooled_connection()
+
+
+def full_cycles(thread_index, failures):
+    patron_id = f"{200000 + thread_index}"
+    for cycle in range(CYCLES):
+        book_id = 1 + (thread_index * CYCLES + cycle) % BOOKS
+        for success, _ in (borrow_book_by_patron(patron_id, book_id), return_book_by_patron(patron_id, book_id)):
+            if not success:
+                failures.append(1)
+    close_pooled_connection()
+
+
+def threaded(target):
+    failures = []
+    threads = [threading.Thread(target=target, args=(i, failures)) for i in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return THREADS * CYCLES * 2 / elapsed, len(failures)
+
+
+def overdue_report_ms():
+    now = datetime.now()
+    borrows = [(f"{300000 + i % 5000}", 1 + i % BOOKS, now - timedelta(days=30), now - timedelta(days=1 + i % 10))
+               for i in range(HISTORY)]
+    insert_borrow_records_batch(borrows)
+    get_overdue_borrow_records(now)
+    start = time.perf_counter()
+    records = get_overdue_borrow_records(now)
+    elapsed = (time.perf_counter() - start) * 1000
+    assert len(records) == HISTORY
+    return elapsed
+
+
+def main():
+    print(f"{THREADS} threads x {CYCLES} cycles, overdue report over {HISTORY:,} open loans\n")
+    print(f"{'layout':<12}{'loan writes/s':>16}{'full cycles/s':>16}{'failed':>8}{'overdue ms':>12}")
+    for shard_count in SHARD_COUNTS:
+        with tempfile.TemporaryDirectory() as workdir:
+            database.DATABASE = os.path.join(workdir, 'library.db')
+            database.SHARD_DATABASES = ([os.path.join(workdir, f'loans-{i}.db') for i in range(shard_count)]
+                                        if shard_count else None)
+            init_database()
+            populate()
+            loan_rate, loan_failures = threaded(loan_writes)
+            cycle_rate, cycle_failures = threaded(full_cycles)
+            report_ms = overdue_report_ms()
+            close_pooled_connection()
+        label = f"{shard_count} shards" if shard_count else 'unsharded'
+        print(f"{label:<12}{loan_rate:>16.0f}{cycle_rate:>16.0f}{loan_failures + cycle_failures:>8}"
+              f"{report_ms:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
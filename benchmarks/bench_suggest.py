@@ -0,0 +1,84 @@
+"""
+Benchmark: /api/suggest latency under concurrent load
+
+Indexes a synthetic 100k-book catalog with random borrow counts, then has
+several client threads fire typeahead requests (1-6 characters, as a user
+types) through the Flask test client. Reports per-request latency
+percentiles against the sub-millisecond target. Run from the repository root:
+
+    python benchmarks/bench_suggest.py
+"""
+
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from app import create_app
+from services.suggest_index import build_suggest_index, suggest
+
+BOOKS = 100_000
+THREADS = 8
+REQUESTS_PER_THREAD = 2_000
+TARGET_MS = 1.0
+
+
+def make_books(rng):
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(5000)]
+    return [{'id': i, 'title': ' '.join(rng.choices(words, k=rng.randint(2, 5))).title(),
+             'author': ' '.join(rng.choices(words, k=2)).title()} for i in range(1, BOOKS + 1)]
+
+
+def percentile(samples, pct):
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def main():
+    rng = random.Random(327)
+    books = make_books(rng)
+    popularity = {rng.randint(1, BOOKS): rng.randint(1, 500) for _ in range(BOOKS // 4)}
+
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    app = create_app()
+    start = time.perf_counter()
+    build_suggest_index(books, popularity)
+    print(f"index build: {time.perf_counter() - start:.2f} s for {BOOKS:,} books")
+
+    titles = [book['title'].lower() for book in rng.sample(books, 500)]
+    queries = [title[:rng.randint(1, 6)] for title in titles]
+
+    def service_only():
+        samples = []
+        for i in range(REQUESTS_PER_THREAD):
+            q = queries[i % len(queries)]
+            t0 = time.perf_counter()
+            suggest(q, 'title', 10)
+            samples.append((time.perf_counter() - t0) * 1000)
+        return samples
+
+    def through_http():
+        client = app.test_client()
+        samples = []
+        for i in range(REQUESTS_PER_THREAD):
+            q = queries[i % len(queries)]
+            t0 = time.perf_counter()
+            client.get(f'/api/suggest?type=title&q={q}')
+            samples.append((time.perf_counter() - t0) * 1000)
+        return samples
+
+    for label, worker in (('index lookup', service_only), ('GET /api/suggest', through_http)):
+        with ThreadPoolExecutor(THREADS) as pool:
+            samples = sorted(s for result in pool.map(lambda _: worker(), range(THREADS)) for s in result)
+        p50, p99 = percentile(samples, 50), percentile(samples, 99)
+        verdict = 'OK' if p50 < TARGET_MS else 'over target'
+        print(f"{label:<18} {THREADS} threads  p50 {p50:.3f} ms  p99 {p99:.3f} ms  [{verdict}]")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: borrow/return throughput with per-call commits vs the write coalescer
+
+THREADS request threads each run CYCLES borrow + return cycles through
+borrow_book_by_patron / return_book_by_patron, first committing on the
+calling thread (each call commits on its own) and then through a
+WriteCoalescer that group-commits them. Reports mutations per second,
+failed mutations and, for the coalescer, the mean batch size. Run from
+the repository root:
+
+    python benchmarks/bench_write_coalescer.py
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database, get_db_connection, close_pooled_connection
+from services.library_service import (
+    borrow_book_by_patron, return_book_by_patron, borrow_books_batch, return_books_batch
+)
+from services.write_coalescer import WriteCoalescer, install_write_coalescer, uninstall_write_coalescer
+
+THREADS = 16
+CYCLES = 100
+BOOKS = 1_000
+
+
+def populate():
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+                     [(f"Book {i}", "Author", str(9780000000000 + i), 100, 100) for i in range(BOOKS)])
+    conn.commit()
+    conn.close()
+
+
+def desk(thread_index, failures):
+    patron_id = f"{100000 + thread_index}"
+    for cycle in range(CYCLES):
+        book_id = 1 + (thread_index * CYCLES + cycle) % BOOKS
+        for success, _ in (borrow_book_by_patron(patron_id, book_id), return_book_by_patron(patron_id, book_id)):
+            if not success:
+                failures.append(1)
+    close_pooled_connection()
+
+
+def run(label):
+    failures = []
+    threads = [threading.Thread(target=desk, args=(i, failures)) for i in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    mutations = THREADS * CYCLES * 2
+    print(f"  {label:<26} {mutations / elapsed:8.0f} mutations/s   {len(failures)} failed")
+
+
+def main():
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    init_database()
+    populate()
+
+    print(f"{THREADS} threads x {CYCLES} borrow/return cycles")
+    run("commit per call")
+    coalescer = WriteCoalescer({'borrow': borrow_books_batch, 'return': return_books_batch})
+    install_write_coalescer(coalescer)
+    run("write coalescer")
+    uninstall_write_coalescer()
+    print(f"  mean batch {coalescer.mutations / coalescer.batches:.1f} mutations over {coalescer.batches} batches")
+
+
+if __name__ == '__main__':
+    main()
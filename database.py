@@ -3,21 +3,561 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import json
+import os
 import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from services.late_fees import SECONDS_PER_DAY, compute_late_fees
+from services.query_tracer import TracedConnection, tracing_active
 
 # Database configuration
 DATABASE = 'library.db'
 
+# Archived loans live in this SQLite file, attached as "archive"; None keeps them in DATABASE
+ARCHIVE_DATABASE = None
+
+# Read-only copy of DATABASE that report queries use; None sends them to DATABASE
+REPLICA_DATABASE = None
+
+# Report queries go back to DATABASE when the replica is older than this many seconds
+REPLICA_MAX_STALENESS = 60.0
+
+# Loan shard files. borrow_records, their archive and patrons are partitioned across
+# them by a hash of patron_id; books, the event log and the rollups stay in DATABASE.
+# None keeps everything in DATABASE
+SHARD_DATABASES: Optional[List[str]] = None
+
+# Loan IDs of each shard are drawn from its own block of this many IDs, so they stay
+# unique across shards and survive rebalancing unchanged
+SHARD_ID_BLOCK = 1 << 40
+
+# Threads that run one cross-shard read on every shard at once
+SHARD_QUERY_THREADS = 8
+
+# Wall-clock time the current replica snapshot was started, or None before the first one
+_replica_synced_at = None
+
+# Books fetched per query when the catalog is streamed with iter_all_books
+CATALOG_PAGE_SIZE = 1000
+
+# Compiled statements kept per connection; above the size of QUERIES so none is evicted
+STATEMENT_CACHE_SIZE = 256
+
+# Loan dates are also stored as integer seconds since this naive wall-clock epoch
+EPOCH = datetime(1970, 1, 1)
+
+# Columns of daily_book_stats, daily_circulation and book_circulation that borrows and returns add to
+_ROLLUP_COLUMNS = ('borrows', 'returns', 'overdue_returns', 'loan_seconds')
+
+# Named SQL for the request-path helpers. Helpers pass these exact strings to
+# execute(), so each connection's statement cache compiles every query once.
+# Lists of keys are bound as one JSON array and expanded with json_each, keeping
+# one statement text (and one cached compile) for any number of keys. Those
+# with an {archive} or {history} field are formatted with a table that is fixed by
+# the configuration, so they too keep one text per connection.
+QUERIES = {
+    # Catalog
+    'all_books': 'SELECT * FROM books ORDER BY title',
+    'books_first_page': 'SELECT * FROM books ORDER BY title, id LIMIT ?',
+    'books_page_after': 'SELECT * FROM books WHERE (title, id) > (?, ?) ORDER BY title, id LIMIT ?',
+    'book_by_id': 'SELECT * FROM books WHERE id = ?',
+    'books_added_after': 'SELECT * FROM books WHERE id > ? ORDER BY title, id',
+    'available_copies': 'SELECT available_copies FROM books WHERE id = ?',
+    'all_availability': 'SELECT id, available_copies FROM books',
+    'books_by_ids': 'SELECT * FROM books WHERE id IN (SELECT value FROM json_each(?)) ORDER BY title',
+    'book_by_isbn': 'SELECT * FROM books WHERE isbn = ?',
+    'books_by_isbns': 'SELECT * FROM books WHERE isbn IN (SELECT value FROM json_each(?))',
+    'insert_book': '''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)
+    ''',
+    'adjust_availability': 'UPDATE books SET available_copies = available_copies + ? WHERE id = ?',
+    # Books are only ever inserted (availability aside), so the AUTOINCREMENT counter versions the catalog
+    'catalog_version': "SELECT COALESCE(MAX(seq), 0) as version FROM sqlite_sequence WHERE name = 'books'",
+    'catalog_snapshot_rows': 'SELECT id, title, author, isbn, total_copies FROM books ORDER BY title, id',
+
+    # Loans
+    'patron_open_loans': '''
+        SELECT br.*, b.title, b.author
+        FROM borrow_records br
+        JOIN books b ON br.book_id = b.id
+        WHERE br.patron_id = ? AND br.return_date IS NULL
+        ORDER BY br.borrow_epoch
+    ''',
+    'open_loans_for_patrons': '''
+        SELECT * FROM borrow_records
+        WHERE patron_id IN (SELECT value FROM json_each(?)) AND return_date IS NULL
+        ORDER BY borrow_date, id
+    ''',
+    'overdue_loans': '''
+        SELECT br.*, b.title, b.author
+        FROM borrow_records br
+        JOIN books b ON br.book_id = b.id
+        WHERE br.return_date IS NULL AND br.due_epoch < ?
+        ORDER BY br.due_epoch
+    ''',
+    'patron_history': '''
+        SELECT bh.*, b.title, b.author
+        FROM borrow_history bh
+        JOIN books b ON bh.book_id = b.id
+        WHERE bh.patron_id = ?
+        ORDER BY bh.borrow_date DESC
+    ''',
+    'borrow_counts': 'SELECT book_id, COUNT(*) as count FROM borrow_history GROUP BY book_id',
+    'loan_epochs_by_ids': '''
+        SELECT id, borrow_epoch, due_epoch FROM borrow_history WHERE id IN (SELECT value FROM json_each(?))
+    ''',
+    'insert_loan': '''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, borrow_epoch, due_epoch)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    'close_patron_loans': '''
+        UPDATE borrow_records SET return_date = ?, return_epoch = ?
+        WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+        RETURNING id, due_epoch
+    ''',
+    'close_loan': 'UPDATE borrow_records SET return_date = ?, return_epoch = ? WHERE id = ? AND return_date IS NULL',
+    # Loans returned before a cutoff, oldest first; {archive} is _archive_table()
+    'archive_closed_loans': '''
+        INSERT INTO {archive}
+            (id, patron_id, book_id, borrow_date, due_date, return_date, archived_at,
+             borrow_epoch, due_epoch, return_epoch)
+        SELECT id, patron_id, book_id, borrow_date, due_date, return_date, ?,
+               borrow_epoch, due_epoch, return_epoch
+        FROM borrow_records WHERE id IN (
+            SELECT id FROM borrow_records WHERE return_date IS NOT NULL AND return_date < ? ORDER BY id LIMIT ?
+        )
+    ''',
+    'delete_archived_loans': '''
+        DELETE FROM borrow_records WHERE id IN (
+            SELECT id FROM borrow_records WHERE return_date IS NOT NULL AND return_date < ? ORDER BY id LIMIT ?
+        )
+    ''',
+
+    # Patron accounts
+    'patron_loan_count': 'SELECT open_loan_count FROM patrons WHERE patron_id = ?',
+    'patron_loan_counts': '''
+        SELECT patron_id, open_loan_count FROM patrons WHERE patron_id IN (SELECT value FROM json_each(?))
+    ''',
+    'patron_account': 'SELECT * FROM patrons WHERE patron_id = ?',
+    # Adds (open_loan_count, outstanding_fees) deltas to a patron, creating the row if needed
+    'adjust_patron': '''
+        INSERT INTO patrons (patron_id, open_loan_count, outstanding_fees) VALUES (?, ?, ?)
+        ON CONFLICT (patron_id) DO UPDATE SET
+            open_loan_count = open_loan_count + excluded.open_loan_count,
+            outstanding_fees = ROUND(outstanding_fees + excluded.outstanding_fees, 2)
+    ''',
+    'record_payment': '''
+        INSERT INTO patrons (patron_id, outstanding_fees, fees_paid) VALUES (?, ?, ?)
+        ON CONFLICT (patron_id) DO UPDATE SET
+            outstanding_fees = ROUND(outstanding_fees - excluded.fees_paid, 2),
+            fees_paid = ROUND(fees_paid + excluded.fees_paid, 2)
+    ''',
+    # Account repair recomputes both columns from the loan history
+    'open_loan_counts': '''
+        SELECT patron_id, COUNT(*) as count FROM borrow_records WHERE return_date IS NULL GROUP BY patron_id
+    ''',
+    'returned_loan_epochs': '''
+        SELECT patron_id, due_epoch, return_epoch FROM borrow_history WHERE return_epoch IS NOT NULL
+    ''',
+    'clear_patron_accounts': 'UPDATE patrons SET open_loan_count = 0, outstanding_fees = -fees_paid',
+    'set_patron_account': '''
+        INSERT INTO patrons (patron_id, open_loan_count, outstanding_fees) VALUES (?, ?, ?)
+        ON CONFLICT (patron_id) DO UPDATE SET
+            open_loan_count = excluded.open_loan_count,
+            outstanding_fees = ROUND(excluded.outstanding_fees - fees_paid, 2)
+    ''',
+
+    # Payments ledger and reconciliation
+    'insert_payment': '''
+        INSERT INTO payments (transaction_id, kind, patron_id, book_id, amount, created_at) VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    'payments_by_transaction': 'SELECT * FROM payments WHERE transaction_id = ? ORDER BY id',
+    'returned_book_loans': '''
+        SELECT due_epoch, return_epoch FROM borrow_history
+        WHERE patron_id = ? AND book_id = ? AND return_epoch IS NOT NULL
+    ''',
+    # Charges net of refunds; on a shard this reads catalog.payments
+    'book_fees_paid': '''
+        SELECT COALESCE(SUM(CASE kind WHEN 'charge' THEN amount ELSE -amount END), 0) as paid
+        FROM payments WHERE patron_id = ? AND book_id = ?
+    ''',
+    # Charges not yet seen settled, in id order from a run's checkpoint
+    'payments_to_reconcile': '''
+        SELECT * FROM payments
+        WHERE kind = 'charge' AND status != 'settled' AND id > ? AND id <= ?
+        ORDER BY id LIMIT ?
+    ''',
+    'open_reconciliation_run': 'SELECT * FROM reconciliation_runs WHERE finished_at IS NULL ORDER BY id LIMIT 1',
+    'reconciliation_run': 'SELECT * FROM reconciliation_runs WHERE id = ?',
+    'run_discrepancies': 'SELECT * FROM payment_discrepancies WHERE run_id = ? ORDER BY payment_id',
+    'last_payment_id': 'SELECT COALESCE(MAX(id), 0) as id FROM payments',
+    'insert_reconciliation_run': 'INSERT INTO reconciliation_runs (started_at, upto_payment_id) VALUES (?, ?)',
+    'set_payment_status': 'UPDATE payments SET status = ?, verified_at = ? WHERE id = ?',
+    'insert_discrepancy': '''
+        INSERT OR REPLACE INTO payment_discrepancies
+            (run_id, payment_id, transaction_id, problem, recorded_amount, gateway_status, gateway_amount)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''',
+    'advance_reconciliation_run': '''
+        UPDATE reconciliation_runs
+        SET last_payment_id = ?, checked = checked + ?, discrepancies = discrepancies + ?
+        WHERE id = ?
+    ''',
+    'finish_reconciliation_run': 'UPDATE reconciliation_runs SET finished_at = ? WHERE id = ?',
+
+    # Event log
+    'insert_event': 'INSERT INTO events (event_type, payload, created_at) VALUES (?, ?, ?)',
+    'last_insert_id': 'SELECT last_insert_rowid() as id',
+    'events_since': 'SELECT * FROM events WHERE id > ? ORDER BY id LIMIT ?',
+    # On a shard, its events table is an outbox that relay_shard_events empties into DATABASE
+    'outbox_pending': 'SELECT 1 FROM main.events LIMIT 1',
+
+    # Circulation rollups
+    'rollup_cursor': "SELECT event_cursor FROM rollup_state WHERE name = 'circulation'",
+    'set_rollup_cursor': "INSERT OR REPLACE INTO rollup_state (name, event_cursor) VALUES ('circulation', ?)",
+    'loan_events_after': '''
+        SELECT id, event_type, payload FROM events
+        WHERE id > ? AND event_type IN ('loan.created', 'loan.returned')
+        ORDER BY id LIMIT ?
+    ''',
+    'last_event_id_or': 'SELECT COALESCE(MAX(id), ?) as id FROM events',
+    # Add borrow/return deltas to the rollups, creating the row if needed
+    'adjust_book_stats': f'''
+        INSERT INTO daily_book_stats (day, book_id, {', '.join(_ROLLUP_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (day, book_id) DO UPDATE SET
+            {', '.join(f'{c} = {c} + excluded.{c}' for c in _ROLLUP_COLUMNS)}
+    ''',
+    'adjust_daily_circulation': f'''
+        INSERT INTO daily_circulation (day, {', '.join(_ROLLUP_COLUMNS)}) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (day) DO UPDATE SET
+            {', '.join(f'{c} = {c} + excluded.{c}' for c in _ROLLUP_COLUMNS)}
+    ''',
+    'adjust_book_circulation': f'''
+        INSERT INTO book_circulation (book_id, {', '.join(_ROLLUP_COLUMNS)}) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (book_id) DO UPDATE SET
+            {', '.join(f'{c} = {c} + excluded.{c}' for c in _ROLLUP_COLUMNS)}
+    ''',
+    # A full rebuild; {history} is borrow_history, or the union of every shard's when sharded.
+    # A return counts as overdue when it is at least one day late, as for R5 fees
+    'clear_book_stats': 'DELETE FROM daily_book_stats',
+    'clear_daily_circulation': 'DELETE FROM daily_circulation',
+    'clear_book_circulation': 'DELETE FROM book_circulation',
+    'rebuild_book_stats_borrows': f'''
+        INSERT INTO daily_book_stats (day, book_id, borrows)
+        SELECT borrow_epoch / {SECONDS_PER_DAY}, book_id, COUNT(*) FROM {{history}}
+        GROUP BY 1, 2
+    ''',
+    # WHERE is needed for the parser to accept ON CONFLICT after INSERT ... SELECT
+    'rebuild_book_stats_returns': f'''
+        INSERT INTO daily_book_stats (day, book_id, returns, overdue_returns, loan_seconds)
+        SELECT return_epoch / {SECONDS_PER_DAY}, book_id, COUNT(*),
+               SUM(return_epoch - due_epoch >= {SECONDS_PER_DAY}), SUM(return_epoch - borrow_epoch)
+        FROM {{history}} WHERE return_epoch IS NOT NULL
+        GROUP BY 1, 2
+        ON CONFLICT (day, book_id) DO UPDATE SET
+            returns = excluded.returns,
+            overdue_returns = excluded.overdue_returns,
+            loan_seconds = excluded.loan_seconds
+    ''',
+    'rebuild_daily_circulation': f'''
+        INSERT INTO daily_circulation (day, {', '.join(_ROLLUP_COLUMNS)})
+        SELECT day, {', '.join(f'SUM({c})' for c in _ROLLUP_COLUMNS)} FROM daily_book_stats GROUP BY day
+    ''',
+    'rebuild_book_circulation': f'''
+        INSERT INTO book_circulation (book_id, {', '.join(_ROLLUP_COLUMNS)})
+        SELECT book_id, {', '.join(f'SUM({c})' for c in _ROLLUP_COLUMNS)} FROM daily_book_stats GROUP BY book_id
+    ''',
+    'reset_rollup_cursor': '''
+        INSERT OR REPLACE INTO rollup_state (name, event_cursor)
+        SELECT 'circulation', COALESCE(MAX(id), 0) FROM events
+    ''',
+    'book_stats_count': 'SELECT COUNT(*) as count FROM daily_book_stats',
+    'top_borrowed_books': '''
+        SELECT b.id, b.title, b.author, SUM(s.borrows) as borrows
+        FROM daily_book_stats s
+        JOIN books b ON s.book_id = b.id
+        WHERE s.day >= ?
+        GROUP BY s.book_id
+        HAVING SUM(s.borrows) > 0
+        ORDER BY borrows DESC, b.id
+        LIMIT ?
+    ''',
+    'daily_circulation': 'SELECT * FROM daily_circulation WHERE day >= ? ORDER BY day',
+    'loan_totals_by_author': '''
+        SELECT b.author, SUM(s.returns) as returns, SUM(s.loan_seconds) as loan_seconds
+        FROM book_circulation s
+        JOIN books b ON s.book_id = b.id
+        GROUP BY b.author
+        HAVING SUM(s.returns) > 0
+        ORDER BY b.author
+    ''',
+    'loan_columns': '''
+        SELECT book_id, borrow_epoch, due_epoch, COALESCE(return_epoch, -1) FROM borrow_history
+    ''',
+    'patron_baskets': '''
+        SELECT patron_id, book_id FROM borrow_history
+        GROUP BY patron_id, book_id
+        ORDER BY patron_id, MAX(id) DESC
+    ''',
+    'co_borrow_counts': '''
+        SELECT other.book_id, COUNT(DISTINCT other.patron_id) as patrons
+        FROM borrow_history mine
+        JOIN borrow_history other ON other.patron_id = mine.patron_id AND other.book_id != mine.book_id
+        WHERE mine.book_id = ?
+        GROUP BY other.book_id
+    ''',
+}
+
+# Each thread's long-lived read connections, one per loan shard; see _pooled_connection
+_pool = threading.local()
+
+# Runs cross-shard reads; created on first use
+_shard_executor: Optional[ThreadPoolExecutor] = None
+_shard_executor_lock = threading.Lock()
+
+# (callback, event types or None for all) pairs notified after a mutation commits
+_event_subscribers = []
+
+def subscribe_events(callback, event_types: Optional[List[str]] = None):
+    """
+    Call callback(event) for every event committed by this process.
+
+    Events are dicts with 'id', 'type', 'payload' and 'created_at'. The types are
+    book.inserted, book.availability_changed, loan.created and loan.returned.
+    Subscribing the same callback again replaces its event types.
+    """
+    unsubscribe_events(callback)
+    _event_subscribers.append((callback, set(event_types) if event_types else None))
+
+def unsubscribe_events(callback):
+    """Stop delivering events to callback."""
+    _event_subscribers[:] = [(cb, types) for cb, types in _event_subscribers if cb != callback]
+
+def _record_events(conn, events: List[Tuple[str, Dict]]) -> List[Dict]:
+    """
+    Append (event_type, payload) rows to the events table on conn's open transaction.
+
+    Returns:
+        list of event dicts, to be passed to _publish_events after the commit
+    """
+    created_at = datetime.now().isoformat()
+    conn.executemany(QUERIES['insert_event'],
+                     [(event_type, json.dumps(payload), created_at) for event_type, payload in events])
+    # Rows inserted by one statement in one transaction get consecutive AUTOINCREMENT ids
+    last_id = conn.execute(QUERIES['last_insert_id']).fetchone()['id']
+    first_id = last_id - len(events) + 1
+    return [{'id': first_id + i, 'type': event_type, 'payload': payload, 'created_at': created_at}
+            for i, (event_type, payload) in enumerate(events)]
+
+def _publish_events(events: List[Dict]):
+    """Deliver committed events to in-process subscribers; a failing subscriber is skipped."""
+    for event in events:
+        for callback, event_types in list(_event_subscribers):
+            if event_types is None or event['type'] in event_types:
+                try:
+                    callback(event)
+                except Exception as e:
+                    pass
+
+def _deliver_events(shard: Optional[int], events: List[Dict]):
+    """
+    Publish events just committed on a loan connection. A shard's events wait
+    in its outbox instead, and are published with their feed IDs once
+    relay_shard_events moves them into the global feed.
+    """
+    if shard is None:
+        _publish_events(events)
+
+def to_epoch_seconds(moment: datetime) -> int:
+    """Convert a naive datetime to the integer seconds stored in the *_epoch columns."""
+    return (moment - EPOCH) // timedelta(seconds=1)
+
+def from_epoch_seconds(seconds: int) -> datetime:
+    """Convert a *_epoch column value back to a naive datetime."""
+    return EPOCH + timedelta(seconds=seconds)
+
+def to_epoch_day(moment: datetime) -> int:
+    """Whole days since the epoch, for day-granularity comparisons."""
+    return to_epoch_seconds(moment) // SECONDS_PER_DAY
+
+def _archive_table() -> str:
+    """Qualified name of the table holding archived borrow records."""
+    return 'archive.borrow_records_archive' if ARCHIVE_DATABASE else 'borrow_records_archive'
+
+def _borrow_history_sql() -> str:
+    """SELECT over live and archived borrow records, used to define the borrow_history view."""
+    columns = 'id, patron_id, book_id, borrow_date, due_date, return_date, borrow_epoch, due_epoch, return_epoch'
+    return f'''
+        SELECT {columns} FROM borrow_records
+        UNION ALL
+        SELECT {columns} FROM {_archive_table()}
+    '''
+
+def _connect(target: str, **kwargs):
+    """Open a connection, wrapped by the query tracer while tracing is active."""
+    if tracing_active():
+        kwargs['factory'] = TracedConnection
+    return sqlite3.connect(target, cached_statements=STATEMENT_CACHE_SIZE, **kwargs)
+
 def get_db_connection():
     """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
+    conn = _connect(DATABASE)
     conn.row_factory = sqlite3.Row  # This enables column access by name
+    if ARCHIVE_DATABASE:
+        # A view in the main schema cannot reference an attached file, so use a per-connection one
+        conn.execute('ATTACH DATABASE ? AS archive', (ARCHIVE_DATABASE,))
+        conn.execute(f'CREATE TEMP VIEW IF NOT EXISTS borrow_history AS {_borrow_history_sql()}')
+    return conn
+
+def patron_shard(patron_id: str, shard_count: int) -> int:
+    """Stable hash partition of a patron ID (the same in every process, unlike hash())."""
+    return zlib.crc32(str(patron_id).encode()) % shard_count
+
+def shard_for_patron(patron_id: str) -> Optional[int]:
+    """Index into SHARD_DATABASES of the shard holding a patron's loans, or None when not sharded."""
+    return patron_shard(patron_id, len(SHARD_DATABASES)) if SHARD_DATABASES else None
+
+def get_shard_connection(shard: int):
+    """Get a connection to one loan shard, with DATABASE attached as "catalog" for the books table."""
+    conn = _connect(SHARD_DATABASES[shard])
+    conn.row_factory = sqlite3.Row
+    # Unqualified names resolve in the shard first, so only books (and the rollups) come from the catalog
+    conn.execute('ATTACH DATABASE ? AS catalog', (DATABASE,))
+    return conn
+
+def _loan_connection(shard: Optional[int]):
+    """Connection for the loan tables of one shard, or DATABASE when shard is None."""
+    return get_db_connection() if shard is None else get_shard_connection(shard)
+
+def _loan_shards() -> List[Optional[int]]:
+    """Every loan shard index, or [None] when the loans live in DATABASE."""
+    return list(range(len(SHARD_DATABASES))) if SHARD_DATABASES else [None]
+
+def _group_by_shard(items, patron_id_of) -> Dict[Optional[int], List]:
+    """Split items by the shard of their patron, keeping their order within each shard."""
+    groups: Dict[Optional[int], List] = {}
+    for item in items:
+        groups.setdefault(shard_for_patron(patron_id_of(item)), []).append(item)
+    return groups
+
+def _fan_out(fn) -> List:
+    """Call fn(shard) for every loan shard, in parallel when sharded; results in shard order."""
+    global _shard_executor
+    shards = _loan_shards()
+    if len(shards) == 1:
+        return [fn(shards[0])]
+    with _shard_executor_lock:
+        if _shard_executor is None:
+            _shard_executor = ThreadPoolExecutor(SHARD_QUERY_THREADS, thread_name_prefix='shard-query')
+    return list(_shard_executor.map(fn, shards))
+
+def _pooled_connection(shard: Optional[int] = None):
+    """
+    This thread's long-lived connection to DATABASE (or a loan shard) for the read
+    helpers, so their QUERIES stay compiled in its statement cache instead of being
+    parsed on every call. Reopened when the database files or query tracing change.
+    """
+    key = (DATABASE, ARCHIVE_DATABASE, tuple(SHARD_DATABASES or ()), tracing_active())
+    if getattr(_pool, 'key', None) != key:
+        close_pooled_connection()
+        _pool.key = key
+    conn = _pool.conns.get(shard)
+    if conn is None:
+        conn = _pool.conns[shard] = _loan_connection(shard)
+    return conn
+
+def close_pooled_connection():
+    """Close this thread's pooled read connections, if it has any."""
+    for conn in getattr(_pool, 'conns', {}).values():
+        conn.close()
+    _pool.conns = {}
+
+def _fetch_all(name: str, params=(), shard: Optional[int] = None) -> List[sqlite3.Row]:
+    """Run a named read query on the pooled connection to DATABASE or to a loan shard."""
+    # fetchall runs the statement to completion, so the pooled connection holds no read lock afterwards
+    return _pooled_connection(shard).execute(QUERIES[name], params).fetchall()
+
+def _fetch_one(name: str, params=(), shard: Optional[int] = None) -> Optional[sqlite3.Row]:
+    """Run a named read query on a pooled connection and return its first row."""
+    rows = _fetch_all(name, params, shard)
+    return rows[0] if rows else None
+
+def _report_rows(name: str, params=()) -> List[sqlite3.Row]:
+    """Run a named report query over every loan: on the report connection, or on all shards in parallel."""
+    if not SHARD_DATABASES:
+        conn = get_report_connection()
+        rows = conn.execute(QUERIES[name], params).fetchall()
+        conn.close()
+        return rows
+    return [row for rows in _fan_out(lambda shard: _fetch_all(name, params, shard)) for row in rows]
+
+def get_replica_lag() -> Optional[float]:
+    """Seconds since the current replica snapshot was taken, or None if there is none."""
+    if not REPLICA_DATABASE or _replica_synced_at is None:
+        return None
+    return max(time.time() - _replica_synced_at, 0.0)
+
+def get_report_connection(max_staleness: Optional[float] = None):
+    """
+    Get a read-only connection for reporting queries.
+
+    Uses the REPLICA_DATABASE snapshot when it is at most max_staleness seconds old
+    (default REPLICA_MAX_STALENESS), so reports do not compete with the borrow/return
+    writes on DATABASE; otherwise falls back to get_db_connection().
+    """
+    lag = get_replica_lag()
+    if lag is None or lag > (REPLICA_MAX_STALENESS if max_staleness is None else max_staleness):
+        return get_db_connection()
+
+    conn = _connect(f'file:{REPLICA_DATABASE}?mode=ro', uri=True)
+    conn.row_factory = sqlite3.Row
+    if ARCHIVE_DATABASE:
+        # Archived loans are only appended by the archiver, so they are read in place
+        conn.execute('ATTACH DATABASE ? AS archive', (f'file:{ARCHIVE_DATABASE}?mode=ro',))
+        conn.execute(f'CREATE TEMP VIEW IF NOT EXISTS borrow_history AS {_borrow_history_sql()}')
     return conn
 
+def refresh_replica(pages_per_step: int = 256, pause_seconds: float = 0.0) -> bool:
+    """
+    Copy DATABASE to REPLICA_DATABASE with the SQLite online backup API.
+
+    The copy runs pages_per_step pages at a time, releasing the read lock between
+    steps so borrow/return writes are not held up. It is written to a temporary file
+    and renamed over the replica, so open report connections keep reading the old
+    snapshot and new ones see the complete new one.
+    """
+    global _replica_synced_at
+    if not REPLICA_DATABASE:
+        return False
+
+    started = time.time()
+    partial = REPLICA_DATABASE + '.partial'
+    source = sqlite3.connect(DATABASE)
+    target = sqlite3.connect(partial)
+    try:
+        source.backup(target, pages=pages_per_step, sleep=pause_seconds)
+        target.close()
+        source.close()
+        os.replace(partial, REPLICA_DATABASE)
+    except Exception as e:
+        target.close()
+        source.close()
+        return False
+
+    _replica_synced_at = started
+    return True
+
 def init_database():
-    """Initialize the database with required tables."""
+    """Initialize the database with required tables, and every loan shard when sharded."""
+    if SHARD_DATABASES and ARCHIVE_DATABASE:
+        raise ValueError('ARCHIVE_DATABASE cannot be combined with SHARD_DATABASES')
     conn = get_db_connection()
 
     # Create books table
@@ -32,6 +572,108 @@ def init_database():
         )
     ''')
 
+    # Title order for the catalog pages, with id breaking ties so pages can resume after a row
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_books_title ON books (title, id)')
+
+    # Every late fee charge and refund sent to the payment gateway; shard connections reach it through "catalog"
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id TEXT NOT NULL,
+            kind TEXT NOT NULL CHECK (kind IN ('charge', 'refund')),
+            patron_id TEXT,
+            book_id INTEGER,
+            amount REAL NOT NULL,
+            created_at TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'recorded',
+            verified_at TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_payments_transaction ON payments (transaction_id)')
+
+    # Reconciliation runs against the gateway, each resumable from its checkpoint, and what they found
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reconciliation_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TEXT NOT NULL,
+            finished_at TEXT,
+            upto_payment_id INTEGER NOT NULL,
+            last_payment_id INTEGER NOT NULL DEFAULT 0,
+            checked INTEGER NOT NULL DEFAULT 0,
+            discrepancies INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS payment_discrepancies (
+            run_id INTEGER NOT NULL,
+            payment_id INTEGER NOT NULL,
+            transaction_id TEXT NOT NULL,
+            problem TEXT NOT NULL,
+            recorded_amount REAL NOT NULL,
+            gateway_status TEXT,
+            gateway_amount REAL,
+            PRIMARY KEY (run_id, payment_id)
+        )
+    ''')
+
+    # When sharded the loan tables stay empty here and events is the feed the shard outboxes relay into
+    new_patrons_table = _create_loan_schema(conn)
+
+    # Daily and all-time circulation rollups, kept up to date from the events table by services/analytics.py
+    new_rollups = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollup_state'").fetchone() is None
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_book_stats (
+            day INTEGER NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrows INTEGER NOT NULL DEFAULT 0,
+            returns INTEGER NOT NULL DEFAULT 0,
+            overdue_returns INTEGER NOT NULL DEFAULT 0,
+            loan_seconds INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, book_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_circulation (
+            day INTEGER PRIMARY KEY,
+            borrows INTEGER NOT NULL DEFAULT 0,
+            returns INTEGER NOT NULL DEFAULT 0,
+            overdue_returns INTEGER NOT NULL DEFAULT 0,
+            loan_seconds INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS book_circulation (
+            book_id INTEGER PRIMARY KEY,
+            borrows INTEGER NOT NULL DEFAULT 0,
+            returns INTEGER NOT NULL DEFAULT 0,
+            overdue_returns INTEGER NOT NULL DEFAULT 0,
+            loan_seconds INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            name TEXT PRIMARY KEY,
+            event_cursor INTEGER NOT NULL
+        )
+    ''')
+    conn.commit()
+    conn.close()
+
+    for shard, path in enumerate(SHARD_DATABASES or ()):
+        new_patrons_table = init_shard_database(path, (shard + 1) * SHARD_ID_BLOCK) or new_patrons_table
+
+    if new_patrons_table:
+        repair_patron_accounts()
+    if new_rollups:
+        rebuild_circulation_rollups()
+
+def _create_loan_schema(conn) -> bool:
+    """
+    Create the loan tables (borrow_records, their archive and the borrow_history
+    view, patrons and events) on conn. Returns True when the patrons table is new
+    and its accounts still have to be computed.
+    """
     # Create borrow_records table
     conn.execute('''
         CREATE TABLE IF NOT EXISTS borrow_records (
@@ -41,12 +683,110 @@ def init_database():
             borrow_date TEXT NOT NULL,
             due_date TEXT NOT NULL,
             return_date TEXT,
+            borrow_epoch INTEGER,
+            due_epoch INTEGER,
+            return_epoch INTEGER,
             FOREIGN KEY (book_id) REFERENCES books (id)
         )
     ''')
 
+    # Open-loan lookups only ever read rows with no return date
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_open
+        ON borrow_records (patron_id, book_id) WHERE return_date IS NULL
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_return_date
+        ON borrow_records (return_date) WHERE return_date IS NOT NULL
+    ''')
+
+    # Closed loans moved out of borrow_records by archive_closed_borrow_records
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {_archive_table()} (
+            id INTEGER PRIMARY KEY,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            return_date TEXT NOT NULL,
+            archived_at TEXT NOT NULL,
+            borrow_epoch INTEGER,
+            due_epoch INTEGER,
+            return_epoch INTEGER
+        )
+    ''')
+    _migrate_epoch_columns(conn, 'main', 'borrow_records')
+    _migrate_epoch_columns(conn, 'archive' if ARCHIVE_DATABASE else 'main', 'borrow_records_archive')
+
+    # Recreated every time so it picks up columns added since it was first created
+    conn.execute('DROP VIEW IF EXISTS main.borrow_history')
+    if not ARCHIVE_DATABASE:
+        conn.execute(f'CREATE VIEW borrow_history AS {_borrow_history_sql()}')
+
+    # Overdue filters are range scans over the due date of open loans
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_open_due
+        ON borrow_records (due_epoch) WHERE return_date IS NULL
+    ''')
+
+    # Per-patron totals kept in step with borrow_records by the borrow/return/payment helpers
+    new_patrons_table = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'patrons'").fetchone() is None
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS patrons (
+            patron_id TEXT PRIMARY KEY,
+            open_loan_count INTEGER NOT NULL DEFAULT 0,
+            outstanding_fees REAL NOT NULL DEFAULT 0,
+            fees_paid REAL NOT NULL DEFAULT 0
+        )
+    ''')
+
+    # Append-only change log written in the same transaction as each mutation
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    return new_patrons_table
+
+def init_shard_database(path: str, first_loan_id: int) -> bool:
+    """
+    Create the loan tables in one shard file, numbering its loans after
+    first_loan_id. Returns True when the shard's patrons table is new.
+    """
+    conn = _connect(path)
+    conn.row_factory = sqlite3.Row
+    new_patrons_table = _create_loan_schema(conn)
+    conn.execute('''
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'borrow_records', ? WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'borrow_records')
+    ''', (first_loan_id,))
     conn.commit()
     conn.close()
+    return new_patrons_table
+
+def _migrate_epoch_columns(conn, schema: str, table: str):
+    """
+    Add the borrow_epoch/due_epoch/return_epoch integer columns to a table created
+    before they existed and backfill them. The ISO text columns stay as the
+    compatibility format.
+    """
+    columns = {row['name'] for row in conn.execute(f'PRAGMA {schema}.table_info({table})')}
+    if 'due_epoch' in columns:
+        return
+
+    for column in ('borrow_epoch', 'due_epoch', 'return_epoch'):
+        conn.execute(f'ALTER TABLE {schema}.{table} ADD COLUMN {column} INTEGER')
+    # strftime('%s') reads the naive ISO text as UTC, matching to_epoch_seconds
+    conn.execute(f'''
+        UPDATE {schema}.{table} SET
+            borrow_epoch = CAST(strftime('%s', borrow_date) AS INTEGER),
+            due_epoch = CAST(strftime('%s', due_date) AS INTEGER),
+            return_epoch = CAST(strftime('%s', return_date) AS INTEGER)
+    ''')
 
 def add_sample_data():
     """Add sample data to the database if it's empty."""
@@ -67,135 +807,766 @@ def add_sample_data():
                 VALUES (?, ?, ?, ?, ?)
             ''', (title, author, isbn, copies, copies))
 
-        # Make 1984 unavailable by adding a borrow record
-        conn.execute('''
-            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
-            VALUES (?, ?, ?, ?)
-        ''', ('123456', 3,
-              (datetime.now() - timedelta(days=5)).isoformat(),
-              (datetime.now() + timedelta(days=9)).isoformat()))
-
         # Update available copies for 1984
         conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
-
         conn.commit()
 
+        # Make 1984 unavailable by adding a borrow record, on the patron's shard when sharded
+        loans = _loan_connection(shard_for_patron('123456'))
+        borrow_date = datetime.now() - timedelta(days=5)
+        due_date = datetime.now() + timedelta(days=9)
+        loans.execute('''
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, borrow_epoch, due_epoch)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', ('123456', 3, borrow_date.isoformat(), due_date.isoformat(),
+              to_epoch_seconds(borrow_date), to_epoch_seconds(due_date)))
+        loans.execute(QUERIES['adjust_patron'], ('123456', 1, 0))
+        loans.commit()
+        loans.close()
+
     conn.close()
 
 # Helper Functions for Database Operations
 
 def get_all_books() -> List[Dict]:
     """Get all books from the database."""
+    return [dict(book) for book in _fetch_all('all_books')]
+
+def iter_all_books(page_size: int = CATALOG_PAGE_SIZE) -> Iterator[Dict]:
+    """
+    Yield every book in title order, one page query at a time, so callers that
+    stream the catalog never hold it all in memory. Each page resumes after the
+    last (title, id) seen and no read lock is held between pages.
+    """
+    rows = _fetch_all('books_first_page', (page_size,))
+    while rows:
+        for row in rows:
+            yield dict(row)
+        if len(rows) < page_size:
+            return
+        last = rows[-1]
+        rows = _fetch_all('books_page_after', (last['title'], last['id'], page_size))
+
+def get_catalog_version() -> int:
+    """Version of the catalog's static fields (titles, authors, ISBNs, copies owned); grows with every new book."""
+    return _fetch_one('catalog_version')['version']
+
+def read_catalog_snapshot_rows() -> Tuple[int, List[sqlite3.Row]]:
+    """
+    Every book's static fields in title order, with the catalog version they
+    were read at (one read transaction, so the two agree).
+
+    Returns:
+        tuple: (version, rows of id, title, author, isbn, total_copies)
+    """
     conn = get_db_connection()
-    books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
-    conn.close()
-    return [dict(book) for book in books]
+    try:
+        conn.execute('BEGIN')
+        version = conn.execute(QUERIES['catalog_version']).fetchone()['version']
+        rows = conn.execute(QUERIES['catalog_snapshot_rows']).fetchall()
+        conn.commit()
+        return version, rows
+    finally:
+        conn.close()
 
 def get_book_by_id(book_id: int) -> Optional[Dict]:
     """Get a specific book by ID."""
-    conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
-    conn.close()
+    book = _fetch_one('book_by_id', (book_id,))
     return dict(book) if book else None
 
+def get_books_by_ids(book_ids: List[int]) -> List[Dict]:
+    """Get the books with the given IDs in one query, ordered by title like get_all_books."""
+    return [dict(book) for book in _fetch_all('books_by_ids', (json.dumps(list(book_ids)),))]
+
+def get_books_added_after(book_id: int) -> List[Dict]:
+    """Get the books with IDs above book_id (added after it; IDs are never reused), in title order."""
+    return [dict(book) for book in _fetch_all('books_added_after', (book_id,))]
+
+def get_available_copies(book_id: int) -> Optional[int]:
+    """Get a book's available copies, or None when there is no such book."""
+    row = _fetch_one('available_copies', (book_id,))
+    return row['available_copies'] if row else None
+
+def get_all_availability() -> List[Tuple[int, int]]:
+    """Get (book ID, available copies) for every book, in no particular order."""
+    return [(row['id'], row['available_copies']) for row in _fetch_all('all_availability')]
+
 def get_book_by_isbn(isbn: str) -> Optional[Dict]:
     """Get a specific book by ISBN."""
-    conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
-    conn.close()
+    book = _fetch_one('book_by_isbn', (isbn,))
     return dict(book) if book else None
 
+def get_books_by_isbns(isbns: List[str]) -> List[Dict]:
+    """Get the books with the given ISBNs in one query, in no particular order."""
+    return [dict(book) for book in _fetch_all('books_by_isbns', (json.dumps(list(isbns)),))]
+
 def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     """Get currently borrowed books for a patron."""
-    conn = get_db_connection()
-    records = conn.execute('''
-        SELECT br.*, b.title, b.author 
-        FROM borrow_records br 
-        JOIN books b ON br.book_id = b.id 
-        WHERE br.patron_id = ? AND br.return_date IS NULL
-        ORDER BY br.borrow_date
-    ''', (patron_id,)).fetchall()
-    conn.close()
+    records = _fetch_all('patron_open_loans', (patron_id,), shard_for_patron(patron_id))
 
+    now = to_epoch_seconds(datetime.now())
     borrowed_books = []
     for record in records:
         borrowed_books.append({
             'book_id': record['book_id'],
             'title': record['title'],
             'author': record['author'],
-            'borrow_date': datetime.fromisoformat(record['borrow_date']),
-            'due_date': datetime.fromisoformat(record['due_date']),
-            'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
+            'borrow_date': from_epoch_seconds(record['borrow_epoch']),
+            'due_date': from_epoch_seconds(record['due_epoch']),
+            'is_overdue': now > record['due_epoch']
         })
 
     return borrowed_books
 
 def get_patron_borrow_count(patron_id: str) -> int:
     """Get the number of books currently borrowed by a patron."""
-    conn = get_db_connection()
-    count = conn.execute('''
-        SELECT COUNT(*) as count FROM borrow_records 
-        WHERE patron_id = ? AND return_date IS NULL
-    ''', (patron_id,)).fetchone()['count']
+    row = _fetch_one('patron_loan_count', (patron_id,), shard_for_patron(patron_id))
+    return row['open_loan_count'] if row else 0
+
+def get_patron_borrow_counts(patron_ids: List[str]) -> Dict[str, int]:
+    """Get the number of books currently borrowed by each patron in one query, keyed by patron ID."""
+    counts = {patron_id: 0 for patron_id in patron_ids}
+    for shard, ids in _group_by_shard(counts, lambda patron_id: patron_id).items():
+        rows = _fetch_all('patron_loan_counts', (json.dumps(ids),), shard)
+        counts.update({row['patron_id']: row['open_loan_count'] for row in rows})
+    return counts
+
+def get_patron_account(patron_id: str) -> Dict:
+    """Get a patron's open loan count and outstanding late fees."""
+    row = _fetch_one('patron_account', (patron_id,), shard_for_patron(patron_id))
+    if row:
+        return dict(row)
+    return {'patron_id': patron_id, 'open_loan_count': 0, 'outstanding_fees': 0.0, 'fees_paid': 0.0}
+
+def get_open_borrow_records(patron_ids: List[str]) -> List[Dict]:
+    """Get the open borrow records of the given patrons in one query per shard, oldest first."""
+    records = []
+    for shard, ids in _group_by_shard(set(patron_ids), lambda patron_id: patron_id).items():
+        records.extend(dict(record) for record in _fetch_all('open_loans_for_patrons', (json.dumps(ids),), shard))
+    if len(records) > 1 and SHARD_DATABASES:
+        records.sort(key=lambda record: (record['borrow_date'], record['id']))
+    return records
+
+def get_overdue_borrow_records(as_of: datetime) -> List[Dict]:
+    """Get every open loan due before as_of, most overdue first."""
+    records = [dict(record) for record in _report_rows('overdue_loans', (to_epoch_seconds(as_of),))]
+    if SHARD_DATABASES:
+        records.sort(key=lambda record: record['due_epoch'])
+    return records
+
+def get_patron_borrow_history(patron_id: str) -> List[Dict]:
+    """Get every loan a patron has made, live and archived, newest first."""
+    if SHARD_DATABASES:
+        return [dict(record) for record in _fetch_all('patron_history', (patron_id,), shard_for_patron(patron_id))]
+    conn = get_report_connection()
+    records = conn.execute(QUERIES['patron_history'], (patron_id,)).fetchall()
     conn.close()
-    return count
+    return [dict(record) for record in records]
+
+def get_borrow_counts() -> Dict[int, int]:
+    """Get the total number of times each book has been borrowed, keyed by book ID."""
+    counts: Dict[int, int] = {}
+    for rows in _fan_out(lambda shard: _fetch_all('borrow_counts', (), shard)):
+        for row in rows:
+            counts[row['book_id']] = counts.get(row['book_id'], 0) + row['count']
+    return counts
+
+def get_events_since(cursor: int, limit: int = 100) -> List[Dict]:
+    """Get up to limit events with an id greater than cursor, oldest first."""
+    relay_shard_events()
+    rows = _fetch_all('events_since', (cursor, limit))
+    return [{'id': row['id'], 'type': row['event_type'], 'payload': json.loads(row['payload']),
+             'created_at': row['created_at']} for row in rows]
+
+def relay_shard_events(shard: Optional[int] = None) -> int:
+    """
+    Move the events waiting in one shard's outbox (every shard's when shard is
+    None) into the events table of DATABASE, in order, and publish them with
+    their new IDs. Each outbox moves in one transaction over both files, so an
+    event is never lost or relayed twice.
+
+    Returns:
+        int: number of events moved (-1 on error)
+    """
+    moved = 0
+    for index in ([shard] if shard is not None else range(len(SHARD_DATABASES or ()))):
+        if _fetch_one('outbox_pending', (), index) is None:
+            continue
+        conn = get_db_connection()
+        try:
+            conn.execute('ATTACH DATABASE ? AS shard', (SHARD_DATABASES[index],))
+            conn.execute('BEGIN IMMEDIATE')
+            events = _drain_outbox(conn, 'shard')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            conn.rollback()
+            conn.close()
+            return -1
+        _publish_events(events)
+        moved += len(events)
+    return moved
+
+def _drain_outbox(conn, schema: str) -> List[Dict]:
+    """Append the events of schema's outbox to main.events and empty it, on conn's open transaction."""
+    rows = conn.execute(f'SELECT * FROM {schema}.events ORDER BY id').fetchall()
+    if not rows:
+        return []
+    conn.executemany(QUERIES['insert_event'], [(row['event_type'], row['payload'], row['created_at']) for row in rows])
+    first_id = conn.execute(QUERIES['last_insert_id']).fetchone()['id'] - len(rows) + 1
+    conn.execute(f'DELETE FROM {schema}.events WHERE id <= ?', (rows[-1]['id'],))
+    return [{'id': first_id + i, 'type': row['event_type'], 'payload': json.loads(row['payload']),
+             'created_at': row['created_at']} for i, row in enumerate(rows)]
 
 def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
     """Insert a new book into the database."""
     conn = get_db_connection()
     try:
-        conn.execute('''
-            INSERT INTO books (title, author, isbn, total_copies, available_copies)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (title, author, isbn, total_copies, available_copies))
+        cursor = conn.execute(QUERIES['insert_book'], (title, author, isbn, total_copies, available_copies))
+        book = {'id': cursor.lastrowid, 'title': title, 'author': author, 'isbn': isbn,
+                'total_copies': total_copies, 'available_copies': available_copies}
+        events = _record_events(conn, [('book.inserted', book)])
         conn.commit()
         conn.close()
-        return True
     except Exception as e:
         conn.close()
         return False
 
+    _publish_events(events)
+    return True
+
 def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
     """Insert a new borrow record into the database."""
-    conn = get_db_connection()
+    shard = shard_for_patron(patron_id)
+    conn = _loan_connection(shard)
     try:
-        conn.execute('''
-            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
-            VALUES (?, ?, ?, ?)
-        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
+        cursor = conn.execute(QUERIES['insert_loan'], (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat(),
+                                                       to_epoch_seconds(borrow_date), to_epoch_seconds(due_date)))
+        conn.execute(QUERIES['adjust_patron'], (patron_id, 1, 0))
+        events = _record_events(conn, [('loan.created', {
+            'record_id': cursor.lastrowid, 'patron_id': patron_id, 'book_id': book_id,
+            'borrow_date': borrow_date.isoformat(), 'due_date': due_date.isoformat()})])
         conn.commit()
         conn.close()
-        return True
     except Exception as e:
         conn.close()
         return False
 
+    _deliver_events(shard, events)
+    return True
+
 def update_book_availability(book_id: int, change: int) -> bool:
     """Update the available copies of a book by a given amount (+1 for return, -1 for borrow)."""
     conn = get_db_connection()
     try:
-        conn.execute('''
-            UPDATE books SET available_copies = available_copies + ? WHERE id = ?
-        ''', (change, book_id))
+        conn.execute(QUERIES['adjust_availability'], (change, book_id))
+        events = _record_events(conn, [('book.availability_changed', {'book_id': book_id, 'change': change})])
         conn.commit()
         conn.close()
-        return True
     except Exception as e:
         conn.close()
         return False
 
+    _publish_events(events)
+    return True
+
 def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime) -> bool:
     """Update the return date for a borrow record."""
+    shard = shard_for_patron(patron_id)
+    conn = _loan_connection(shard)
+    try:
+        return_epoch = to_epoch_seconds(return_date)
+        closed = conn.execute(QUERIES['close_patron_loans'],
+                              (return_date.isoformat(), return_epoch, patron_id, book_id)).fetchall()
+        events = []
+        if closed:
+            _, fees = compute_late_fees([row['due_epoch'] for row in closed], return_epoch)
+            conn.execute(QUERIES['adjust_patron'], (patron_id, -len(closed), sum(fees)))
+            events = _record_events(conn, [('loan.returned', {
+                'record_id': row['id'], 'patron_id': patron_id, 'book_id': book_id,
+                'return_date': return_date.isoformat(), 'fee_amount': fee}) for row, fee in zip(closed, fees)])
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        conn.close()
+        return False
+
+    _deliver_events(shard, events)
+    return True
+
+def insert_borrow_records_batch(borrows: List[Tuple[str, int, datetime, datetime]]) -> bool:
+    """
+    Insert (patron_id, book_id, borrow_date, due_date) borrow records and take one
+    available copy per record, all in a single transaction (one per shard when
+    sharded; a False return then means the failing shard and those after it
+    were left unchanged).
+    """
+    return _write_batches(_insert_borrow_records, _group_by_shard(borrows, lambda borrow: borrow[0]))
+
+def _insert_borrow_records(conn, borrows: List[Tuple[str, int, datetime, datetime]]) -> List[Dict]:
+    conn.executemany(QUERIES['insert_loan'], [(patron_id, book_id, borrow_date.isoformat(), due_date.isoformat(),
+                                               to_epoch_seconds(borrow_date), to_epoch_seconds(due_date))
+                                              for patron_id, book_id, borrow_date, due_date in borrows])
+    first_record_id = conn.execute(QUERIES['last_insert_id']).fetchone()['id'] - len(borrows) + 1
+    conn.executemany(QUERIES['adjust_availability'], [(-1, book_id) for _, book_id, _, _ in borrows])
+    new_loans: Dict[str, int] = {}
+    for patron_id, _, _, _ in borrows:
+        new_loans[patron_id] = new_loans.get(patron_id, 0) + 1
+    conn.executemany(QUERIES['adjust_patron'], [(patron_id, count, 0) for patron_id, count in new_loans.items()])
+    changes = []
+    for i, (patron_id, book_id, borrow_date, due_date) in enumerate(borrows):
+        changes.append(('loan.created', {
+            'record_id': first_record_id + i, 'patron_id': patron_id, 'book_id': book_id,
+            'borrow_date': borrow_date.isoformat(), 'due_date': due_date.isoformat()}))
+        changes.append(('book.availability_changed', {'book_id': book_id, 'change': -1}))
+    return _record_events(conn, changes)
+
+def update_return_dates_batch(returns: List[Tuple[int, str, int, datetime, float]]) -> Optional[Set[int]]:
+    """
+    Close (record_id, patron_id, book_id, return_date, fee_amount) borrow records,
+    give the copies back and charge the fees, all in a single transaction (one
+    per shard when sharded, as for insert_borrow_records_batch). A record that
+    is already closed, e.g. by a concurrent return, changes nothing.
+
+    Returns:
+        set of the record IDs closed, or None on error
+    """
+    closed: Set[int] = set()
+    written = _write_batches(lambda conn, items: _close_borrow_records(conn, items, closed),
+                             _group_by_shard(returns, lambda loan: loan[1]))
+    return closed if written else None
+
+def _close_borrow_records(conn, loans: List[Tuple[int, str, int, datetime, float]],
+                          closed_ids: Set[int]) -> List[Dict]:
+    # One statement per loan: its rowcount tells whether this transaction closed the loan or it was already
+    # returned, and only closed loans give a copy back or charge a fee
+    returns = []
+    for loan in loans:
+        record_id, _, _, return_date, _ = loan
+        if conn.execute(QUERIES['close_loan'],
+                        (return_date.isoformat(), to_epoch_seconds(return_date), record_id)).rowcount:
+            returns.append(loan)
+            closed_ids.add(record_id)
+    conn.executemany(QUERIES['adjust_availability'], [(1, book_id) for _, _, book_id, _, _ in returns])
+    closed: Dict[str, List] = {}
+    for _, patron_id, _, _, fee_amount in returns:
+        totals = closed.setdefault(patron_id, [0, 0.0])
+        totals[0] -= 1
+        totals[1] += fee_amount
+    conn.executemany(QUERIES['adjust_patron'],
+                     [(patron_id, count, fees) for patron_id, (count, fees) in closed.items()])
+    changes = []
+    for record_id, patron_id, book_id, return_date, fee_amount in returns:
+        changes.append(('loan.returned', {
+            'record_id': record_id, 'patron_id': patron_id, 'book_id': book_id,
+            'return_date': return_date.isoformat(), 'fee_amount': fee_amount}))
+        changes.append(('book.availability_changed', {'book_id': book_id, 'change': 1}))
+    return _record_events(conn, changes)
+
+def _write_batches(write, batches: Dict[Optional[int], List]) -> bool:
+    """Apply write(conn, items) to each shard's items in its own transaction, then deliver the events."""
+    for shard, items in batches.items():
+        # Shard connections reach books through the attached catalog, in the same transaction
+        conn = _loan_connection(shard)
+        try:
+            events = write(conn, items)
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            conn.rollback()
+            conn.close()
+            return False
+        _deliver_events(shard, events)
+    return True
+
+def archive_closed_borrow_records(cutoff: datetime, batch_size: int) -> int:
+    """
+    Move up to batch_size loans returned before cutoff into the archive table
+    (of every shard when sharded).
+
+    Returns:
+        int: number of records moved (0 on error)
+    """
+    return sum(_fan_out(lambda shard: _archive_closed(shard, cutoff, batch_size)))
+
+def _archive_closed(shard: Optional[int], cutoff: datetime, batch_size: int) -> int:
+    conn = _loan_connection(shard)
+    try:
+        moved = conn.execute(QUERIES['archive_closed_loans'].format(archive=_archive_table()),
+                             (datetime.now().isoformat(), cutoff.isoformat(), batch_size)).rowcount
+        conn.execute(QUERIES['delete_archived_loans'], (cutoff.isoformat(), batch_size))
+        conn.commit()
+        conn.close()
+        return moved
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return 0
+
+def record_fee_payment(patron_id: str, amount: float, transaction_id: Optional[str] = None,
+                       book_id: Optional[int] = None) -> bool:
+    """Take a late fee payment off a patron's outstanding fees, adding the gateway charge to the payments ledger."""
+    conn = _loan_connection(shard_for_patron(patron_id))
+    try:
+        conn.execute(QUERIES['record_payment'], (patron_id, -amount, amount))
+        if transaction_id is not None:
+            # On a shard this writes catalog.payments, committed together with the patron row
+            conn.execute(QUERIES['insert_payment'], (transaction_id, 'charge', patron_id, book_id, amount,
+                                                     datetime.now().isoformat()))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def get_book_fees_owed(patron_id: str, book_id: int) -> float:
+    """
+    Late fees assessed on a patron's returned loans of one book (as at return),
+    less the charges for that book net of refunds in the payments ledger.
+    """
+    shard = shard_for_patron(patron_id)
+    loans = _fetch_all('returned_book_loans', (patron_id, book_id), shard)
+    _, fees = compute_late_fees([loan['due_epoch'] for loan in loans], [loan['return_epoch'] for loan in loans])
+    return round(sum(fees) - _fetch_one('book_fees_paid', (patron_id, book_id), shard)['paid'], 2)
+
+def record_refund(transaction_id: str, amount: float) -> bool:
+    """
+    Add a gateway refund of transaction_id to the payments ledger, under the
+    charge's patron and book, and put the refunded amount back on that patron's
+    outstanding fees (reversing record_fee_payment) in the same transaction.
+    """
+    charge = _fetch_one('payments_by_transaction', (transaction_id,))
+    patron_id = charge['patron_id'] if charge else None
+    conn = _loan_connection(shard_for_patron(patron_id)) if patron_id else get_db_connection()
+    try:
+        if patron_id:
+            conn.execute(QUERIES['record_payment'], (patron_id, amount, -amount))
+        # On a shard this writes catalog.payments, committed together with the patron row
+        conn.execute(QUERIES['insert_payment'], (transaction_id, 'refund', patron_id,
+                                                 charge['book_id'] if charge else None, amount,
+                                                 datetime.now().isoformat()))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def get_payments_by_transaction(transaction_id: str) -> List[Dict]:
+    """Ledger rows (the charge and any refunds) for one gateway transaction."""
+    return [dict(row) for row in _fetch_all('payments_by_transaction', (transaction_id,))]
+
+def start_reconciliation_run() -> Optional[Dict]:
+    """
+    The unfinished reconciliation run to resume, or a new one covering every
+    charge recorded so far. Returns None on error.
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        run = conn.execute(QUERIES['open_reconciliation_run']).fetchone()
+        if run is None:
+            upto = conn.execute(QUERIES['last_payment_id']).fetchone()['id']
+            run_id = conn.execute(QUERIES['insert_reconciliation_run'], (datetime.now().isoformat(), upto)).lastrowid
+            run = conn.execute(QUERIES['reconciliation_run'], (run_id,)).fetchone()
+        conn.commit()
+        conn.close()
+        return dict(run)
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return None
+
+def get_payments_to_reconcile(after_id: int, upto_id: int, limit: int) -> List[Dict]:
+    """Up to limit charges with after_id < id <= upto_id that have not been seen settled, in id order."""
+    return [dict(row) for row in _fetch_all('payments_to_reconcile', (after_id, upto_id, limit))]
+
+def save_reconciliation_chunk(run_id: int, last_payment_id: int, settled: List[int],
+                              discrepancies: List[Tuple]) -> bool:
+    """
+    Record one chunk of verified charges and move the run's checkpoint to
+    last_payment_id in the same transaction, so a crash repeats at most this chunk.
+
+    Args:
+        settled: payment IDs the gateway reported completed for their recorded amount
+        discrepancies: (payment_id, transaction_id, problem, recorded_amount, gateway_status, gateway_amount)
+    """
+    conn = get_db_connection()
+    try:
+        verified_at = datetime.now().isoformat()
+        conn.executemany(QUERIES['set_payment_status'],
+                         [('settled', verified_at, payment_id) for payment_id in settled])
+        conn.executemany(QUERIES['set_payment_status'],
+                         [('unsettled', verified_at, item[0]) for item in discrepancies])
+        conn.executemany(QUERIES['insert_discrepancy'], [(run_id, *item) for item in discrepancies])
+        conn.execute(QUERIES['advance_reconciliation_run'],
+                     (last_payment_id, len(settled) + len(discrepancies), len(discrepancies), run_id))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return False
+
+def finish_reconciliation_run(run_id: int) -> bool:
+    """Mark a reconciliation run complete, so the next start_reconciliation_run begins a new one."""
     conn = get_db_connection()
     try:
-        conn.execute('''
-            UPDATE borrow_records 
-            SET return_date = ? 
-            WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
-        ''', (return_date.isoformat(), patron_id, book_id))
+        conn.execute(QUERIES['finish_reconciliation_run'], (datetime.now().isoformat(), run_id))
         conn.commit()
         conn.close()
         return True
     except Exception as e:
         conn.close()
         return False
+
+def get_reconciliation_run(run_id: int) -> Optional[Dict]:
+    """One reconciliation run's checkpoint and totals."""
+    row = _fetch_one('reconciliation_run', (run_id,))
+    return dict(row) if row else None
+
+def get_payment_discrepancies(run_id: int) -> List[Dict]:
+    """Discrepancies found by one reconciliation run, in payment order."""
+    return [dict(row) for row in _fetch_all('run_discrepancies', (run_id,))]
+
+def repair_patron_accounts() -> int:
+    """
+    Recompute every patron's open_loan_count and outstanding_fees from the loan
+    history, inside one write transaction (per shard) so no borrow or return can
+    interleave.
+
+    Returns:
+        int: number of patron rows written (-1 on error)
+    """
+    written = _fan_out(_repair_patron_accounts)
+    return -1 if -1 in written else sum(written)
+
+def _repair_patron_accounts(shard: Optional[int]) -> int:
+    conn = _loan_connection(shard)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        accounts: Dict[str, List] = {}
+        for row in conn.execute(QUERIES['open_loan_counts']):
+            accounts[row['patron_id']] = [row['count'], 0.0]
+
+        returned = conn.execute(QUERIES['returned_loan_epochs']).fetchall()
+        _, fees = compute_late_fees([row['due_epoch'] for row in returned], [row['return_epoch'] for row in returned])
+        for row, fee in zip(returned, fees):
+            accounts.setdefault(row['patron_id'], [0, 0.0])[1] += fee
+
+        conn.execute(QUERIES['clear_patron_accounts'])
+        conn.executemany(QUERIES['set_patron_account'],
+                         [(patron_id, count, round(fees, 2)) for patron_id, (count, fees) in accounts.items()])
+        conn.commit()
+        conn.close()
+        return len(accounts)
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return -1
+
+def rebuild_circulation_rollups() -> int:
+    """
+    Recompute the daily rollups from the whole loan history and move the rollup
+    cursor to the newest event, inside one write transaction.
+
+    A return counts as overdue when it is at least one day late, as for R5 fees.
+    When sharded, every shard is attached (SQLite allows 10 by default) and
+    their outboxes are relayed in the same transaction, so the cursor matches
+    the loans counted.
+
+    Returns:
+        int: number of daily_book_stats rows written (-1 on error)
+    """
+    conn = get_db_connection()
+    events = []
+    try:
+        history = 'borrow_history'
+        if SHARD_DATABASES:
+            for shard, path in enumerate(SHARD_DATABASES):
+                conn.execute('ATTACH DATABASE ? AS ?', (path, f'shard{shard}'))
+            history = '(' + ' UNION ALL '.join(
+                f'SELECT * FROM shard{shard}.borrow_history' for shard in range(len(SHARD_DATABASES))) + ')'
+        conn.execute('BEGIN IMMEDIATE')
+        for shard in range(len(SHARD_DATABASES or ())):
+            events.extend(_drain_outbox(conn, f'shard{shard}'))
+        conn.execute(QUERIES['clear_book_stats'])
+        conn.execute(QUERIES['clear_daily_circulation'])
+        conn.execute(QUERIES['clear_book_circulation'])
+        conn.execute(QUERIES['rebuild_book_stats_borrows'].format(history=history))
+        conn.execute(QUERIES['rebuild_book_stats_returns'].format(history=history))
+        conn.execute(QUERIES['rebuild_daily_circulation'])
+        conn.execute(QUERIES['rebuild_book_circulation'])
+        conn.execute(QUERIES['reset_rollup_cursor'])
+        rows = conn.execute(QUERIES['book_stats_count']).fetchone()['count']
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return -1
+
+    _publish_events(events)
+    return rows
+
+def apply_circulation_events(limit: int = 10000) -> int:
+    """
+    Fold up to limit loan events past the rollup cursor into the daily rollups and
+    advance the cursor, in one write transaction so each event is counted once.
+
+    Returns:
+        int: number of loan events applied (-1 on error)
+    """
+    relay_shard_events()
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        state = conn.execute(QUERIES['rollup_cursor']).fetchone()
+        cursor = state['event_cursor'] if state else 0
+        rows = conn.execute(QUERIES['loan_events_after'], (cursor, limit)).fetchall()
+        if len(rows) == limit:
+            new_cursor = rows[-1]['id']
+        else:
+            # Nothing else can append while this transaction holds the write lock
+            new_cursor = conn.execute(QUERIES['last_event_id_or'], (cursor,)).fetchone()['id']
+
+        events = [(row['event_type'], json.loads(row['payload'])) for row in rows]
+        returned = [payload for event_type, payload in events if event_type == 'loan.returned']
+        loans = {}
+        for shard, payloads in _group_by_shard(returned, lambda payload: payload['patron_id']).items():
+            returned_ids = json.dumps([payload['record_id'] for payload in payloads])
+            rows = (conn.execute(QUERIES['loan_epochs_by_ids'], (returned_ids,)) if shard is None
+                    else _fetch_all('loan_epochs_by_ids', (returned_ids,), shard))
+            loans.update({loan['id']: loan for loan in rows})
+
+        deltas: Dict[Tuple[int, int], List[int]] = {}
+        for event_type, payload in events:
+            if event_type == 'loan.created':
+                day = to_epoch_day(datetime.fromisoformat(payload['borrow_date']))
+                deltas.setdefault((day, payload['book_id']), [0, 0, 0, 0])[0] += 1
+            elif payload['record_id'] in loans:
+                loan = loans[payload['record_id']]
+                return_epoch = to_epoch_seconds(datetime.fromisoformat(payload['return_date']))
+                totals = deltas.setdefault((return_epoch // SECONDS_PER_DAY, payload['book_id']), [0, 0, 0, 0])
+                totals[1] += 1
+                totals[2] += return_epoch - loan['due_epoch'] >= SECONDS_PER_DAY
+                totals[3] += return_epoch - loan['borrow_epoch']
+
+        conn.executemany(QUERIES['adjust_book_stats'], [(day, book_id, *totals) for (day, book_id), totals in deltas.items()])
+        per_day: Dict[int, List[int]] = {}
+        per_book: Dict[int, List[int]] = {}
+        for (day, book_id), totals in deltas.items():
+            per_day[day] = [a + b for a, b in zip(per_day.get(day, [0, 0, 0, 0]), totals)]
+            per_book[book_id] = [a + b for a, b in zip(per_book.get(book_id, [0, 0, 0, 0]), totals)]
+        conn.executemany(QUERIES['adjust_daily_circulation'], [(day, *totals) for day, totals in per_day.items()])
+        conn.executemany(QUERIES['adjust_book_circulation'], [(book_id, *totals) for book_id, totals in per_book.items()])
+        conn.execute(QUERIES['set_rollup_cursor'], (new_cursor,))
+        conn.commit()
+        conn.close()
+        return len(events)
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return -1
+
+def get_top_borrowed_books(since_day: int, limit: int) -> List[Dict]:
+    """Get the most borrowed books from since_day (days since the epoch) on, from the rollups."""
+    conn = get_report_connection()
+    rows = conn.execute(QUERIES['top_borrowed_books'], (since_day, limit)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def get_daily_circulation(since_day: int) -> List[Dict]:
+    """Get the per-day circulation totals from since_day on, oldest first."""
+    conn = get_report_connection()
+    rows = conn.execute(QUERIES['daily_circulation'], (since_day,)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def get_loan_totals_by_author() -> List[Dict]:
+    """Get returned-loan counts and total loan seconds per author, from the rollups."""
+    conn = get_report_connection()
+    rows = conn.execute(QUERIES['loan_totals_by_author']).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def get_loan_columns() -> Tuple[array, array, array, array]:
+    """
+    Read book_id, borrow_epoch, due_epoch and return_epoch (-1 while open) of every
+    loan, live and archived, into four parallel arrays.
+    """
+    if not SHARD_DATABASES:
+        return _read_loan_columns(get_report_connection())
+    columns = (array('q'), array('q'), array('q'), array('q'))
+    for shard_columns in _fan_out(lambda shard: _read_loan_columns(get_shard_connection(shard))):
+        for column, values in zip(columns, shard_columns):
+            column.extend(values)
+    return columns
+
+def _read_loan_columns(conn) -> Tuple[array, array, array, array]:
+    """Read the loan_columns query on conn into four arrays and close conn."""
+    conn.row_factory = None
+    columns = (array('q'), array('q'), array('q'), array('q'))
+    cursor = conn.execute(QUERIES['loan_columns'])
+    while True:
+        rows = cursor.fetchmany(50000)
+        if not rows:
+            break
+        for column, values in zip(columns, zip(*rows)):
+            column.extend(values)
+    conn.close()
+    return columns
+
+def get_patron_baskets(max_books: int) -> Tuple[List[str], array, array]:
+    """
+    Read the distinct books every patron has borrowed, live and archived, most
+    recently borrowed first and at most max_books per patron. Reads the primary,
+    not the replica, as callers follow later loans from the event log.
+
+    Returns:
+        tuple: (patron IDs, offsets, book IDs) where patron i's books are
+        book_ids[offsets[i]:offsets[i + 1]]
+    """
+    if not SHARD_DATABASES:
+        return _read_patron_baskets(get_db_connection(), max_books)
+    patron_ids, offsets, book_ids = [], array('q', [0]), array('q')
+    for shard_patrons, shard_offsets, shard_books in _fan_out(
+            lambda shard: _read_patron_baskets(get_shard_connection(shard), max_books)):
+        patron_ids += shard_patrons
+        offsets.extend(len(book_ids) + offset for offset in shard_offsets[1:])
+        book_ids.extend(shard_books)
+    return patron_ids, offsets, book_ids
+
+def _read_patron_baskets(conn, max_books: int) -> Tuple[List[str], array, array]:
+    """Read the patron_baskets query on conn into get_patron_baskets' arrays and close conn."""
+    conn.row_factory = None
+    patron_ids, offsets, book_ids = [], array('q', [0]), array('q')
+    cursor = conn.execute(QUERIES['patron_baskets'])
+    taken = 0
+    while True:
+        rows = cursor.fetchmany(50000)
+        if not rows:
+            break
+        for patron_id, book_id in rows:
+            if not patron_ids or patron_id != patron_ids[-1]:
+                if patron_ids:
+                    offsets.append(len(book_ids))
+                patron_ids.append(patron_id)
+                taken = 0
+            if taken < max_books:
+                book_ids.append(book_id)
+                taken += 1
+    if patron_ids:
+        offsets.append(len(book_ids))
+    conn.close()
+    return patron_ids, offsets, book_ids
+
+def get_co_borrow_counts(book_id: int) -> Dict[int, int]:
+    """Get how many patrons borrowed each other book as well as book_id, keyed by book ID (a full scan)."""
+    counts: Dict[int, int] = {}
+    for rows in _fan_out(lambda shard: _fetch_all('co_borrow_counts', (book_id,), shard)):
+        for row in rows:
+            counts[row['book_id']] = counts.get(row['book_id'], 0) + row['patrons']
+    return counts
@@ -0,0 +1,95 @@
+"""
+Admin Routes - Profiling controls, profile downloads and SQL diagnostics
+Every endpoint requires the X-Profile-Token header and 404s while profiling is disabled
+"""
+
+import math
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+from services.profiling import (
+    profile_store, check_token, start_global_sampling, stop_global_sampling, global_sampler_folded,
+    SAMPLE_INTERVAL_SECONDS, MIN_SAMPLE_INTERVAL_SECONDS
+)
+from services.query_tracer import slow_query_log, repeated_query_log
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+@admin_bp.before_request
+def require_profiling_token():
+    """Hide the admin endpoints unless profiling is enabled and the token matches."""
+    if not current_app.config.get('PROFILING_TOKEN'):
+        abort(404)
+    if not check_token(current_app, request.headers.get('X-Profile-Token')):
+        abort(403)
+
+@admin_bp.route('/profiles')
+def list_profiles():
+    """
+    List stored request and sampling profiles, newest first.
+    """
+    profiles = profile_store.summaries()
+    return jsonify({'profiles': profiles, 'count': len(profiles)})
+
+@admin_bp.route('/profiles/<profile_id>')
+def download_profile(profile_id):
+    """
+    Download one profile: the cProfile text report or folded stacks, or with
+    ?format=pstats the raw cProfile data for snakeviz/pstats.
+    """
+    profile = profile_store.get(profile_id)
+    if not profile:
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    if request.args.get('format') == 'pstats':
+        if profile['raw'] is None:
+            return jsonify({'error': 'Only cProfile profiles have pstats data'}), 400
+        return Response(profile['raw'], mimetype='application/octet-stream',
+                        headers={'Content-Disposition': f'attachment; filename={profile_id}.pstats'})
+    
+    return Response(profile['report'], mimetype='text/plain')
+
+@admin_bp.route('/profiling/sampler', methods=['GET', 'POST', 'DELETE'])
+def global_sampler():
+    """
+    POST starts sampling every thread (?interval= seconds, raised to at least
+    MIN_SAMPLE_INTERVAL_SECONDS), GET returns the stacks folded so far, DELETE
+    stops sampling and stores the result.
+    """
+    if request.method == 'POST':
+        try:
+            interval = float(request.args.get('interval', SAMPLE_INTERVAL_SECONDS))
+        except ValueError:
+            interval = None
+        if interval is None or not math.isfinite(interval) or interval <= 0:
+            return jsonify({'error': 'interval must be a positive number of seconds'}), 400
+        interval = max(interval, MIN_SAMPLE_INTERVAL_SECONDS)
+        if not start_global_sampling(interval):
+            return jsonify({'error': 'Sampling is already running'}), 409
+        return jsonify({'sampling': True, 'interval': interval})
+    
+    if request.method == 'DELETE':
+        profile_id = stop_global_sampling()
+        if not profile_id:
+            return jsonify({'error': 'Sampling is not running'}), 409
+        return jsonify({'sampling': False, 'profile_id': profile_id})
+    
+    folded = global_sampler_folded()
+    if folded is None:
+        return jsonify({'error': 'Sampling is not running'}), 409
+    return Response(folded, mimetype='text/plain')
+
+@admin_bp.route('/queries/slow')
+def slow_queries():
+    """
+    Statements that exceeded SQL_SLOW_QUERY_MS, with their query plans, newest first.
+    """
+    entries = list(reversed(slow_query_log))
+    return jsonify({'queries': entries, 'count': len(entries)})
+
+@admin_bp.route('/queries/repeated')
+def repeated_queries():
+    """
+    Requests that ran one statement shape more than SQL_REPEAT_THRESHOLD times, newest first.
+    """
+    entries = list(reversed(repeated_query_log))
+    return jsonify({'requests': entries, 'count': len(entries)})
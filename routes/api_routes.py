@@ -2,19 +2,251 @@
 API Routes - JSON API endpoints
 """
 
-from flask import Blueprint, jsonify, request
-from services.library_service import calculate_late_fee_for_book, search_books_in_catalog
+from flask import Blueprint, current_app, request
+from services.library_service import (
+    calculate_late_fee_for_book,
+    search_books_in_catalog,
+    suggest_books,
+    get_related_books,
+    borrow_books_batch,
+    return_books_batch,
+    lookup_books_by_ids,
+    lookup_books_by_isbns
+)
+from services.event_service import wait_for_events
+from services.write_coalescer import current_write_coalescer
+from services.analytics import top_books, daily_circulation, loan_duration_by_author
+from database import get_replica_lag
+from routes.serialization import render_body
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+# Largest number of items accepted by one batch request
+MAX_BATCH_ITEMS = 1000
+
+# Largest number of IDs or ISBNs resolved by one lookup request
+MAX_LOOKUP_ITEMS = 10000
+
+# Book IDs are SQLite INTEGERs: signed 64-bit
+MIN_BOOK_ID = -2**63
+MAX_BOOK_ID = 2**63 - 1
+
+# Longest window and largest result the stats endpoints serve
+MAX_STATS_DAYS = 3660
+MAX_STATS_LIMIT = 1000
+
+def _parse_batch_items(payload):
+    """
+    Read {"items": [{"patron_id": ..., "book_id": ...}, ...]} from a batch request.
+
+    Returns:
+        tuple: (items: list of (patron_id, book_id) or None, error: str or None)
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('items'), list):
+        return None, 'Request body must be a JSON object with an "items" list'
+    
+    if len(payload['items']) > MAX_BATCH_ITEMS:
+        return None, f'A batch may contain at most {MAX_BATCH_ITEMS} items'
+    
+    items = []
+    for item in payload['items']:
+        if not isinstance(item, dict):
+            return None, 'Each item must be an object with patron_id and book_id'
+        book_id = item.get('book_id')
+        if not isinstance(book_id, int) or isinstance(book_id, bool):
+            return None, 'Each item must have an integer book_id'
+        items.append((str(item.get('patron_id', '')).strip(), book_id))
+    
+    return items, None
+
+def _apply_batch(kind, items, apply):
+    """Run a batch through the write coalescer when one is installed, else apply it directly."""
+    coalescer = current_write_coalescer()
+    if coalescer is not None:
+        try:
+            return [future.result() for future in coalescer.submit_many(kind, items)]
+        except RuntimeError:  # stopped between the lookup and the submit
+            pass
+    return apply(items)
+
+# The *_body functions below hold each endpoint's logic, from parsed arguments to a
+# (JSON body, status) pair, so the blueprint and the ASGI API in routes/async_api.py
+# serve the same responses
+
+def _lookup_body(ids, isbns):
+    """Resolve one of ids or isbns (lists from the query string or JSON body) into a lookup response."""
+    if (ids is None) == (isbns is None):
+        return {'error': 'Provide either ids or isbns'}, 400
+    
+    keys = ids if ids is not None else isbns
+    if len(keys) > MAX_LOOKUP_ITEMS:
+        return {'error': f'A lookup may contain at most {MAX_LOOKUP_ITEMS} items'}, 400
+    
+    if ids is not None:
+        if not all(isinstance(book_id, int) and not isinstance(book_id, bool) for book_id in ids):
+            return {'error': 'ids must be integers'}, 400
+        if not all(MIN_BOOK_ID <= book_id <= MAX_BOOK_ID for book_id in ids):
+            return {'error': 'ids must be 64-bit integers'}, 400
+        result = lookup_books_by_ids(ids)
+    else:
+        if not all(isinstance(isbn, str) for isbn in isbns):
+            return {'error': 'isbns must be strings'}, 400
+        result = lookup_books_by_isbns([isbn.strip() for isbn in isbns])
+    
+    return {**result, 'count': len(result['books'])}, 200
+
+def lookup_books_body(args):
+    """GET /api/books from its query arguments."""
+    ids = args.get('ids')
+    isbns = args.get('isbns')
+    if ids is not None:
+        try:
+            ids = [int(book_id) for book_id in ids.split(',') if book_id.strip()]
+        except ValueError:
+            return {'error': 'ids must be integers'}, 400
+    if isbns is not None:
+        isbns = [isbn for isbn in isbns.split(',') if isbn.strip()]
+    
+    return _lookup_body(ids, isbns)
+
+def lookup_books_post_body(payload):
+    """POST /api/books/lookup from its JSON body (None when missing or invalid)."""
+    if not isinstance(payload, dict):
+        return {'error': 'Request body must be a JSON object with an "ids" or "isbns" list'}, 400
+    ids = payload.get('ids')
+    isbns = payload.get('isbns')
+    if not isinstance(ids, (list, type(None))) or not isinstance(isbns, (list, type(None))):
+        return {'error': 'ids and isbns must be lists'}, 400
+    
+    return _lookup_body(ids, isbns)
+
+def late_fee_body(patron_id, book_id):
+    """GET /api/late_fee/<patron_id>/<book_id>."""
+    result = calculate_late_fee_for_book(patron_id, book_id)
+    return result, 501 if 'not implemented' in result.get('status', '') else 200
+
+def search_body(args):
+    """GET /api/search from its query arguments."""
+    search_term = args.get('q', '').strip()
+    search_type = args.get('type', 'title')
+    
+    if not search_term:
+        return {'error': 'Search term is required'}, 400
+    
+    # Use business logic function
+    books = search_books_in_catalog(search_term, search_type)
+    
+    return {
+        'search_term': search_term,
+        'search_type': search_type,
+        'results': books,
+        'count': len(books)
+    }, 200
+
+def suggest_body(args):
+    """GET /api/suggest from its query arguments."""
+    prefix = args.get('q', '').strip()
+    suggest_type = args.get('type', 'title')
+    limit = args.get('limit', 10, type=int)
+    
+    if not prefix:
+        return {'error': 'Search term is required'}, 400
+    
+    if suggest_type not in ('title', 'author'):
+        return {'error': 'Suggestion type must be title or author'}, 400
+    
+    suggestions = suggest_books(prefix, suggest_type, limit)
+    
+    return {
+        'query': prefix,
+        'type': suggest_type,
+        'suggestions': suggestions,
+        'count': len(suggestions)
+    }, 200
+
+def related_books_body(book_id, args):
+    """GET /api/books/<book_id>/related from the book ID and query arguments."""
+    limit = args.get('limit', 10, type=int)
+    
+    books = get_related_books(book_id, limit or 10)
+    if books is None:
+        return {'error': 'Book not found'}, 404
+    
+    return {
+        'book_id': book_id,
+        'related': books,
+        'count': len(books)
+    }, 200
+
+def batch_body(kind, payload):
+    """POST /api/borrows/batch (kind 'borrow') or /api/returns/batch (kind 'return') from its JSON body."""
+    items, error = _parse_batch_items(payload)
+    if error:
+        return {'error': error}, 400
+    
+    results = _apply_batch(kind, items, borrow_books_batch if kind == 'borrow' else return_books_batch)
+    succeeded = sum(1 for result in results if result['success'])
+    return {
+        'results': results,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded
+    }, 200
+
+def events_args(args):
+    """
+    Read the since/limit/timeout arguments of GET /api/events.
+
+    Returns:
+        tuple: ((since, limit, timeout) or None, error body or None)
+    """
+    since = args.get('since', 0, type=int)
+    limit = args.get('limit', 100, type=int)
+    timeout = args.get('timeout', 0.0, type=float)
+    
+    if since < 0:
+        return None, {'error': 'Cursor must be a non-negative event ID'}
+    return (since, limit, timeout), None
+
+def events_body(since, events):
+    """GET /api/events response for the events read after since."""
+    return {
+        'events': events,
+        'count': len(events),
+        'next_cursor': events[-1]['id'] if events else since
+    }
+
+def _respond(body, status=200):
+    """Response for body in the format, fields and encoding the request asked for (see routes.serialization)."""
+    data, headers = render_body(body, request.headers.get('Accept'), request.headers.get('Accept-Encoding'),
+                                request.args.get('fields'), current_app.config['API_GZIP_MIN_BYTES'])
+    return current_app.response_class(data, status=status, headers=headers)
+
+@api_bp.route('/books')
+def lookup_books_api():
+    """
+    Resolve a comma-separated ?ids= or ?isbns= list into books, reporting misses.
+    Multi-get over R2 catalog display
+    """
+    body, status = lookup_books_body(request.args)
+    return _respond(body, status)
+
+@api_bp.route('/books/lookup', methods=['POST'])
+def lookup_books_post_api():
+    """
+    Resolve {"ids": [...]} or {"isbns": [...]} into books, for lists too long for a URL.
+    Multi-get over R2 catalog display
+    """
+    body, status = lookup_books_post_body(request.get_json(silent=True))
+    return _respond(body, status)
+
 @api_bp.route('/late_fee/<patron_id>/<int:book_id>')
 def get_late_fee(patron_id, book_id):
     """
     Calculate late fee for a specific book borrowed by a patron.
     API endpoint for R4: Late Fee Calculation
     """
-    result = calculate_late_fee_for_book(patron_id, book_id)
-    return jsonify(result), 501 if 'not implemented' in result.get('status', '') else 200
+    body, status = late_fee_body(patron_id, book_id)
+    return _respond(body, status)
 
 @api_bp.route('/search')
 def search_books_api():
@@ -22,18 +254,114 @@ def search_books_api():
     Search for books via API endpoint.
     Alternative API interface for R5: Book Search Functionality
     """
-    search_term = request.args.get('q', '').strip()
-    search_type = request.args.get('type', 'title')
+    body, status = search_body(request.args)
+    return _respond(body, status)
+
+@api_bp.route('/suggest')
+def suggest_books_api():
+    """
+    Autocomplete titles or authors as the user types.
+    Typeahead support for R6: Book Search Functionality
+    """
+    body, status = suggest_body(request.args)
+    return _respond(body, status)
+
+@api_bp.route('/books/<int:book_id>/related')
+def related_books_api(book_id):
+    """
+    Books most often borrowed by patrons who borrowed this one.
+    Recommendations over R3 borrowing history
+    """
+    body, status = related_books_body(book_id, request.args)
+    return _respond(body, status)
+
+@api_bp.route('/borrows/batch', methods=['POST'])
+def borrow_books_batch_api():
+    """
+    Borrow many books in one transaction.
+    Batch interface for R3: Book Borrowing
+    """
+    body, status = batch_body('borrow', request.get_json(silent=True))
+    return _respond(body, status)
+
+@api_bp.route('/returns/batch', methods=['POST'])
+def return_books_batch_api():
+    """
+    Return many books in one transaction, reporting late fees per item.
+    Batch interface for R4: Book Return Processing
+    """
+    body, status = batch_body('return', request.get_json(silent=True))
+    return _respond(body, status)
+
+@api_bp.route('/events')
+def events_api():
+    """
+    Follow catalog and loan changes from a cursor, long-polling when caught up.
+    Change feed over R1, R3 and R4 writes
+    """
+    params, error = events_args(request.args)
+    if error:
+        return _respond(error, 400)
     
-    if not search_term:
-        return jsonify({'error': 'Search term is required'}), 400
+    since, limit, timeout = params
+    return _respond(events_body(since, wait_for_events(since, limit, timeout)))
+
+@api_bp.route('/metrics')
+def metrics_api():
+    """
+    Operational metrics for monitoring.
+    """
+    admission = current_app.extensions.get('admission')
+    return _respond({
+        'replica_lag_seconds': get_replica_lag(),
+        'admission': admission.metrics() if admission else None
+    })
+
+def _stats_window():
+    """
+    Read the ?days= window shared by the stats endpoints.
+
+    Returns:
+        tuple: (days: int or None, error: str or None)
+    """
+    days = request.args.get('days', 30, type=int)
+    if days is None or not 1 <= days <= MAX_STATS_DAYS:
+        return None, f'days must be between 1 and {MAX_STATS_DAYS}'
+    return days, None
+
+@api_bp.route('/stats/top-books')
+def top_books_stats_api():
+    """
+    Most borrowed books over the last ?days= days, from the daily rollups.
+    Circulation statistics over R3 borrowing
+    """
+    days, error = _stats_window()
+    if error:
+        return _respond({'error': error}, 400)
+    limit = max(1, min(request.args.get('limit', 100, type=int) or 100, MAX_STATS_LIMIT))
     
-    # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    books = top_books(days, limit)
     
-    return jsonify({
-        'search_term': search_term,
-        'search_type': search_type,
-        'results': books,
-        'count': len(books)
-    })
+    return _respond({'days': days, 'books': books, 'count': len(books)})
+
+@api_bp.route('/stats/circulation')
+def circulation_stats_api():
+    """
+    Borrows, returns and overdue returns per day over the last ?days= days.
+    Circulation statistics over R3 and R4
+    """
+    days, error = _stats_window()
+    if error:
+        return _respond({'error': error}, 400)
+    
+    return _respond({'days': days, 'daily': daily_circulation(days)})
+
+@api_bp.route('/stats/loan-duration')
+def loan_duration_stats_api():
+    """
+    Average loan length per author over all returned loans.
+    Circulation statistics over R4 returns
+    """
+    authors = loan_duration_by_author()
+    
+    return _respond({'authors': authors, 'count': len(authors)})
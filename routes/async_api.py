@@ -0,0 +1,170 @@
+"""
+Async API Routes - The JSON API endpoints as a native ASGI application
+Same request handling as routes/api_routes.py; the service calls are awaited on the DB executor
+"""
+
+import json
+from urllib.parse import parse_qsl
+
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, Rule
+
+from routes.api_routes import (
+    lookup_books_body, lookup_books_post_body, late_fee_body, search_body, suggest_body, related_books_body,
+    batch_body, events_args, events_body
+)
+from routes.serialization import render_body
+from services.admission import shed_status
+from services.async_executor import run_blocking
+from services.event_service import wait_for_events_async
+
+# Endpoints served natively; any other /api path is passed on to the Flask app
+ASYNC_API_RULES = Map([
+    Rule('/api/books', endpoint='books', methods=['GET']),
+    Rule('/api/books/lookup', endpoint='books_lookup', methods=['POST']),
+    Rule('/api/late_fee/<patron_id>/<int:book_id>', endpoint='late_fee', methods=['GET']),
+    Rule('/api/search', endpoint='search', methods=['GET']),
+    Rule('/api/suggest', endpoint='suggest', methods=['GET']),
+    Rule('/api/books/<int:book_id>/related', endpoint='related', methods=['GET']),
+    Rule('/api/borrows/batch', endpoint='borrows_batch', methods=['POST']),
+    Rule('/api/returns/batch', endpoint='returns_batch', methods=['POST']),
+    Rule('/api/events', endpoint='events', methods=['GET']),
+])
+
+
+async def read_body(receive) -> bytes:
+    """Collect the whole request body from ASGI http.request messages."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+def _json_payload(scope, body: bytes):
+    """The JSON body, or None when it is missing, not JSON or not sent as JSON (like get_json(silent=True))."""
+    headers = dict(scope['headers'])
+    content_type = headers.get(b'content-type', b'').decode('latin-1').split(';')[0].strip().lower()
+    if content_type != 'application/json' and not content_type.endswith('+json'):
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+async def _books(args, payload, params):
+    return await run_blocking(lookup_books_body, args)
+
+
+async def _books_lookup(args, payload, params):
+    return await run_blocking(lookup_books_post_body, payload)
+
+
+async def _late_fee(args, payload, params):
+    return await run_blocking(late_fee_body, params['patron_id'], params['book_id'])
+
+
+async def _search(args, payload, params):
+    return await run_blocking(search_body, args)
+
+
+async def _suggest(args, payload, params):
+    return await run_blocking(suggest_body, args)
+
+
+async def _related(args, payload, params):
+    return await run_blocking(related_books_body, params['book_id'], args)
+
+
+async def _borrows_batch(args, payload, params):
+    return await run_blocking(batch_body, 'borrow', payload)
+
+
+async def _returns_batch(args, payload, params):
+    return await run_blocking(batch_body, 'return', payload)
+
+
+async def _events(args, payload, params):
+    parsed, error = events_args(args)
+    if error:
+        return error, 400
+    since, limit, timeout = parsed
+    return events_body(since, await wait_for_events_async(since, limit, timeout)), 200
+
+
+HANDLERS = {
+    'books': _books,
+    'books_lookup': _books_lookup,
+    'late_fee': _late_fee,
+    'search': _search,
+    'suggest': _suggest,
+    'related': _related,
+    'borrows_batch': _borrows_batch,
+    'returns_batch': _returns_batch,
+    'events': _events,
+}
+
+
+class AsyncApi:
+    """
+    ASGI application serving ASYNC_API_RULES natively and passing every other
+    request to fallback (the Flask app behind a WSGI bridge). Responses are rendered
+    by routes.serialization with the Flask app's settings, as the blueprint renders them,
+    and with admission control on, each request takes the gate of the Flask endpoint
+    it mirrors.
+    """
+
+    def __init__(self, flask_app, fallback):
+        self.flask_app = flask_app
+        self.fallback = fallback
+        self.rules = ASYNC_API_RULES.bind('localhost')
+        self.flask_rules = flask_app.url_map.bind('localhost')
+
+    def _admission_gate(self, scope):
+        """The admission gate for this request, or None when admission control is off or the endpoint is exempt."""
+        controller = self.flask_app.extensions.get('admission')
+        if controller is None:
+            return None
+        endpoint, _ = self.flask_rules.match(scope['path'], method=scope['method'])
+        return controller.gate_for(endpoint.rpartition('.')[0] or 'app', endpoint, scope['method'])
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.fallback(scope, receive, send)
+        try:
+            endpoint, params = self.rules.match(scope['path'], method=scope['method'])
+        except HTTPException:
+            return await self.fallback(scope, receive, send)
+
+        args = MultiDict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True))
+        payload = _json_payload(scope, await read_body(receive)) if scope['method'] == 'POST' else None
+
+        gate = self._admission_gate(scope)
+        reason = await run_blocking(gate.acquire) if gate is not None else None
+        extra_headers = []
+        if reason is not None:
+            status, message = shed_status(reason)
+            body = {'error': message}
+            extra_headers.append(('Retry-After', str(self.flask_app.extensions['admission'].retry_after)))
+        else:
+            try:
+                body, status = await HANDLERS[endpoint](args, payload, params)
+            finally:
+                if gate is not None:
+                    gate.release()
+
+        headers = {name.lower(): value.decode('latin-1') for name, value in scope['headers']}
+        data, response_headers = render_body(body, headers.get(b'accept'), headers.get(b'accept-encoding'),
+                                             args.get('fields'), self.flask_app.config['API_GZIP_MIN_BYTES'])
+        response_headers.extend(extra_headers)
+        response_headers.append(('Content-Length', str(len(data))))
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                for name, value in response_headers]})
+        await send({'type': 'http.response.body', 'body': data})
@@ -2,9 +2,11 @@
 Catalog Routes - Book catalog related endpoints
 """
 
+from itertools import chain, islice
+
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import get_all_books
-from services.library_service import add_book_to_catalog
+from services.library_service import add_book_to_catalog, iter_catalog_books
+from routes.streaming import stream_page
 
 catalog_bp = Blueprint('catalog', __name__)
 
@@ -19,8 +21,11 @@ def catalog():
     Display all books in the catalog.
     Implements R2: Book Catalog Display
     """
-    books = get_all_books()
-    return render_template('catalog.html', books=books)
+    books = iter_catalog_books()
+    # Read the first page up front: database errors still produce a normal error
+    # response, and the template can tell an empty catalog from a streamed one
+    first = list(islice(books, 1))
+    return stream_page('catalog.html', books=chain(first, books) if first else [])
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
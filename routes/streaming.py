@@ -0,0 +1,38 @@
+"""
+Streaming - Send rendered pages to the client while the template is still running
+"""
+
+from typing import Iterable, Iterator
+
+from flask import Response, get_flashed_messages, stream_template
+
+# Rendered characters gathered before each write, so a large table goes out in
+# a few dozen chunks rather than one per template output statement
+STREAM_BUFFER_CHARS = 16384
+
+
+def _buffered(chunks: Iterable[str], size: int) -> Iterator[str]:
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_page(template_name: str, **context) -> Response:
+    """
+    Render template_name as a streamed response: the first bytes go out as soon
+    as the page header is rendered and peak memory stays at one buffer plus
+    whatever the context iterators hold.
+    """
+    # The session cookie is written before the body is rendered, so the flashed
+    # messages are taken out of the session now; the template gets them from the request
+    get_flashed_messages()
+    return Response(_buffered(stream_template(template_name, **context), STREAM_BUFFER_CHARS),
+                    mimetype='text/html')
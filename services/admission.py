@@ -0,0 +1,175 @@
+"""
+Admission Control Module - Per-blueprint concurrency limits with bounded wait queues
+Sheds excess requests quickly so a slow dependency cannot tie up every worker
+"""
+
+import math
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from flask import g, jsonify, make_response, request
+
+# Requests a blueprint runs at once, per kind; reads and writes have separate budgets
+READ_CONCURRENCY = 32
+WRITE_CONCURRENCY = 8
+
+# Requests allowed to wait for a slot, and how long each may wait, before being turned away
+QUEUE_SIZE = 16
+QUEUE_TIMEOUT = 1.0
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class AdmissionGate:
+    """
+    Counting gate: up to max_concurrent holders, up to max_waiting waiters.
+
+    acquire() returns None once admitted, 'queue_full' when the wait queue is
+    already full, or 'timeout' when no slot freed up within wait_timeout
+    seconds. Every admitted acquire must be paired with release().
+    """
+
+    def __init__(self, max_concurrent: int, max_waiting: int = QUEUE_SIZE, wait_timeout: float = QUEUE_TIMEOUT):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_waiting = max(0, max_waiting)
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.peak_waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> Optional[str]:
+        with self._cond:
+            if self.active < self.max_concurrent and self.waiting == 0:
+                self.active += 1
+                self.admitted += 1
+                return None
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                return 'queue_full'
+
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            deadline = time.monotonic() + self.wait_timeout
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        return 'timeout'
+                    self._cond.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+                return None
+            finally:
+                self.waiting -= 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            return {'active': self.active, 'waiting': self.waiting, 'limit': self.max_concurrent,
+                    'queue_size': self.max_waiting, 'admitted': self.admitted, 'rejected': self.rejected,
+                    'timed_out': self.timed_out, 'peak_waiting': self.peak_waiting}
+
+
+class AdmissionController:
+    """
+    One AdmissionGate per (blueprint, 'read' or 'write'), created on first use.
+
+    limits overrides the default budgets per blueprint, e.g.
+    {'borrowing': {'write': 4}, 'catalog': {'read': 64}}. Blueprints and
+    endpoints named in exempt bypass the gates.
+    """
+
+    def __init__(self, read_limit: int = READ_CONCURRENCY, write_limit: int = WRITE_CONCURRENCY,
+                 queue_size: int = QUEUE_SIZE, queue_timeout: float = QUEUE_TIMEOUT,
+                 limits: Optional[Dict[str, Dict[str, int]]] = None, exempt: Iterable[str] = ()):
+        self.defaults = {'read': read_limit, 'write': write_limit}
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.limits = limits or {}
+        self.exempt = set(exempt)
+        # Seconds a shed client is told to wait: about as long as a queued request may wait
+        self.retry_after = max(1, math.ceil(queue_timeout))
+        self._gates: Dict[str, AdmissionGate] = {}
+        self._lock = threading.Lock()
+
+    def gate(self, blueprint: str, kind: str) -> AdmissionGate:
+        name = f"{blueprint}.{kind}"
+        with self._lock:
+            gate = self._gates.get(name)
+            if gate is None:
+                limit = self.limits.get(blueprint, {}).get(kind, self.defaults[kind])
+                gate = self._gates[name] = AdmissionGate(limit, self.queue_size, self.queue_timeout)
+            return gate
+
+    def gate_for(self, blueprint: str, endpoint: Optional[str], method: str) -> Optional[AdmissionGate]:
+        """The gate a request to endpoint of blueprint goes through, or None when it is exempt."""
+        if blueprint in self.exempt or endpoint in self.exempt:
+            return None
+        return self.gate(blueprint, 'read' if method in READ_METHODS else 'write')
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Queue depth and counters per gate, keyed 'blueprint.kind'."""
+        with self._lock:
+            gates = dict(self._gates)
+        return {name: gate.snapshot() for name, gate in sorted(gates.items())}
+
+
+def shed_status(reason: str) -> Tuple[int, str]:
+    """(HTTP status, message) for a request turned away by AdmissionGate.acquire with reason."""
+    # A full queue means more clients than capacity; a timed-out wait means the work itself is slow
+    if reason == 'queue_full':
+        return 429, 'Too many requests, try again shortly'
+    return 503, 'Service busy, try again shortly'
+
+
+def _shed_response(reason: str, retry_after: int):
+    status, message = shed_status(reason)
+    if request.blueprint == 'api':
+        response = make_response(jsonify({'error': message}), status)
+    else:
+        response = make_response(message, status)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def init_admission_control(app) -> AdmissionController:
+    """
+    Put every request through its blueprint's gate, except blueprints and
+    endpoints named in ADMISSION_EXEMPT. GET/HEAD/OPTIONS requests use the
+    blueprint's read budget, everything else its write budget; the ASGI API
+    (routes/async_api.py) takes the same gates as the blueprint it mirrors.
+    Only call this when admission control is configured.
+    """
+    controller = AdmissionController(app.config['ADMISSION_READ_CONCURRENCY'],
+                                     app.config['ADMISSION_WRITE_CONCURRENCY'],
+                                     app.config['ADMISSION_QUEUE_SIZE'], app.config['ADMISSION_QUEUE_TIMEOUT'],
+                                     app.config['ADMISSION_LIMITS'], app.config['ADMISSION_EXEMPT'])
+
+    @app.before_request
+    def admit_request():
+        gate = controller.gate_for(request.blueprint or 'app', request.endpoint, request.method)
+        if gate is None:
+            return None
+        reason = gate.acquire()
+        if reason is not None:
+            return _shed_response(reason, controller.retry_after)
+        g.admission_gate = gate
+        return None
+
+    @app.teardown_request
+    def release_admission(error=None):
+        gate = g.pop('admission_gate', None)
+        if gate is not None:
+            gate.release()
+
+    return controller
@@ -0,0 +1,184 @@
+"""
+Analytics Module - Circulation statistics from daily rollups
+The rollup tables are folded forward from the events table; LoanColumns
+holds the loan history as arrays for ad-hoc aggregations the rollups do not cover
+"""
+
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the array-module path gives the same results
+    np = None
+
+from database import (
+    apply_circulation_events, get_top_borrowed_books, get_daily_circulation, get_loan_totals_by_author,
+    get_loan_columns, from_epoch_seconds, to_epoch_day
+)
+from services.late_fees import SECONDS_PER_DAY
+from services.periodic_worker import PeriodicWorker
+
+# Loan events folded into the rollups per transaction
+ROLLUP_BATCH_SIZE = 10000
+
+# Seconds between rollup updates by RollupAggregator; the stats endpoints only read the rollups
+ROLLUP_INTERVAL = 60.0
+
+
+def update_rollups(batch_size: int = ROLLUP_BATCH_SIZE) -> int:
+    """
+    Bring the rollups up to date with the event log, one batch per transaction.
+
+    Returns:
+        int: number of loan events applied (-1 if a batch failed)
+    """
+    total = 0
+    while True:
+        applied = apply_circulation_events(batch_size)
+        if applied < 0:
+            return -1
+        total += applied
+        if applied < batch_size:
+            return total
+
+
+class RollupAggregator(PeriodicWorker):
+    """
+    Background thread that runs update_rollups every interval_seconds.
+
+    Example:
+        aggregator = RollupAggregator(interval_seconds=60)
+        aggregator.start()
+        ...
+        aggregator.stop()
+    """
+
+    def __init__(self, interval_seconds: float = ROLLUP_INTERVAL, batch_size: int = ROLLUP_BATCH_SIZE):
+        super().__init__(interval_seconds, self._update, 'rollup-aggregator')
+        self.batch_size = batch_size
+        self.last_applied = 0
+
+    def _update(self) -> None:
+        self.last_applied = update_rollups(self.batch_size)
+
+
+def top_books(days: int, limit: int) -> List[Dict]:
+    """
+    Most borrowed books over the last days days, today included.
+
+    Returns:
+        list of {'id', 'title', 'author', 'borrows'} dicts, most borrowed first
+    """
+    return get_top_borrowed_books(to_epoch_day(datetime.now()) - days + 1, limit)
+
+
+def daily_circulation(days: int) -> List[Dict]:
+    """
+    Borrows, returns and overdue returns per day over the last days days.
+
+    Returns:
+        list of {'date', 'borrows', 'returns', 'overdue_returns'} dicts, oldest first
+    """
+    return [{
+        'date': from_epoch_seconds(row['day'] * SECONDS_PER_DAY).date().isoformat(),
+        'borrows': row['borrows'],
+        'returns': row['returns'],
+        'overdue_returns': row['overdue_returns']
+    } for row in get_daily_circulation(to_epoch_day(datetime.now()) - days + 1)]
+
+
+def loan_duration_by_author() -> List[Dict]:
+    """
+    Average length of returned loans per author.
+
+    Returns:
+        list of {'author', 'returns', 'average_loan_days'} dicts, by author
+    """
+    return [{
+        'author': row['author'],
+        'returns': row['returns'],
+        'average_loan_days': round(row['loan_seconds'] / row['returns'] / SECONDS_PER_DAY, 2)
+    } for row in get_loan_totals_by_author()]
+
+
+class LoanColumns:
+    """
+    The loan history as parallel columns (book_id, borrow_epoch, due_epoch,
+    return_epoch with -1 for open loans), for aggregations over any time window.
+
+    Example:
+        loans = LoanColumns.load()
+        loans.top_books(since_epoch, 100)
+    """
+
+    def __init__(self, book_ids: array, borrow_epochs: array, due_epochs: array, return_epochs: array):
+        if np is not None:
+            book_ids, borrow_epochs, due_epochs, return_epochs = (
+                np.frombuffer(column, dtype=np.int64) if len(column) else np.zeros(0, dtype=np.int64)
+                for column in (book_ids, borrow_epochs, due_epochs, return_epochs))
+        self.book_ids = book_ids
+        self.borrow_epochs = borrow_epochs
+        self.due_epochs = due_epochs
+        self.return_epochs = return_epochs
+
+    @classmethod
+    def load(cls) -> 'LoanColumns':
+        """Read the live and archived loan history from the database."""
+        return cls(*get_loan_columns())
+
+    def __len__(self) -> int:
+        return len(self.book_ids)
+
+    def borrows_per_book(self, since_epoch: int = 0, until_epoch: Optional[int] = None) -> Dict[int, int]:
+        """Number of loans per book ID started in [since_epoch, until_epoch)."""
+        if np is not None:
+            mask = self.borrow_epochs >= since_epoch
+            if until_epoch is not None:
+                mask &= self.borrow_epochs < until_epoch
+            counts = np.bincount(self.book_ids[mask])
+            book_ids = np.flatnonzero(counts)
+            return dict(zip(book_ids.tolist(), counts[book_ids].tolist()))
+
+        counts: Dict[int, int] = {}
+        for book_id, borrowed in zip(self.book_ids, self.borrow_epochs):
+            if borrowed >= since_epoch and (until_epoch is None or borrowed < until_epoch):
+                counts[book_id] = counts.get(book_id, 0) + 1
+        return counts
+
+    def top_books(self, since_epoch: int, limit: int) -> List[Tuple[int, int]]:
+        """(book_id, borrows) for the limit most borrowed books since since_epoch."""
+        counts = self.borrows_per_book(since_epoch)
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def average_loan_days_by(self, group_of_book: Dict[int, str]) -> Dict[str, float]:
+        """
+        Average length in days of returned loans, grouped by group_of_book[book_id]
+        (e.g. each book's author). Books missing from the mapping are skipped.
+        """
+        groups = sorted(set(group_of_book.values()))
+        if np is not None:
+            returned = self.return_epochs >= 0
+            book_ids = self.book_ids[returned]
+            durations = (self.return_epochs[returned] - self.borrow_epochs[returned]) / SECONDS_PER_DAY
+            # Map each book ID to its group's position, or -1 when it has none
+            group_codes = np.full(max(group_of_book, default=0) + 1, -1, dtype=np.int64)
+            positions = {group: i for i, group in enumerate(groups)}
+            for book_id, group in group_of_book.items():
+                group_codes[book_id] = positions[group]
+            in_range = book_ids < len(group_codes)
+            codes = np.full(len(book_ids), -1, dtype=np.int64)
+            codes[in_range] = group_codes[book_ids[in_range]]
+            keep = codes >= 0
+            totals = np.bincount(codes[keep], weights=durations[keep], minlength=len(groups))
+            counts = np.bincount(codes[keep], minlength=len(groups))
+            return {group: round(float(totals[i] / counts[i]), 2) for i, group in enumerate(groups) if counts[i]}
+
+        sums: Dict[str, List[float]] = {}
+        for book_id, borrowed, returned in zip(self.book_ids, self.borrow_epochs, self.return_epochs):
+            if returned >= 0 and book_id in group_of_book:
+                totals = sums.setdefault(group_of_book[book_id], [0.0, 0])
+                totals[0] += (returned - borrowed) / SECONDS_PER_DAY
+                totals[1] += 1
+        return {group: round(total / count, 2) for group, (total, count) in sorted(sums.items())}
@@ -0,0 +1,62 @@
+"""
+Archive Service Module - Moves old closed loans out of borrow_records
+Keeps the table read by open-loan queries small as loan history grows
+"""
+
+import time
+from datetime import datetime, timedelta
+
+from database import archive_closed_borrow_records
+from services.periodic_worker import PeriodicWorker
+
+# Loans returned longer ago than this are archived
+ARCHIVE_HORIZON_DAYS = 365
+
+# Records moved per transaction; small batches keep the write lock short
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def archive_old_loans(horizon_days: int = ARCHIVE_HORIZON_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE,
+                      pause_seconds: float = 0.0) -> int:
+    """
+    Archive every loan returned more than horizon_days ago, one batch per transaction.
+
+    Args:
+        horizon_days: Age of the return date after which a loan is archived
+        batch_size: Records moved per transaction
+        pause_seconds: Sleep between batches so borrow/return writes can interleave
+
+    Returns:
+        int: total number of records archived
+    """
+    cutoff = datetime.now() - timedelta(days=horizon_days)
+    total = 0
+    while True:
+        moved = archive_closed_borrow_records(cutoff, batch_size)
+        total += moved
+        if moved < batch_size:
+            return total
+        time.sleep(pause_seconds)
+
+
+class LoanArchiver(PeriodicWorker):
+    """
+    Background thread that runs archive_old_loans every interval_seconds.
+
+    Example:
+        archiver = LoanArchiver(interval_seconds=3600)
+        archiver.start()
+        ...
+        archiver.stop()
+    """
+
+    def __init__(self, interval_seconds: float, horizon_days: int = ARCHIVE_HORIZON_DAYS,
+                 batch_size: int = ARCHIVE_BATCH_SIZE, pause_seconds: float = 0.05):
+        super().__init__(interval_seconds, self._archive, 'loan-archiver')
+        self.horizon_days = horizon_days
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.last_archived = 0
+
+    def _archive(self) -> None:
+        self.last_archived = archive_old_loans(self.horizon_days, self.batch_size, self.pause_seconds)
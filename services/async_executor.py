@@ -0,0 +1,44 @@
+"""
+Async Executor Module - Runs the blocking service and SQLite calls for async code
+The ASGI API awaits these instead of holding a server thread while SQLite works
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# Threads that run service calls for the async API; each keeps its own pooled SQLite connections
+DB_EXECUTOR_THREADS = 16
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _db_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(DB_EXECUTOR_THREADS, thread_name_prefix='async-db')
+        return _executor
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Await fn(*args, **kwargs) run on the DB executor.
+
+    Example:
+        books = await run_blocking(search_books_in_catalog, 'gatsby', 'title')
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_db_executor() -> None:
+    """Wait for queued calls and stop the executor threads; the next run_blocking starts new ones."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
@@ -0,0 +1,222 @@
+"""
+Availability Cache Module - Every book's available copies in one file mapped by all worker processes
+Workers share the table, so catalog pages read availability without a query per book and borrow pre-checks
+can turn away unavailable books before loading them
+"""
+
+import mmap
+import os
+import struct
+import threading
+from array import array
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; writes are then only serialized within one process
+    fcntl = None
+
+from database import get_available_copies, get_all_availability, subscribe_events, unsubscribe_events
+from services.periodic_worker import PeriodicWorker
+
+# File layout: HEADER (magic, format version, slot count), then one native int32
+# per book ID, indexed by the ID, holding its available copies or UNKNOWN
+MAGIC = b'LIBAVLv1'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sII')
+SLOT_SIZE = 4
+UNKNOWN = -1
+
+# Slots in a new file; it doubles whenever a book ID does not fit
+MIN_SLOTS = 1024
+
+# Seconds between full resyncs of the table from the books table
+AVAILABILITY_RESYNC_INTERVAL = 60.0
+
+
+class AvailabilityCache:
+    """
+    The shared availability table in the file at path, mapped read-write.
+
+    SQLite stays the authority: every write stores the value just read back
+    from the books table, under an exclusive lock on the file (and a thread
+    lock), so the last writer always stores the latest committed value and
+    concurrent writers in different processes cannot interleave. Reads take
+    no lock; a slot is one aligned 32-bit word. Opening the file resyncs
+    every slot, so a worker that restarts repairs anything a crashed one
+    left behind.
+
+    Example:
+        cache = AvailabilityCache('/dev/shm/library-availability')
+        cache.get(42)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        with self._file_lock():
+            if self._file_slots() is None:
+                os.ftruncate(self._fd, 0)
+                self._extend(0, MIN_SLOTS)
+            self._map_file()
+        self.resync()
+
+    @contextmanager
+    def _file_lock(self):
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _file_slots(self) -> Optional[int]:
+        """Slot count in the file's header, or None when the file is not an availability table."""
+        header = os.pread(self._fd, HEADER.size, 0)
+        if len(header) < HEADER.size:
+            return None
+        magic, format_version, slots = HEADER.unpack(header)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            return None
+        if os.fstat(self._fd).st_size < HEADER.size + slots * SLOT_SIZE:
+            return None
+        return slots
+
+    def _extend(self, slots: int, new_slots: int) -> None:
+        """Grow the file from slots to new_slots slots, all new ones UNKNOWN; the header is written last."""
+        os.ftruncate(self._fd, HEADER.size + new_slots * SLOT_SIZE)
+        os.pwrite(self._fd, (array('i', [UNKNOWN]) * (new_slots - slots)).tobytes(), HEADER.size + slots * SLOT_SIZE)
+        os.pwrite(self._fd, HEADER.pack(MAGIC, FORMAT_VERSION, new_slots), 0)
+
+    def _map_file(self) -> None:
+        # A grown file gets a new mapping; readers still holding the old one keep it until they drop it
+        mapping = mmap.mmap(self._fd, 0)
+        slots = HEADER.unpack_from(mapping)[2]
+        self._map = mapping
+        self._slots = memoryview(mapping)[HEADER.size:HEADER.size + slots * SLOT_SIZE].cast('i')
+
+    def _ensure_slot(self, book_id: int) -> None:
+        """Make book_id addressable, growing the file if needed; called with the file lock held."""
+        slots = self._file_slots()
+        if book_id >= slots:
+            self._extend(slots, max(2 * slots, book_id + 1))
+        if book_id >= len(self._slots):
+            self._map_file()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def get(self, book_id: int) -> Optional[int]:
+        """The available copies of book_id, or None when the table does not know the book."""
+        slots = self._slots
+        if book_id >= len(slots) and HEADER.unpack_from(self._map)[2] > len(slots):
+            # Another worker grew the file
+            with self._lock:
+                if HEADER.unpack_from(self._map)[2] > len(self._slots):
+                    self._map_file()
+            slots = self._slots
+        if not 0 <= book_id < len(slots):
+            return None
+        value = slots[book_id]
+        return None if value == UNKNOWN else value
+
+    def refresh(self, book_id: int) -> None:
+        """Copy one book's available copies from the database into the table."""
+        with self._file_lock():
+            available = get_available_copies(book_id)
+            self._ensure_slot(book_id)
+            self._slots[book_id] = UNKNOWN if available is None else available
+
+    def resync(self) -> int:
+        """
+        Rewrite every slot from the books table.
+
+        Returns:
+            int: number of books in the table
+        """
+        with self._file_lock():
+            rows = get_all_availability()
+            if rows:
+                self._ensure_slot(max(book_id for book_id, _ in rows))
+            values = array('i', [UNKNOWN]) * len(self._slots)
+            for book_id, available in rows:
+                values[book_id] = available
+            self._slots[:] = values
+            return len(rows)
+
+    def close(self) -> None:
+        """Close the file; the mapping stays valid for whoever still reads it."""
+        os.close(self._fd)
+
+
+_cache: Optional[AvailabilityCache] = None
+_cache_lock = threading.Lock()
+
+
+def _on_availability_changed(event: Dict) -> None:
+    cache = _cache
+    if cache is not None:
+        payload = event['payload']
+        cache.refresh(payload['book_id'] if event['type'] == 'book.availability_changed' else payload['id'])
+
+
+def open_availability_cache(path: str) -> AvailabilityCache:
+    """
+    Map the shared availability table at path (creating it if needed), resync
+    it from the database and keep it updated from this process's events.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = AvailabilityCache(path)
+        subscribe_events(_on_availability_changed, ['book.availability_changed', 'book.inserted'])
+        return _cache
+
+
+def current_availability_cache() -> Optional[AvailabilityCache]:
+    """The table opened by open_availability_cache, or None when the app runs without one."""
+    return _cache
+
+
+def close_availability_cache() -> None:
+    """Stop using the shared availability table in this process."""
+    global _cache
+    with _cache_lock:
+        unsubscribe_events(_on_availability_changed)
+        if _cache is not None:
+            _cache.close()
+        _cache = None
+
+
+def cached_available_copies(book_id: int) -> Optional[int]:
+    """A book's available copies from the shared table, or None when there is no table or it does not know the book."""
+    cache = _cache
+    return cache.get(book_id) if cache is not None else None
+
+
+class AvailabilityResyncer(PeriodicWorker):
+    """
+    Background thread that resyncs the shared availability table every interval_seconds,
+    repairing slots left stale by a worker that died between a commit and its table write.
+
+    Example:
+        resyncer = AvailabilityResyncer(interval_seconds=60)
+        resyncer.start()
+        ...
+        resyncer.stop()
+    """
+
+    def __init__(self, interval_seconds: float = AVAILABILITY_RESYNC_INTERVAL):
+        super().__init__(interval_seconds, self._resync, 'availability-resyncer', run_at_start=False)
+        self.resyncs = 0
+
+    def _resync(self) -> None:
+        cache = _cache
+        if cache is not None:
+            cache.resync()
+            self.resyncs += 1
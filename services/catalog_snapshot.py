@@ -0,0 +1,218 @@
+"""
+Catalog Snapshot Module - Read-only binary copy of the books table that workers mmap
+Every worker maps the same file, so the catalog is loaded once per machine and opening it is near-instant
+"""
+
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterator, Optional, Tuple
+
+from database import get_catalog_version, read_catalog_snapshot_rows
+from services.periodic_worker import PeriodicWorker
+
+# File layout, little-endian with every section 8-byte aligned:
+#   header   HEADER: magic, format version, book count, catalog version, section offsets
+#   records  one RECORD per book, in catalog (title, id) order
+#   index    the book IDs in ascending order (int64), then each one's record offset (uint64)
+#   heap     the UTF-8 titles, authors and ISBNs the records point into
+MAGIC = b'LIBCATv1'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIIqQQQ')
+# id, total_copies, then (offset, length) into the heap of title, author and isbn
+RECORD = struct.Struct('<qqIIIIII')
+
+# Seconds between checks of the snapshot's version against the live catalog
+CATALOG_SNAPSHOT_REFRESH_INTERVAL = 10.0
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class CatalogSnapshot:
+    """
+    A catalog snapshot file mapped read-only. Books come back as dicts of id,
+    title, author, isbn and total_copies; available_copies changes with every
+    loan, so it is not in the snapshot and must be read from the database.
+
+    Example:
+        snapshot = CatalogSnapshot('catalog.snap')
+        book = snapshot.get(42)
+        titles = [book['title'] for book in snapshot]
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            self._map.close()
+            raise ValueError(f'{path} is not a catalog snapshot')
+        magic, format_version, count, version, records_at, index_at, heap_at = HEADER.unpack_from(self._map)
+        if magic != MAGIC or format_version != FORMAT_VERSION or len(self._map) < heap_at:
+            self._map.close()
+            raise ValueError(f'{path} is not a catalog snapshot (format {FORMAT_VERSION})')
+
+        self.path = path
+        self.version = version
+        self._count = count
+        self._records_at = records_at
+        self._heap_at = heap_at
+        view = memoryview(self._map)
+        self._ids = view[index_at:index_at + 8 * count].cast('q')
+        self._offsets = view[index_at + 8 * count:index_at + 16 * count].cast('Q')
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _book(self, offset: int) -> Dict:
+        (book_id, total_copies, title_at, title_len, author_at, author_len,
+         isbn_at, isbn_len) = RECORD.unpack_from(self._map, offset)
+        heap = self._heap_at
+        return {
+            'id': book_id,
+            'title': self._map[heap + title_at:heap + title_at + title_len].decode(),
+            'author': self._map[heap + author_at:heap + author_at + author_len].decode(),
+            'isbn': self._map[heap + isbn_at:heap + isbn_at + isbn_len].decode(),
+            'total_copies': total_copies,
+        }
+
+    def get(self, book_id: int) -> Optional[Dict]:
+        """The book with book_id, or None; a binary search of the ID index."""
+        pos = bisect_left(self._ids, book_id)
+        if pos < self._count and self._ids[pos] == book_id:
+            return self._book(self._offsets[pos])
+        return None
+
+    def __contains__(self, book_id: int) -> bool:
+        pos = bisect_left(self._ids, book_id)
+        return pos < self._count and self._ids[pos] == book_id
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Every book in catalog (title, id) order, decoded one at a time."""
+        for position in range(self._count):
+            yield self._book(self._records_at + position * RECORD.size)
+
+    def close(self) -> None:
+        """Unmap the file; only once nothing is reading the snapshot any more."""
+        self._ids.release()
+        self._offsets.release()
+        self._map.close()
+
+
+def write_catalog_snapshot(path: str) -> Tuple[int, int]:
+    """
+    Write a snapshot of the books table to path. The file is written beside
+    path and renamed over it, so processes mapping the old file keep reading
+    it undisturbed.
+
+    Returns:
+        tuple: (catalog version, number of books)
+    """
+    version, rows = read_catalog_snapshot_rows()
+    heap = bytearray()
+    records = bytearray()
+    for row in rows:
+        fields = []
+        for text in (row['title'], row['author'], row['isbn']):
+            data = text.encode()
+            fields += (len(heap), len(data))
+            heap += data
+        records += RECORD.pack(row['id'], row['total_copies'], *fields)
+
+    count = len(rows)
+    records_at = HEADER.size
+    index_at = _align(records_at + len(records))
+    heap_at = index_at + 16 * count
+    by_id = sorted(range(count), key=lambda position: rows[position]['id'])
+    ids = struct.pack(f'<{count}q', *(rows[position]['id'] for position in by_id))
+    offsets = struct.pack(f'<{count}Q', *(records_at + position * RECORD.size for position in by_id))
+
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, count, version, records_at, index_at, heap_at))
+        f.write(records)
+        f.write(b'\0' * (index_at - records_at - len(records)))
+        f.write(ids)
+        f.write(offsets)
+        f.write(heap)
+    os.replace(temporary, path)
+    return version, count
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+_lock = threading.Lock()
+
+
+def _open_current(path: str) -> CatalogSnapshot:
+    """Map the snapshot at path, first (re)writing it when it is missing, unreadable or behind the catalog."""
+    try:
+        snapshot = CatalogSnapshot(path)
+        if snapshot.version == get_catalog_version():
+            return snapshot
+    except (OSError, ValueError):
+        pass
+    write_catalog_snapshot(path)
+    return CatalogSnapshot(path)
+
+
+def open_catalog_snapshot(path: str) -> CatalogSnapshot:
+    """
+    Make the snapshot at path this process's current snapshot (see
+    current_catalog_snapshot), writing it first if it is missing or stale.
+    """
+    global _snapshot
+    with _lock:
+        _snapshot = _open_current(path)
+        return _snapshot
+
+
+def refresh_catalog_snapshot() -> bool:
+    """
+    Compare the current snapshot's version with the live catalog and switch to
+    a fresh one when it is behind; another worker may already have written it.
+    Readers of the old snapshot keep their mapping until they drop it.
+
+    Returns:
+        bool: True when the current snapshot was replaced
+    """
+    global _snapshot
+    with _lock:
+        if _snapshot is None or _snapshot.version == get_catalog_version():
+            return False
+        _snapshot = _open_current(_snapshot.path)
+        return True
+
+
+def current_catalog_snapshot() -> Optional[CatalogSnapshot]:
+    """The snapshot opened by open_catalog_snapshot, or None when the app runs without one."""
+    return _snapshot
+
+
+def close_catalog_snapshot() -> None:
+    """Stop using a snapshot; it is unmapped once the last reader drops it."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+class CatalogSnapshotRefresher(PeriodicWorker):
+    """
+    Background thread that calls refresh_catalog_snapshot every interval_seconds.
+
+    Example:
+        refresher = CatalogSnapshotRefresher(interval_seconds=10)
+        refresher.start()
+        ...
+        refresher.stop()
+    """
+
+    def __init__(self, interval_seconds: float = CATALOG_SNAPSHOT_REFRESH_INTERVAL):
+        super().__init__(interval_seconds, self._refresh, 'catalog-snapshot-refresher', run_at_start=False)
+        self.refreshes = 0
+
+    def _refresh(self) -> None:
+        if refresh_catalog_snapshot():
+            self.refreshes += 1
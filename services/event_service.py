@@ -0,0 +1,118 @@
+"""
+Event Service Module - Cursor reads and long-polling over the events table
+Lets API clients follow catalog and loan changes without re-reading whole tables
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, List
+
+from database import get_events_since, relay_shard_events, subscribe_events
+from services.async_executor import run_blocking
+from services.periodic_worker import PeriodicWorker
+
+# Most events returned by one poll
+MAX_EVENTS_PER_POLL = 500
+
+# Longest a poll may wait for new events, in seconds
+MAX_POLL_TIMEOUT = 30.0
+
+# Writes made by other processes are not published in-process, so waiters
+# re-check the table at least this often
+RECHECK_SECONDS = 1.0
+
+# Seconds between moves of the shard outboxes into the global feed
+SHARD_RELAY_INTERVAL = 0.1
+
+_condition = threading.Condition()
+_latest_event_id = 0
+
+# (event loop, asyncio.Event) of each waiting wait_for_events_async call
+_async_waiters = set()
+
+
+def _on_event(event: Dict) -> None:
+    global _latest_event_id
+    with _condition:
+        _latest_event_id = max(_latest_event_id, event['id'])
+        _condition.notify_all()
+        for loop, waiter in _async_waiters:
+            loop.call_soon_threadsafe(waiter.set)
+
+
+def wait_for_events(since: int, limit: int = 100, timeout: float = 0.0) -> List[Dict]:
+    """
+    Return events after the since cursor, waiting up to timeout seconds for one to arrive.
+
+    Args:
+        since: ID of the last event the caller has seen (0 for the start of the log)
+        limit: Most events to return
+        timeout: Seconds to wait when there are no new events; 0 returns immediately
+
+    Returns:
+        list of event dicts, oldest first; empty if nothing arrived in time
+    """
+    subscribe_events(_on_event)
+    limit = max(1, min(limit, MAX_EVENTS_PER_POLL))
+    deadline = time.monotonic() + max(0.0, min(timeout, MAX_POLL_TIMEOUT))
+
+    while True:
+        events = get_events_since(since, limit)
+        remaining = deadline - time.monotonic()
+        if events or remaining <= 0:
+            return events
+        with _condition:
+            if _latest_event_id <= since:
+                _condition.wait(min(remaining, RECHECK_SECONDS))
+
+
+async def wait_for_events_async(since: int, limit: int = 100, timeout: float = 0.0) -> List[Dict]:
+    """
+    wait_for_events for the ASGI API: the reads run on the DB executor and the
+    wait is an asyncio wait, so a long poll holds no thread while it waits.
+    """
+    subscribe_events(_on_event)
+    limit = max(1, min(limit, MAX_EVENTS_PER_POLL))
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max(0.0, min(timeout, MAX_POLL_TIMEOUT))
+    entry = (loop, asyncio.Event())
+    with _condition:
+        _async_waiters.add(entry)
+
+    try:
+        while True:
+            # Cleared before the read, so an event committed after it still wakes the wait below
+            entry[1].clear()
+            events = await run_blocking(get_events_since, since, limit)
+            remaining = deadline - loop.time()
+            if events or remaining <= 0:
+                return events
+            try:
+                await asyncio.wait_for(entry[1].wait(), min(remaining, RECHECK_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        with _condition:
+            _async_waiters.discard(entry)
+
+
+class ShardEventRelay(PeriodicWorker):
+    """
+    Background thread that runs relay_shard_events every interval_seconds, so
+    loan events written on the shards reach the feed and in-process subscribers
+    without waiting for the next feed read.
+
+    Example:
+        relay = ShardEventRelay(interval_seconds=0.1)
+        relay.start()
+        ...
+        relay.stop()
+    """
+
+    def __init__(self, interval_seconds: float = SHARD_RELAY_INTERVAL):
+        super().__init__(interval_seconds, self._relay, 'shard-event-relay')
+        self.relayed = 0
+
+    def _relay(self) -> None:
+        self.relayed += max(relay_shard_events(), 0)
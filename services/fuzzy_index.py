@@ -0,0 +1,241 @@
+"""
+Fuzzy Index Module - Typo-tolerant title and author search
+Finds "Orwel" or "Gatsbby" with symmetric-delete lookups over the catalog's words instead of scanning every book
+"""
+
+import threading
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from database import get_all_books, subscribe_events
+from services.suggest_index import normalize
+
+# Words are indexed by deletes of at most this many leading characters, which
+# bounds the deletes per word; candidates are then checked against the whole word
+PREFIX_LENGTH = 7
+
+
+def max_distance(word: str) -> int:
+    """Edits tolerated in a word of this length: none up to 3 characters, 1 up to 7, then 2."""
+    if len(word) <= 3:
+        return 0
+    return 1 if len(word) <= 7 else 2
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """word and every string made by deleting up to distance of its characters."""
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {text[:i] + text[i + 1:] for text in frontier if len(text) > 1 for i in range(len(text))}
+        found |= frontier
+    return found
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance between a and b (insertions, deletions,
+    substitutions and adjacent transpositions), or limit + 1 once it exceeds limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous_row = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous_row = previous_row, row
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            best = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                best = min(best, before[j - 2] + 1)
+            row[j] = best
+        # Later rows build on this one, or on the one before it through a transposition
+        if min(row) > limit and min(previous_row) >= limit:
+            return limit + 1
+    return min(row[-1], limit + 1)
+
+
+def _contains(postings: array, book_id: int) -> bool:
+    """Binary search a sorted posting list for book_id."""
+    pos = bisect_left(postings, book_id)
+    return pos < len(postings) and postings[pos] == book_id
+
+
+class FuzzyWordIndex:
+    """
+    Symmetric-delete (SymSpell-style) index over the words of the catalog's
+    titles and authors.
+
+    Every distinct word is stored once with a sorted array of the IDs of the
+    books using it, and each deletion of up to max_distance(word) characters
+    from its prefix points back at it. A query word's own deletions are looked
+    up in the same table: two words within d edits of each other always share
+    a string reachable by at most d deletions from each, so the hits are a
+    small candidate set that is then checked with edit_distance. A word
+    matches when it is within the smaller of the two words' max_distance.
+    """
+
+    def __init__(self):
+        self._word_ids: Dict[str, int] = {}
+        self._words: List[str] = []
+        self._postings: List[array] = []
+        # delete -> word ID, or a list of word IDs once several words share it
+        self._deletes: Dict[str, object] = {}
+        self._books: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._books)
+
+    def word_count(self) -> int:
+        return len(self._words)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._word_ids.clear()
+            self._words.clear()
+            self._postings.clear()
+            self._deletes.clear()
+            self._books.clear()
+
+    def _word_id(self, word: str) -> int:
+        word_id = self._word_ids.get(word)
+        if word_id is not None:
+            return word_id
+        word_id = self._word_ids[word] = len(self._words)
+        self._words.append(word)
+        self._postings.append(array('q'))
+        for delete in _deletes(word[:PREFIX_LENGTH], max_distance(word)):
+            existing = self._deletes.get(delete)
+            if existing is None:
+                self._deletes[delete] = word_id
+            elif isinstance(existing, list):
+                existing.append(word_id)
+            else:
+                self._deletes[delete] = [existing, word_id]
+        return word_id
+
+    def add(self, book_id: int, texts: Iterable[str]) -> None:
+        """Index the words of texts (a book's title and author) under book_id."""
+        words = {word for text in texts for word in normalize(text).split()}
+        with self._lock:
+            if book_id in self._books:
+                return
+            self._books.add(book_id)
+            for word in words:
+                postings = self._postings[self._word_id(word)]
+                if postings and postings[-1] > book_id:
+                    insort(postings, book_id)
+                else:
+                    postings.append(book_id)
+
+    def _similar_words(self, word: str) -> List[Tuple[int, int]]:
+        """(word ID, edit distance) of every indexed word close enough to word."""
+        candidates = set()
+        for delete in _deletes(word[:PREFIX_LENGTH], max_distance(word)):
+            hit = self._deletes.get(delete)
+            if hit is None:
+                continue
+            if isinstance(hit, list):
+                candidates.update(hit)
+            else:
+                candidates.add(hit)
+        exact = self._word_ids.get(word)
+        if exact is not None:
+            candidates.add(exact)
+
+        similar = []
+        for word_id in candidates:
+            other = self._words[word_id]
+            limit = min(max_distance(word), max_distance(other))
+            distance = 0 if other == word else edit_distance(word, other, limit)
+            if distance <= limit:
+                similar.append((word_id, distance))
+        return similar
+
+    def search(self, term: str) -> List[int]:
+        """
+        IDs of the books with a close match for every word of term in their
+        title or author, fewest total edits first, then by ID.
+        """
+        words = normalize(term).split()
+        if not words:
+            return []
+        with self._lock:
+            matches = [self._similar_words(word) for word in words]
+            if not all(matches):
+                return []
+            # Start from the word with the fewest books; the others only filter its books
+            matches.sort(key=lambda similar: sum(len(self._postings[word_id]) for word_id, _ in similar))
+
+            scores: Dict[int, int] = {}
+            for word_id, distance in matches[0]:
+                for book_id in self._postings[word_id]:
+                    if distance < scores.get(book_id, distance + 1):
+                        scores[book_id] = distance
+            for similar in matches[1:]:
+                postings = [(self._postings[word_id], distance) for word_id, distance in similar]
+                postings.sort(key=lambda item: item[1])
+                filtered = {}
+                for book_id, score in scores.items():
+                    for book_ids, distance in postings:
+                        if _contains(book_ids, book_id):
+                            filtered[book_id] = score + distance
+                            break
+                scores = filtered
+                if not scores:
+                    return []
+        return sorted(scores, key=lambda book_id: (scores[book_id], book_id))
+
+
+fuzzy_index = FuzzyWordIndex()
+_ready = False
+
+
+def index_book_words(book: Dict) -> None:
+    """Add a single book's title and author words to the fuzzy index."""
+    fuzzy_index.add(book['id'], (book['title'], book['author']))
+
+
+def _on_book_inserted(event: Dict) -> None:
+    index_book_words(event['payload'])
+
+
+def build_fuzzy_index(books: Optional[List[Dict]] = None) -> None:
+    """
+    (Re)build the fuzzy index from the catalog and keep it updated from the event log.
+
+    Args:
+        books: Book rows to index; defaults to every book in the database
+    """
+    global _ready
+    if books is None:
+        books = get_all_books()
+
+    reset_fuzzy_index()
+    for book in books:
+        index_book_words(book)
+
+    subscribe_events(_on_book_inserted, ['book.inserted'])
+    _ready = True
+
+
+def reset_fuzzy_index() -> None:
+    """Empty the index; fuzzy searches index the catalog on the fly until the next build."""
+    global _ready
+    _ready = False
+    fuzzy_index.clear()
+
+
+def fuzzy_book_ids(search_term: str) -> Optional[List[int]]:
+    """
+    Book IDs matching search_term with typos tolerated, best matches first.
+
+    Returns:
+        list of book IDs, or None when the index is not built
+    """
+    if not _ready:
+        return None
+    return fuzzy_index.search(search_term)
@@ -0,0 +1,171 @@
+"""
+ISBN Index Module - Sorted in-memory index of catalog ISBNs
+Serves exact and prefix ISBN lookups and duplicate checks without a database round trip
+"""
+
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional
+
+from database import get_all_books, subscribe_events
+
+ISBN_LENGTH = 13
+
+
+def is_isbn_digits(value: str) -> bool:
+    """True for a non-empty string of ASCII digits; str.isdigit also accepts digits like '²' that int() rejects."""
+    return value.isascii() and value.isdigit()
+
+
+def is_valid_isbn(isbn: str) -> bool:
+    """True for a 13-digit ISBN."""
+    return len(isbn) == ISBN_LENGTH and is_isbn_digits(isbn)
+
+
+def _prefix_range(prefix: str):
+    """Return the [low, high) integer range of 13-digit ISBNs starting with prefix."""
+    scale = 10 ** (ISBN_LENGTH - len(prefix))
+    value = int(prefix)
+    return value * scale, (value + 1) * scale
+
+
+class IsbnIndex:
+    """
+    Sorted array of 13-digit ISBNs stored as integers, with a parallel array of book IDs.
+
+    Exact lookups are a binary search. Every ISBN sharing a prefix (an EAN
+    prefix, registration group or publisher block) occupies one contiguous
+    slice of the array, so prefix enumeration is two binary searches.
+    """
+
+    def __init__(self):
+        self._isbns = array('Q')
+        self._book_ids = array('q')
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._isbns)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._isbns = array('Q')
+            self._book_ids = array('q')
+
+    def load(self, pairs: Iterable) -> None:
+        """Replace the index contents with (isbn, book_id) pairs in one sort."""
+        rows = sorted((int(isbn), book_id) for isbn, book_id in pairs
+                      if is_valid_isbn(isbn))
+        with self._lock:
+            self._isbns = array('Q', (value for value, _ in rows))
+            self._book_ids = array('q', (book_id for _, book_id in rows))
+
+    def add(self, isbn: str, book_id: int) -> None:
+        """Index isbn under book_id. ISBNs that are not 13 digits are ignored."""
+        if not is_valid_isbn(isbn):
+            return
+        value = int(isbn)
+        with self._lock:
+            pos = bisect_left(self._isbns, value)
+            if pos < len(self._isbns) and self._isbns[pos] == value:
+                return
+            self._isbns.insert(pos, value)
+            self._book_ids.insert(pos, book_id)
+
+    def get(self, isbn: str) -> Optional[int]:
+        """Return the book ID for an exact ISBN, or None."""
+        if not is_valid_isbn(isbn):
+            return None
+        value = int(isbn)
+        with self._lock:
+            pos = bisect_left(self._isbns, value)
+            if pos < len(self._isbns) and self._isbns[pos] == value:
+                return self._book_ids[pos]
+        return None
+
+    def __contains__(self, isbn: str) -> bool:
+        return self.get(isbn) is not None
+
+    def prefix(self, prefix: str) -> List[int]:
+        """Return the book IDs of every ISBN starting with prefix, in ISBN order."""
+        if len(prefix) > ISBN_LENGTH or not is_isbn_digits(prefix):
+            return []
+        low, high = _prefix_range(prefix)
+        with self._lock:
+            start = bisect_left(self._isbns, low)
+            end = bisect_left(self._isbns, high, start)
+            return list(self._book_ids[start:end])
+
+    def find_existing(self, isbns: Iterable[str]) -> List[str]:
+        """
+        Return the ISBNs from a bulk add that are already in the catalog.
+
+        The batch is sorted once and merged against the index in a single pass.
+        """
+        candidates = sorted({isbn for isbn in isbns if is_valid_isbn(isbn)})
+        existing = []
+        with self._lock:
+            pos = 0
+            for isbn in candidates:
+                pos = bisect_left(self._isbns, int(isbn), pos)
+                if pos == len(self._isbns):
+                    break
+                if self._isbns[pos] == int(isbn):
+                    existing.append(isbn)
+        return existing
+
+    def nbytes(self) -> int:
+        """Bytes held by the ISBN and book ID arrays."""
+        return (self._isbns.itemsize * len(self._isbns)
+                + self._book_ids.itemsize * len(self._book_ids))
+
+
+isbn_index = IsbnIndex()
+_ready = False
+
+
+def index_book_isbn(book: Dict) -> None:
+    """Add a single book to the ISBN index."""
+    isbn_index.add(book['isbn'], book['id'])
+
+
+def _on_book_inserted(event: Dict) -> None:
+    index_book_isbn(event['payload'])
+
+
+def build_isbn_index(books: Optional[List[Dict]] = None) -> None:
+    """
+    (Re)build the ISBN index from the catalog and keep it updated from the event log.
+
+    Args:
+        books: Book rows to index; defaults to every book in the database
+    """
+    global _ready
+    if books is None:
+        books = get_all_books()
+
+    reset_isbn_index()
+    isbn_index.load((book['isbn'], book['id']) for book in books)
+
+    subscribe_events(_on_book_inserted, ['book.inserted'])
+    _ready = True
+
+
+def reset_isbn_index() -> None:
+    """Empty the index; lookups fall back to the database until the next build."""
+    global _ready
+    _ready = False
+    isbn_index.clear()
+
+
+def isbn_book_ids(isbn_prefix: str) -> Optional[List[int]]:
+    """
+    Look up book IDs by ISBN prefix; a full 13-digit ISBN is an exact lookup.
+
+    Returns:
+        list of book IDs, or None when the index is not built or the prefix
+        is not numeric and the caller should query the database instead
+    """
+    if not _ready or not is_isbn_digits(isbn_prefix):
+        return None
+    return isbn_index.prefix(isbn_prefix)
@@ -0,0 +1,54 @@
+"""
+Late Fees Module - R5 fee schedule over whole result sets
+Computes days overdue and tiered fees from *_epoch columns in one vectorized pass
+"""
+
+from array import array
+from typing import List, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the array-module path gives the same results
+    np = None
+
+SECONDS_PER_DAY = 86400
+
+# R5: $0.50/day for the first 7 days overdue, $1.00/day after that, at most $15.00 per book
+FIRST_TIER_DAYS = 7
+FIRST_TIER_RATE = 0.50
+SECOND_TIER_RATE = 1.00
+MAX_FEE = 15.00
+
+
+def late_fee_for_days(days_overdue: int) -> float:
+    """Fee owed for a single loan that is days_overdue days late."""
+    fee = (min(days_overdue, FIRST_TIER_DAYS) * FIRST_TIER_RATE
+           + max(days_overdue - FIRST_TIER_DAYS, 0) * SECOND_TIER_RATE)
+    return round(min(fee, MAX_FEE), 2)
+
+
+def compute_late_fees(due_epochs: Sequence[int],
+                      as_of: Union[int, Sequence[int]]) -> Tuple[List[int], List[float]]:
+    """
+    Compute days overdue and fees for many loans in one pass.
+
+    Args:
+        due_epochs: due_epoch column values of the loans
+        as_of: epoch seconds to measure lateness at, either one value for every
+            loan (e.g. now) or one per loan (e.g. the return_epoch column)
+
+    Returns:
+        tuple: (days_overdue list, fee_amount list), in input order
+    """
+    if np is not None:
+        due = np.asarray(due_epochs, dtype=np.int64)
+        days = np.maximum((np.asarray(as_of, dtype=np.int64) - due) // SECONDS_PER_DAY, 0)
+        fees = (np.minimum(days, FIRST_TIER_DAYS) * FIRST_TIER_RATE
+                + np.maximum(days - FIRST_TIER_DAYS, 0) * SECOND_TIER_RATE)
+        fees = np.round(np.minimum(fees, MAX_FEE), 2)
+        return days.tolist(), fees.tolist()
+
+    due = array('q', due_epochs)
+    ends = array('q', [as_of] * len(due) if isinstance(as_of, int) else as_of)
+    days = [max((end - d) // SECONDS_PER_DAY, 0) for d, end in zip(due, ends)]
+    return days, [late_fee_for_days(d) for d in days]
@@ -3,21 +3,64 @@ Library Service Module - Business Logic Functions
 Contains all the core business logic for the Library Management System
 """
 
+import heapq
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterator, List, Tuple, Optional
 
 from database import (
     get_book_by_id,
     get_book_by_isbn,
-    get_patron_borrow_count,
+    get_patron_borrowed_books,
     insert_book,
-    insert_borrow_record,
-    update_book_availability,
-    update_borrow_record_return_date,
-    get_all_books
+    get_all_books,
+    iter_all_books,
+    get_books_by_ids,
+    get_books_added_after,
+    get_available_copies,
+    get_books_by_isbns,
+    get_co_borrow_counts,
+    get_patron_borrow_counts,
+    get_open_borrow_records,
+    get_patron_borrow_history,
+    get_overdue_borrow_records,
+    get_patron_account,
+    get_book_fees_owed,
+    record_fee_payment,
+    record_refund,
+    to_epoch_seconds,
+    insert_borrow_records_batch,
+    update_return_dates_batch
 )
 
 from services.payment_service import PaymentGateway
+from services.availability_cache import cached_available_copies, current_availability_cache
+from services.catalog_snapshot import current_catalog_snapshot
+from services.fuzzy_index import FuzzyWordIndex, fuzzy_book_ids
+from services.isbn_index import isbn_book_ids, is_valid_isbn
+from services.late_fees import compute_late_fees
+from services.related_books import RELATED_TOP_K, related_book_counts
+from services.search_index import search_book_ids
+from services.suggest_index import suggest
+from services.write_coalescer import current_write_coalescer
+
+
+def _apply_write(kind: str, patron_id: str, book_id: int) -> Dict:
+    """
+    Apply one borrow or return with its batch helper, through the write
+    coalescer when one is installed and on the calling thread otherwise, so
+    both give the same checks and messages.
+
+    Returns:
+        the per-item result dict of the batch helper
+    """
+    coalescer = current_write_coalescer()
+    if coalescer is not None:
+        try:
+            return coalescer.submit(kind, (patron_id, book_id)).result()
+        except RuntimeError:  # stopped between the lookup and the submit
+            pass
+    apply = borrow_books_batch if kind == 'borrow' else return_books_batch
+    return apply([(patron_id, book_id)])[0]
 
 
 def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
@@ -33,13 +76,14 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
     if len(author.strip()) > 100:
         return False, "Author must be less than 100 characters."
 
-    if len(isbn) != 13 or not isbn.isdigit():
+    if not is_valid_isbn(isbn):
         return False, "ISBN must be exactly 13 digits."
 
     if not isinstance(total_copies, int) or total_copies <= 0:
         return False, "Total copies must be a positive integer."
 
-    existing = get_book_by_isbn(isbn)
+    indexed = isbn_book_ids(isbn)
+    existing = indexed if indexed is not None else get_book_by_isbn(isbn)
     if existing:
         return False, "Book already exists."
 
@@ -54,45 +98,158 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid ID"
 
-    book = get_book_by_id(book_id)
-    if not book:
-        return False, "Book not locateda"
-
-    if book['available_copies'] <= 0:
+    # Zero copies in the shared availability table is only a hint (a worker may have died between
+    # its commit and its table write): a one-column read confirms it before the borrow is refused,
+    # without loading the book or queueing for the writer
+    if cached_available_copies(book_id) == 0 and get_available_copies(book_id) == 0:
         return False, "Book not available"
 
-    current_borrowed = get_patron_borrow_count(patron_id)
-    if current_borrowed >= 5:
-        return False, "You have reached the maximum borrowing limit of 5 books."
+    result = _apply_write('borrow', patron_id, book_id)
+    return result['success'], result['message']
+
+
+def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
+    result = _apply_write('return', patron_id, book_id)
+    return result['success'], result['message']
+
 
+def borrow_books_batch(items: List[Tuple[str, int]]) -> List[Dict]:
+    """
+    Borrow many (patron_id, book_id) pairs at once, e.g. from a desk scanner.
+
+    Every item is checked for a valid patron ID, an available copy and the
+    5-book limit, with earlier items in the batch counting toward availability
+    and the limit. The valid items are then written in one transaction.
+    borrow_book_by_patron borrows a single book through here too.
+
+    Returns:
+        list of per-item result dicts, in input order
+    """
     borrow_date = datetime.now()
     due_date = borrow_date + timedelta(days=14)
 
-    borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
-    if not borrow_success:
-        return False, "Database error while creating borrow record."
+    books = {book['id']: book for book in get_books_by_ids({book_id for _, book_id in items})}
+    available = {book_id: book['available_copies'] for book_id, book in books.items()}
+    borrowed = get_patron_borrow_counts([patron_id for patron_id, _ in items])
 
-    update_book_availability(book_id, -1)
-    return True, f'Successfully borrowed "{book["title"]}".'
+    results = []
+    borrows = []
+    for patron_id, book_id in items:
+        result = {'patron_id': patron_id, 'book_id': book_id, 'success': False}
+        if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+            result['message'] = "Invalid ID"
+        elif book_id not in books:
+            result['message'] = "Book not located."
+        elif available[book_id] <= 0:
+            result['message'] = "Book not available"
+        elif borrowed[patron_id] >= 5:
+            result['message'] = "You have reached the maximum borrowing limit of 5 books."
+        else:
+            available[book_id] -= 1
+            borrowed[patron_id] += 1
+            borrows.append((patron_id, book_id, borrow_date, due_date))
+            result.update(success=True, due_date=due_date.isoformat(),
+                          message=f'Successfully borrowed "{books[book_id]["title"]}".')
+        results.append(result)
+
+    if borrows and not insert_borrow_records_batch(borrows):
+        for result in results:
+            if result['success']:
+                result.update(success=False, message="Database error while creating borrow record.")
+                del result['due_date']
 
+    return results
 
-def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
-    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
-        return False, "Invalid ID"
 
-    book = get_book_by_id(book_id)
-    if not book:
-        return False, "Book DNE"
+def return_books_batch(items: List[Tuple[str, int]]) -> List[Dict]:
+    """
+    Return many (patron_id, book_id) pairs at once, e.g. from the book-drop scanner.
+
+    Each item closes the patron's oldest open loan of that book and reports the
+    late fee owed on it. The valid items are written in one transaction.
+    return_book_by_patron returns a single book through here too.
+
+    Returns:
+        list of per-item result dicts, in input order
+    """
+    return_date = datetime.now()
+
+    books = {book['id']: book for book in get_books_by_ids({book_id for _, book_id in items})}
+    open_loans: Dict[Tuple[str, int], List[Dict]] = {}
+    for record in get_open_borrow_records([patron_id for patron_id, _ in items]):
+        open_loans.setdefault((record['patron_id'], record['book_id']), []).append(record)
+
+    results = []
+    closing = []
+    for patron_id, book_id in items:
+        result = {'patron_id': patron_id, 'book_id': book_id, 'success': False}
+        loans = open_loans.get((patron_id, book_id))
+        if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+            result['message'] = "Invalid ID"
+        elif book_id not in books:
+            result['message'] = "Book DNE"
+        elif not loans:
+            result['message'] = "Not borrowed"
+        else:
+            closing.append(loans.pop(0))
+            result.update(success=True, message=f'Book "{books[book_id]["title"]}" has been successfully returned.')
+        results.append(result)
+
+    days_overdue, fees = compute_late_fees([record['due_epoch'] for record in closing], to_epoch_seconds(return_date))
+    for result, days, fee in zip((r for r in results if r['success']), days_overdue, fees):
+        result.update(days_overdue=days, fee_amount=fee)
+    returns = [(record['id'], record['patron_id'], record['book_id'], return_date, fee)
+               for record, fee in zip(closing, fees)]
+
+    closed = update_return_dates_batch(returns) if returns else set()
+    returned = iter(record['id'] for record in closing)
+    for result in results:
+        if result['success']:
+            record_id = next(returned)
+            if closed is None:
+                result.update(success=False, message="Database error while returning book.")
+            elif record_id not in closed:
+                # Closed by a concurrent return since the open loans were read
+                result.update(success=False, message="Not borrowed")
+            else:
+                continue
+            del result['days_overdue'], result['fee_amount']
 
-    record_success = update_borrow_record_return_date(patron_id, book_id, datetime.now())
-    if not record_success:
-        return False, "Not borrowed"
+    return results
+
+
+def get_overdue_loans() -> List[Dict]:
+    """
+    List every open loan past its due date with the late fee owed so far.
 
-    update_book_availability(book_id, 1)
-    return True, f'Book "{book["title"]}" has been successfully returned.'
+    Returns:
+        list of loan dicts (patron_id, book_id, title, author, due_date,
+        days_overdue, fee_amount), most overdue first
+    """
+    now = datetime.now()
+    records = get_overdue_borrow_records(now)
+    days_overdue, fees = compute_late_fees([r['due_epoch'] for r in records], to_epoch_seconds(now))
+
+    return [{
+        'patron_id': record['patron_id'],
+        'book_id': record['book_id'],
+        'title': record['title'],
+        'author': record['author'],
+        'due_date': record['due_date'],
+        'days_overdue': days,
+        'fee_amount': fee
+    } for record, days, fee in zip(records, days_overdue, fees)]
 
 
 def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
+    """
+    The R5 late fee a patron owes so far on their open loan of a book, read
+    without changing the loan.
+
+    Returns:
+        dict: fee_amount, days_overdue and status ('Late fee applied',
+        'No late fee', 'Not borrowed' or 'Invalid')
+    """
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return {'fee_amount': 0.00, 'days_overdue': 0, 'status': 'Invalid'}
 
@@ -100,20 +257,78 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     if not book:
         return {'fee_amount': 0.00, 'days_overdue': 0, 'status': 'Invalid'}
 
-    record = update_borrow_record_return_date(patron_id, book_id, None)
-    if not record or not record.get('due_date'):
-        return {'fee_amount': 0.00, 'days_overdue': 0, 'status': 'Invalid'}
+    loans = [record for record in get_open_borrow_records([patron_id]) if record['book_id'] == book_id]
+    if not loans:
+        return {'fee_amount': 0.00, 'days_overdue': 0, 'status': 'Not borrowed'}
+
+    # A return closes every open loan of the book, so the fee covers them all
+    days_overdue, fees = compute_late_fees([record['due_epoch'] for record in loans], to_epoch_seconds(datetime.now()))
+    fee_amount = round(sum(fees), 2)
+    status = "Late fee applied" if fee_amount > 0 else "No late fee"
+
+    return {'fee_amount': fee_amount, 'days_overdue': max(days_overdue), 'status': status}
 
-    duedate = record['due_date']
-    return_date = record.get('return_date', datetime.now())
-    days_overdue = max((return_date - duedate).days, 0)
-    fee_amount = round(days_overdue * 0.50, 2) if days_overdue > 0 else 0
-    status = "Late fee applied" if days_overdue > 0 else "No late fee"
 
-    return {'fee_amount': fee_amount, 'days_overdue': days_overdue, 'status': status}
+def _search_books_fuzzy(search_term: str) -> List[Dict]:
+    """Title/author search tolerating typos, closest matches first."""
+    book_ids = fuzzy_book_ids(search_term)
+    if book_ids is None:
+        index = FuzzyWordIndex()
+        for book in get_all_books():
+            index.add(book['id'], (book['title'], book['author']))
+        book_ids = index.search(search_term)
+    rank = {book_id: position for position, book_id in enumerate(book_ids)}
+    return sorted(get_books_by_ids(book_ids), key=lambda book: rank[book['id']]) if book_ids else []
+
+
+def iter_catalog_books() -> Iterator[Dict]:
+    """
+    Every book in title order, for the catalog page. With both a catalog
+    snapshot and a shared availability table open, the books are read from
+    those two mappings, merged with the books added since the snapshot was
+    written (one query on the primary key, usually empty); otherwise from
+    the database.
+    """
+    snapshot = current_catalog_snapshot()
+    availability = current_availability_cache()
+    if snapshot is None or availability is None:
+        return iter_all_books()
+    return _snapshot_books(snapshot, availability)
+
+
+def _snapshot_books(snapshot, availability) -> Iterator[Dict]:
+    # The snapshot's version is the highest book ID assigned when it was written, and books are never updated
+    # (availability aside), so the books it lacks are exactly those with higher IDs
+    added = get_books_added_after(snapshot.version)
+    return heapq.merge(_snapshot_availability(snapshot, availability), added,
+                       key=lambda book: (book['title'], book['id']))
+
+
+def _snapshot_availability(snapshot, availability) -> Iterator[Dict]:
+    for book in snapshot:
+        available = availability.get(book['id'])
+        if available is None:
+            # Not in the table yet; the database has the answer
+            current = get_book_by_id(book['id'])
+            if current is None:
+                continue
+            available = current['available_copies']
+        book['available_copies'] = available
+        yield book
 
 
 def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
+    if search_type == "fuzzy":
+        return _search_books_fuzzy(search_term)
+    if search_type == "isbn":
+        # Only a full ISBN can use the index; partial ISBNs match anywhere, as in the scan below
+        isbn = search_term.strip()
+        book_ids = isbn_book_ids(isbn) if is_valid_isbn(isbn) else None
+    else:
+        book_ids = search_book_ids(search_term, search_type)
+    if book_ids is not None:
+        return get_books_by_ids(book_ids)
+
     books = get_all_books()
     terms = search_term.strip().lower()
     results = []
@@ -129,30 +344,107 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     return results
 
 
+def lookup_books_by_ids(book_ids: List[int]) -> Dict:
+    """
+    Resolve many book IDs with one query, e.g. for the discovery UI.
+
+    Returns:
+        dict with 'books' (found books in input order, duplicates dropped)
+        and 'missing' (requested IDs with no book, in input order)
+    """
+    requested = list(dict.fromkeys(book_ids))
+    books = {book['id']: book for book in get_books_by_ids(requested)} if requested else {}
+    return {
+        'books': [books[book_id] for book_id in requested if book_id in books],
+        'missing': [book_id for book_id in requested if book_id not in books]
+    }
+
+
+def lookup_books_by_isbns(isbns: List[str]) -> Dict:
+    """
+    Resolve many ISBNs with one query, e.g. for the return scanner. ISBNs the
+    ISBN index does not know are reported missing without touching the database.
+
+    Returns:
+        dict with 'books' (found books in input order, duplicates dropped)
+        and 'missing' (requested ISBNs with no book, in input order)
+    """
+    requested = list(dict.fromkeys(isbns))
+    candidates = [isbn for isbn in requested if isbn_book_ids(isbn) != []]
+    books = {book['isbn']: book for book in get_books_by_isbns(candidates)} if candidates else {}
+    return {
+        'books': [books[isbn] for isbn in requested if isbn in books],
+        'missing': [isbn for isbn in requested if isbn not in books]
+    }
+
+
+def suggest_books(prefix: str, suggest_type: str, limit: int = 10) -> List[Dict]:
+    if suggest_type not in ("title", "author"):
+        return []
+
+    limit = max(1, min(limit, 25))
+    return suggest(prefix, suggest_type, limit)
+
+
+def get_related_books(book_id: int, limit: int = 10) -> Optional[List[Dict]]:
+    """
+    "Patrons also borrowed": the books most often borrowed by patrons who
+    borrowed book_id, each with a 'patrons' count of how many did.
+
+    Returns:
+        list of book dicts, most patrons first, or None when there is no such book
+    """
+    if get_book_by_id(book_id) is None:
+        return None
+
+    limit = max(1, min(limit, RELATED_TOP_K))
+    counts = related_book_counts(book_id, limit)
+    if counts is None:
+        counts = sorted(get_co_borrow_counts(book_id).items(), key=lambda item: (-item[1], item[0]))[:limit]
+    books = {book['id']: book for book in get_books_by_ids([other for other, _ in counts])} if counts else {}
+    return [{**books[other], 'patrons': patrons} for other, patrons in counts if other in books]
+
+
 def get_patron_status_report(patron_id: str) -> Dict:
+    """
+    A patron's open loans with the late fee each has accrued so far, their
+    account (open loan count and outstanding fees) and their borrowing history.
+    """
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return {}
 
-    count = get_patron_borrow_count(patron_id)
-    books = get_all_books()
-    borrowedbooks = [b for b in books if b.get("borrowed_by") == patron_id]
+    account = get_patron_account(patron_id)
+    borrowedbooks = get_patron_borrowed_books(patron_id)
 
     late_fees = []
     total_fees = 0.0
-    for b in borrowedbooks:
-        fee_data = calculate_late_fee_for_book(patron_id, b["id"])
-        late_fees.append({"title": b["title"], "fee": fee_data["amount"]})
-        total_fees += fee_data["amount"]
+    # The fee of a book covers every open loan of it
+    for book_id, title in {b["book_id"]: b["title"] for b in borrowedbooks}.items():
+        fee_data = calculate_late_fee_for_book(patron_id, book_id)
+        late_fees.append({"title": title, "fee": fee_data["fee_amount"]})
+        total_fees += fee_data["fee_amount"]
 
     return {
         "patron id": patron_id,
         "borrowed_books": borrowedbooks,
-        "count": count,
+        "count": account["open_loan_count"],
         "late fees": late_fees,
-        "total fees": round(total_fees, 2)
+        "total fees": round(total_fees, 2),
+        "outstanding_fees": account["outstanding_fees"],
+        "borrowing_history": get_patron_borrow_history(patron_id)
     }
 
 
+def late_fees_owed_for_book(patron_id: str, book_id: int) -> float:
+    """
+    Unpaid late fees on a patron's returned loans of a book, at most their
+    outstanding fees. Fees are assessed when a book is returned, so an open
+    loan owes nothing yet.
+    """
+    owed = min(get_book_fees_owed(patron_id, book_id), get_patron_account(patron_id)['outstanding_fees'])
+    return max(round(owed, 2), 0.0)
+
+
 def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway = None) -> Tuple[
     bool, str, Optional[str]]:
     """
@@ -179,14 +471,8 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits.", None
 
-    # Calculate late fee first
-    fee_info = calculate_late_fee_for_book(patron_id, book_id)
-
-    # Check if there's a fee to pay
-    if not fee_info or 'fee_amount' not in fee_info:
-        return False, "Unable to calculate late fees.", None
-
-    fee_amount = fee_info.get('fee_amount', 0.0)
+    # Charge only what is still owed for the book
+    fee_amount = late_fees_owed_for_book(patron_id, book_id)
 
     if fee_amount <= 0:
         return False, "No late fees to pay for this book.", None
@@ -210,6 +496,10 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
         )
 
         if success:
+            if not record_fee_payment(patron_id, fee_amount, transaction_id, book_id):
+                # The gateway took the money; the transaction ID lets staff find it when recording it by hand
+                return False, "Payment was charged but could not be recorded; please contact the library.", \
+                    transaction_id
             return True, f"Payment successful! {message}", transaction_id
         else:
             return False, f"Payment failed: {message}", None
@@ -254,6 +544,7 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
         success, message = payment_gateway.refund_payment(transaction_id, amount)
 
         if success:
+            record_refund(transaction_id, amount)
             return True, message
         else:
             return False, f"Refund failed: {message}"
@@ -0,0 +1,168 @@
+"""
+Payment Reconciliation Module - Checks recorded late fee charges against the payment gateway
+Runs as a batch job: python -m services.payment_reconciliation --report discrepancies.csv
+"""
+
+import argparse
+import csv
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import database
+from database import (
+    start_reconciliation_run, get_payments_to_reconcile, save_reconciliation_chunk,
+    finish_reconciliation_run, get_reconciliation_run, get_payment_discrepancies
+)
+from services.payment_service import PaymentGateway
+
+# verify_payment_status calls in flight at once
+RECONCILE_WORKERS = 32
+# Most verify_payment_status calls started per second; None for no limit
+RECONCILE_RATE_LIMIT = 500.0
+# Charges verified between checkpoints; a crash repeats at most this many calls
+RECONCILE_CHUNK_SIZE = 1000
+
+REPORT_COLUMNS = ('payment_id', 'transaction_id', 'problem', 'recorded_amount', 'gateway_status', 'gateway_amount')
+
+
+class RateLimiter:
+    """Spaces calls from any number of threads at least 1/rate seconds apart."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until the caller's slot comes up."""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def check_payment(gateway: PaymentGateway, payment: Dict) -> Tuple[Optional[str], Optional[str], Optional[float]]:
+    """
+    Ask the gateway about one recorded charge.
+
+    Returns:
+        tuple: (problem or None when settled, gateway status, gateway amount)
+        problem is one of not_found, not_settled, amount_mismatch, gateway_error
+    """
+    try:
+        result = gateway.verify_payment_status(payment['transaction_id'])
+    except Exception as e:
+        return 'gateway_error', None, None
+
+    status = result.get('status')
+    amount = result.get('amount')
+    if status == 'not_found':
+        return 'not_found', status, amount
+    if status != 'completed':
+        return 'not_settled', status, amount
+    if amount is not None and round(amount, 2) != round(payment['amount'], 2):
+        return 'amount_mismatch', status, amount
+    return None, status, amount
+
+
+def reconcile_payments(gateway: Optional[PaymentGateway] = None, workers: int = RECONCILE_WORKERS,
+                       rate_limit: Optional[float] = RECONCILE_RATE_LIMIT,
+                       chunk_size: int = RECONCILE_CHUNK_SIZE, report_path: Optional[str] = None) -> Optional[Dict]:
+    """
+    Verify every charge in the payments ledger that has not been seen settled,
+    up to the newest one recorded when the run started. Calls are spread over
+    workers threads and rate_limit calls per second; each chunk's results and
+    the run's checkpoint are saved together, and a run that stopped part way
+    (a crash, a deploy) resumes from its checkpoint on the next call.
+
+    Charges the gateway does not report completed for their recorded amount
+    are marked unsettled and listed in payment_discrepancies (and written to
+    report_path as CSV when given); later runs check them again.
+
+    Returns:
+        dict: the finished run's totals (see reconciliation_runs), or None on a database error
+    """
+    run = start_reconciliation_run()
+    if run is None:
+        return None
+    if gateway is None:
+        gateway = PaymentGateway()
+    limiter = RateLimiter(rate_limit) if rate_limit else None
+
+    def verify(payment):
+        if limiter is not None:
+            limiter.acquire()
+        return check_payment(gateway, payment)
+
+    pool = ThreadPoolExecutor(workers, thread_name_prefix='reconcile')
+    try:
+        # The next chunk is queued before the current one is saved, so the workers never wait on SQLite
+        chunks = deque()
+        fetched_upto = run['last_payment_id']
+        while True:
+            while len(chunks) < 2:
+                payments = get_payments_to_reconcile(fetched_upto, run['upto_payment_id'], chunk_size)
+                if not payments:
+                    break
+                fetched_upto = payments[-1]['id']
+                chunks.append((payments, [pool.submit(verify, payment) for payment in payments]))
+            if not chunks:
+                break
+
+            payments, futures = chunks.popleft()
+            settled, discrepancies = [], []
+            for payment, future in zip(payments, futures):
+                problem, status, amount = future.result()
+                if problem is None:
+                    settled.append(payment['id'])
+                else:
+                    discrepancies.append((payment['id'], payment['transaction_id'], problem, payment['amount'],
+                                          status, amount))
+            if not save_reconciliation_chunk(run['id'], payments[-1]['id'], settled, discrepancies):
+                return None
+    finally:
+        # Calls queued behind a failure are dropped; the next run repeats them from the checkpoint
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    finish_reconciliation_run(run['id'])
+    if report_path:
+        write_discrepancy_report(run['id'], report_path)
+    return get_reconciliation_run(run['id'])
+
+
+def write_discrepancy_report(run_id: int, path: str) -> int:
+    """Write one run's discrepancies to path as CSV. Returns the number of rows written."""
+    discrepancies = get_payment_discrepancies(run_id)
+    with open(path, 'w', newline='') as report:
+        writer = csv.writer(report)
+        writer.writerow(REPORT_COLUMNS)
+        for row in discrepancies:
+            writer.writerow([row[column] for column in REPORT_COLUMNS])
+    return len(discrepancies)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Check recorded late fee charges against the payment gateway.')
+    parser.add_argument('--database', default=database.DATABASE, help='catalog database (DATABASE)')
+    parser.add_argument('--workers', type=int, default=RECONCILE_WORKERS, help='gateway calls in flight')
+    parser.add_argument('--rate-limit', type=float, default=RECONCILE_RATE_LIMIT,
+                        help='most gateway calls per second (0 for no limit)')
+    parser.add_argument('--chunk-size', type=int, default=RECONCILE_CHUNK_SIZE, help='charges per checkpoint')
+    parser.add_argument('--report', help='CSV file for the discrepancies found')
+    args = parser.parse_args(argv)
+
+    database.DATABASE = args.database
+    run = reconcile_payments(workers=args.workers, rate_limit=args.rate_limit or None,
+                             chunk_size=args.chunk_size, report_path=args.report)
+    if run is None:
+        raise SystemExit('Reconciliation failed; run it again to resume from the last checkpoint.')
+    print(f"Run {run['id']}: {run['checked']} charges checked, {run['discrepancies']} discrepancies")
+
+
+if __name__ == '__main__':
+    main()
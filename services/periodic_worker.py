@@ -0,0 +1,57 @@
+"""
+Periodic Worker Module - Background threads that run one job on a fixed interval
+Archiving, replica and snapshot refreshes, rollups and index rebuilds all run as a PeriodicWorker
+"""
+
+import threading
+from typing import Callable
+
+
+class PeriodicWorker:
+    """
+    Daemon thread that calls fn() every interval_seconds until stopped.
+
+    With run_at_start, fn runs as soon as the thread starts and then after
+    each interval; otherwise the first call waits one interval. An exception
+    from fn is counted in failures and the next call happens on schedule.
+    stop() wakes the thread from its wait and joins it; start() after stop()
+    starts a new thread.
+
+    Example:
+        worker = PeriodicWorker(60, update_rollups, 'rollup-aggregator')
+        worker.start()
+        ...
+        worker.stop()
+    """
+
+    def __init__(self, interval_seconds: float, fn: Callable[[], object], name: str, run_at_start: bool = True):
+        self.interval_seconds = interval_seconds
+        self.fn = fn
+        self.name = name
+        self.run_at_start = run_at_start
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _call(self) -> None:
+        try:
+            self.fn()
+        except Exception:
+            self.failures += 1
+
+    def _run(self) -> None:
+        if self.run_at_start and not self._stop.is_set():
+            self._call()
+        while not self._stop.wait(self.interval_seconds):
+            self._call()
@@ -0,0 +1,259 @@
+"""
+Profiling Module - On-demand request profiles and a whole-process stack sampler
+Nothing is hooked into the app unless PROFILING_TOKEN is configured
+"""
+
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from flask import current_app, g, request
+
+# Profiles kept for download; the oldest is dropped first
+MAX_STORED_PROFILES = 50
+
+# Seconds between stack samples
+SAMPLE_INTERVAL_SECONDS = 0.005
+
+# Shorter intervals are raised to this; each sample walks every thread's stack under the GIL
+MIN_SAMPLE_INTERVAL_SECONDS = 0.001
+
+# Rows of the cProfile text report
+REPORT_ROWS = 60
+
+PROFILE_KINDS = ('cprofile', 'sample')
+
+
+def collapse_stack(frame) -> str:
+    """Render a frame and its callers as 'outer;...;inner' for folded flame-graph input."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """
+    Background thread that records the stack of one thread (or of every other
+    thread) every interval_seconds (at least MIN_SAMPLE_INTERVAL_SECONDS) and
+    counts identical stacks.
+
+    Example:
+        sampler = StackSampler()
+        sampler.start()
+        ...
+        sampler.stop()
+        print(sampler.folded())
+    """
+
+    def __init__(self, interval_seconds: float = SAMPLE_INTERVAL_SECONDS, thread_id: Optional[int] = None):
+        self.interval_seconds = max(interval_seconds, MIN_SAMPLE_INTERVAL_SECONDS)
+        self.thread_id = thread_id
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def folded(self) -> str:
+        """Sampled stacks as 'frame;frame;frame count' lines, most frequent first."""
+        with self._lock:
+            return ''.join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval_seconds):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frames = {self.thread_id: frames[self.thread_id]} if self.thread_id in frames else {}
+            stacks = [collapse_stack(frame) for thread_id, frame in frames.items() if thread_id != own_id]
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+
+
+def new_profile_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+class ProfileStore:
+    """Bounded, thread-safe store of finished profiles keyed by profile ID."""
+
+    def __init__(self, capacity: int = MAX_STORED_PROFILES):
+        self.capacity = capacity
+        self._profiles: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, label: str, duration_ms: float, report: str, raw: Optional[bytes] = None,
+            profile_id: Optional[str] = None) -> str:
+        """Store a finished profile under profile_id (a new ID if None) and return the ID."""
+        profile_id = profile_id or new_profile_id()
+        with self._lock:
+            self._profiles[profile_id] = {
+                'id': profile_id, 'kind': kind, 'label': label, 'duration_ms': round(duration_ms, 2),
+                'created_at': datetime.now().isoformat(), 'report': report, 'raw': raw
+            }
+            while len(self._profiles) > self.capacity:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def summaries(self) -> List[Dict]:
+        """Metadata of every stored profile, newest first."""
+        with self._lock:
+            return [{key: value for key, value in profile.items() if key not in ('report', 'raw')}
+                    for profile in reversed(self._profiles.values())]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_store = ProfileStore()
+global_sampler: Optional[StackSampler] = None
+
+
+def check_token(app, supplied: Optional[str]) -> bool:
+    """True when profiling is enabled and supplied matches PROFILING_TOKEN."""
+    token = app.config.get('PROFILING_TOKEN')
+    return bool(token) and supplied is not None and hmac.compare_digest(supplied, token)
+
+
+def _cprofile_report(profiler: cProfile.Profile) -> tuple:
+    """Return (text report, pstats file bytes) for a stopped profiler."""
+    stream = io.StringIO()
+    # Stats takes the profiler's data, so the pstats bytes come from it (as Stats.dump_stats writes them)
+    stats = pstats.Stats(profiler, stream=stream)
+    raw = marshal.dumps(stats.stats)
+    stats.sort_stats('cumulative').print_stats(REPORT_ROWS)
+    return stream.getvalue(), raw
+
+
+def _start_request_profile():
+    kind = request.headers.get('X-Profile') or request.args.get('profile')
+    if kind not in PROFILE_KINDS:
+        return
+    if not check_token(current_app, request.headers.get('X-Profile-Token')):
+        return
+
+    if kind == 'cprofile':
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler is already active on this thread
+            return
+    else:
+        profiler = StackSampler(thread_id=threading.get_ident())
+        profiler.start()
+    g.profile = (kind, profiler, time.perf_counter())
+
+
+def _finish_request_profile(response=None) -> Optional[str]:
+    """
+    Stop the request's profiler, store the result and return its profile ID.
+    For a streamed response the profiler keeps running until the response is
+    closed, so the profile covers rendering the body; the ID is returned now.
+    """
+    kind, profiler, started = g.pop('profile', (None, None, None))
+    if profiler is None:
+        return None
+    label = f"{request.method} {request.full_path.rstrip('?')}"
+    if response is not None and response.is_streamed:
+        profile_id = new_profile_id()
+        response.call_on_close(lambda: _store_profile(kind, profiler, started, label, profile_id))
+        return profile_id
+    return _store_profile(kind, profiler, started, label)
+
+
+def _store_profile(kind: str, profiler, started: float, label: str, profile_id: Optional[str] = None) -> str:
+    duration_ms = (time.perf_counter() - started) * 1000
+    if kind == 'cprofile':
+        profiler.disable()
+        report, raw = _cprofile_report(profiler)
+        return profile_store.add(kind, label, duration_ms, report, raw, profile_id)
+    profiler.stop()
+    return profile_store.add(kind, label, duration_ms, profiler.folded(), profile_id=profile_id)
+
+
+def init_request_profiling(app) -> None:
+    """
+    Let authorized requests ask for a profile of themselves.
+
+    A request with 'X-Profile: cprofile' (or 'sample'), or ?profile=cprofile, and
+    'X-Profile-Token: <PROFILING_TOKEN>' is profiled end to end, and its response
+    carries an X-Profile-Id header naming the stored result. A streamed page is
+    profiled until its response is closed, and its profile is stored then. Only
+    call this when PROFILING_TOKEN is set; without the hooks requests pay nothing.
+    """
+    @app.before_request
+    def start_profile():
+        _start_request_profile()
+
+    @app.after_request
+    def finish_profile(response):
+        profile_id = _finish_request_profile(response)
+        if profile_id:
+            response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    @app.teardown_request
+    def discard_profile(error=None):
+        # after_request is skipped when the view raised
+        _finish_request_profile()
+
+
+def start_global_sampling(interval_seconds: float = SAMPLE_INTERVAL_SECONDS) -> bool:
+    """Start sampling every thread of the process; False if a sampler is already running."""
+    global global_sampler
+    if global_sampler is not None and global_sampler.running:
+        return False
+    global_sampler = StackSampler(interval_seconds)
+    global_sampler.start()
+    return True
+
+
+def stop_global_sampling() -> Optional[str]:
+    """Stop the process-wide sampler and store its stacks; returns the profile ID or None."""
+    global global_sampler
+    if global_sampler is None:
+        return None
+    sampler, global_sampler = global_sampler, None
+    sampler.stop()
+    return profile_store.add('sample', f'global ({sampler.samples} samples)',
+                             sampler.samples * sampler.interval_seconds * 1000, sampler.folded())
+
+
+def global_sampler_folded() -> Optional[str]:
+    """Folded stacks collected so far by the running process-wide sampler, or None."""
+    sampler = global_sampler
+    return sampler.folded() if sampler is not None else None
@@ -0,0 +1,241 @@
+"""
+Query Tracer Module - Records what SQL ran, how long it took and how many rows it touched
+Connections from database.get_db_connection are only wrapped while tracing is active
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from flask import g, request
+
+# Statements slower than this many milliseconds go to the slow-query log; None turns the log off
+SLOW_QUERY_MS: Optional[float] = None
+
+# A request running one statement shape more than this many times is flagged as N+1
+REPEAT_THRESHOLD = 10
+
+# Entries kept in the slow-query and N+1 logs
+MAX_LOG_ENTRIES = 200
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+slow_query_log: deque = deque(maxlen=MAX_LOG_ENTRIES)
+repeated_query_log: deque = deque(maxlen=MAX_LOG_ENTRIES)
+_local = threading.local()
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Reduce a statement to its shape: one line, literals replaced by ?, and
+    IN (?, ?, ...) lists of any length collapsed to IN (...).
+    """
+    shape = _STRING_LITERAL.sub('?', sql)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = ' '.join(shape.split())
+    return _IN_LIST.sub('(...)', shape)
+
+
+def _params_shape(params) -> str:
+    if isinstance(params, dict):
+        return f"{{{', '.join(sorted(params))}}}"
+    return f"{len(params)} params"
+
+
+class QueryRecord:
+    """One traced statement: its shape, parameter shape, elapsed time and rows."""
+
+    __slots__ = ('sql', 'shape', 'params', 'duration_ms', 'rows', 'plan')
+
+    def __init__(self, sql: str, params: str):
+        self.sql = sql
+        self.shape = normalize_sql(sql)
+        self.params = params
+        self.duration_ms = 0.0
+        self.rows = 0
+        self.plan = None
+
+    def to_dict(self) -> Dict:
+        return {'sql': self.shape, 'params': self.params, 'duration_ms': round(self.duration_ms, 3),
+                'rows': self.rows, 'plan': self.plan}
+
+
+class QueryTracer:
+    """
+    Collects every statement run on this thread while it is active.
+
+    Example (a query budget in a test):
+        with QueryTracer() as tracer:
+            client.get('/catalog')
+        assert len(tracer.records) <= 3
+        assert not tracer.repeated()
+    """
+
+    def __init__(self):
+        self.records: List[QueryRecord] = []
+
+    def __enter__(self) -> 'QueryTracer':
+        _active_tracers().append(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _active_tracers().remove(self)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def shapes(self) -> Counter:
+        """Number of executions per statement shape."""
+        return Counter(record.shape for record in self.records)
+
+    def repeated(self, threshold: Optional[int] = None) -> Dict[str, int]:
+        """Statement shapes run more than threshold (default REPEAT_THRESHOLD) times."""
+        limit = REPEAT_THRESHOLD if threshold is None else threshold
+        return {shape: count for shape, count in self.shapes().items() if count > limit}
+
+    def total_ms(self) -> float:
+        return sum(record.duration_ms for record in self.records)
+
+
+def _active_tracers() -> List[QueryTracer]:
+    if not hasattr(_local, 'tracers'):
+        _local.tracers = []
+    return _local.tracers
+
+
+def tracing_active() -> bool:
+    """True when new connections should be wrapped: a tracer is active here or the slow log is on."""
+    return SLOW_QUERY_MS is not None or bool(getattr(_local, 'tracers', None))
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that adds fetch time and fetched rows to the statement's QueryRecord."""
+
+    record: Optional[QueryRecord] = None
+    parameters = ()
+
+    def _track(self, started: float, rows: int) -> None:
+        if self.record is not None:
+            self.record.duration_ms += (time.perf_counter() - started) * 1000
+            self.record.rows += rows
+            _check_slow(self.connection, self.record, self.parameters)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._track(started, row is not None)
+        return row
+
+    def fetchmany(self, size: int = 1):
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._track(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._track(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._track(started, 0)
+            raise
+        self._track(started, 1)
+        return row
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose execute/executemany record a QueryRecord with every active tracer."""
+
+    def _run(self, record: QueryRecord, run, parameters):
+        cursor = self.cursor(TracedCursor)
+        started = time.perf_counter()
+        run(cursor)
+        record.duration_ms = (time.perf_counter() - started) * 1000
+        if cursor.description is None:
+            record.rows = max(cursor.rowcount, 0)
+        cursor.record = record
+        cursor.parameters = parameters
+        for tracer in _active_tracers():
+            tracer.records.append(record)
+        _check_slow(self, record, parameters)
+        return cursor
+
+    def execute(self, sql: str, parameters=()):
+        record = QueryRecord(sql, _params_shape(parameters))
+        return self._run(record, lambda cursor: cursor.execute(sql, parameters), parameters)
+
+    def executemany(self, sql: str, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        first = seq_of_parameters[0] if seq_of_parameters else ()
+        record = QueryRecord(sql, f"{len(seq_of_parameters)} x {_params_shape(first)}")
+        return self._run(record, lambda cursor: cursor.executemany(sql, seq_of_parameters), first)
+
+
+def _check_slow(conn, record: QueryRecord, parameters) -> None:
+    """Log record once it passes SLOW_QUERY_MS, with the plan SQLite chose for it."""
+    if SLOW_QUERY_MS is None or record.plan is not None or record.duration_ms < SLOW_QUERY_MS:
+        return
+    record.plan = []
+    if record.shape.split(' ', 1)[0].upper() in ('SELECT', 'WITH'):
+        try:
+            # The base class execute keeps the EXPLAIN itself out of the trace
+            plan = sqlite3.Connection.execute(conn, f'EXPLAIN QUERY PLAN {record.sql}', parameters).fetchall()
+            record.plan = [row[3] for row in plan]
+        except sqlite3.Error:
+            pass
+    slow_query_log.append({**record.to_dict(), 'logged_at': datetime.now().isoformat()})
+
+
+def init_query_tracing(app) -> None:
+    """
+    Trace the SQL of every request and log those that repeat a statement shape
+    more than SQL_REPEAT_THRESHOLD times (the N+1 pattern). Responses carry an
+    X-Query-Count header, except streamed ones: their trace runs until the
+    response is closed, after the headers are sent. Only call this when SQL
+    tracing is configured.
+    """
+    @app.before_request
+    def start_query_trace():
+        g.query_tracer = QueryTracer().__enter__()
+
+    @app.after_request
+    def finish_query_trace(response):
+        tracer = g.pop('query_tracer', None)
+        if tracer is None:
+            return response
+        label = f"{request.method} {request.full_path.rstrip('?')}"
+        if response.is_streamed:
+            # The page's queries run while the body is sent
+            response.call_on_close(lambda: _finish_request_trace(app, tracer, label))
+        else:
+            response.headers['X-Query-Count'] = str(len(tracer))
+            _finish_request_trace(app, tracer, label)
+        return response
+
+    @app.teardown_request
+    def stop_query_trace(error=None):
+        # after_request is skipped when the view raised
+        tracer = g.pop('query_tracer', None)
+        if tracer is not None:
+            tracer.__exit__(None, None, None)
+
+
+def _finish_request_trace(app, tracer: QueryTracer, label: str) -> None:
+    """Stop a request's tracer and log its repeated statement shapes."""
+    tracer.__exit__(None, None, None)
+    repeated = tracer.repeated(app.config.get('SQL_REPEAT_THRESHOLD'))
+    if repeated:
+        repeated_query_log.append({'request': label, 'statements': repeated, 'logged_at': datetime.now().isoformat()})
+        app.logger.warning('N+1 queries in %s: %s', label, repeated)
@@ -0,0 +1,292 @@
+"""
+Related Books Module - "Patrons also borrowed" recommendations
+Counts how many patrons borrowed each pair of books and keeps every book's top neighbours in a flat lookup table
+"""
+
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the array-module path gives the same results
+    np = None
+
+from database import get_patron_baskets, subscribe_events
+from services.periodic_worker import PeriodicWorker
+
+# Neighbours kept per book
+RELATED_TOP_K = 20
+
+# Only a patron's most recently borrowed distinct books are paired up, so one
+# bulk account cannot add millions of pairs
+MAX_BASKET_BOOKS = 500
+
+# Co-borrowed entries counted at once when building with NumPy
+BUILD_BLOCK_ENTRIES = 250_000
+
+# Seconds between rebuilds from the loan history by RelatedBooksRefresher
+RELATED_BOOKS_REFRESH_INTERVAL = 3600.0
+
+
+def _csr_transpose(offsets, values, width: int):
+    """
+    Invert a CSR mapping (row i -> values[offsets[i]:offsets[i + 1]]) into
+    value -> the rows holding it, for values in range(width).
+    """
+    if np is not None:
+        rows = np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+        order = np.argsort(values, kind='stable')
+        counts = np.bincount(values, minlength=width)
+        return np.concatenate(([0], np.cumsum(counts))), rows[order]
+
+    counts = [0] * (width + 1)
+    for value in values:
+        counts[value + 1] += 1
+    for i in range(width):
+        counts[i + 1] += counts[i]
+    inverted_offsets = array('q', counts)
+    inverted = array('q', bytes(8 * len(values)))
+    fill = counts[:-1]
+    for row in range(len(offsets) - 1):
+        for value in values[offsets[row]:offsets[row + 1]]:
+            inverted[fill[value]] = row
+            fill[value] += 1
+    return inverted_offsets, inverted
+
+
+class RelatedBooksIndex:
+    """
+    Item-item co-occurrence over the loan history: for each book, the books
+    borrowed by the most patrons who also borrowed it.
+
+    The loans are held as two sparse (CSR) matrices in flat arrays: each
+    patron's distinct books, and each book's patrons (its readers). A book's
+    row of the co-occurrence matrix is the count of every book in its readers'
+    baskets; build() computes all rows, block by block with NumPy, and keeps
+    only the top k of each in a lookup table (offsets by book ID into
+    parallel neighbour and patron-count arrays), so related() is a slice.
+
+    New loans (add_loan) extend the patron's basket and add one to the
+    co-borrow count of the new book with each book already in it, in both
+    directions, in small per-book counters that related() adds to the table
+    row. A neighbour that was cut from a full top-k row is then counted from
+    its new loans only, so it can be ranked too low until the next build
+    (RelatedBooksRefresher) folds the new loans into the table.
+
+    Example:
+        index = RelatedBooksIndex()
+        index.build(*get_patron_baskets(MAX_BASKET_BOOKS))
+        index.related(42, 10)
+    """
+
+    def __init__(self, k: int = RELATED_TOP_K):
+        self.k = k
+        self._lock = threading.Lock()
+        self._load([], array('q', [0]), array('q'))
+
+    def _load(self, patron_ids: List[str], offsets, book_ids) -> None:
+        if np is not None:
+            offsets = np.asarray(offsets, dtype=np.int64)
+            book_ids = np.asarray(book_ids, dtype=np.int64)
+        width = int(book_ids.max() if np is not None else max(book_ids)) + 1 if len(book_ids) else 0
+        self._patron_rows: Dict[str, int] = {patron_id: row for row, patron_id in enumerate(patron_ids)}
+        self._basket_offsets = offsets
+        self._basket_books = book_ids
+        self._reader_offsets, self._readers = _csr_transpose(offsets, book_ids, width)
+        # Loans added since the build: patron row -> new books, book ID -> co-borrow counts they added
+        self._new_books: Dict[int, List[int]] = {}
+        self._added: Dict[int, Counter] = {}
+        self._table_offsets, self._table_books, self._table_counts = self._top_neighbours_table(width)
+
+    def build(self, patron_ids: List[str], offsets, book_ids) -> None:
+        """
+        Replace the index with the loans in get_patron_baskets' format: patron
+        i borrowed book_ids[offsets[i]:offsets[i + 1]], each book once.
+        """
+        fresh = RelatedBooksIndex(self.k)
+        fresh._load(patron_ids, offsets, book_ids)
+        with self._lock:
+            self.__dict__.update({name: value for name, value in fresh.__dict__.items() if name != '_lock'})
+
+    def _top_neighbours_table(self, width: int):
+        """(offsets by book ID, neighbour IDs, patron counts) of every book's top k co-borrowed books."""
+        if np is None:
+            offsets, books, counts = array('q', [0]), array('q'), array('q')
+            for book_id in range(width):
+                for other, patrons in self._count_row(book_id):
+                    books.append(other)
+                    counts.append(patrons)
+                offsets.append(len(books))
+            return offsets, books, counts
+
+        basket_sizes = np.diff(self._basket_offsets)
+        # Entries each book's row counts: the basket sizes of its readers, cumulated
+        work = np.concatenate(([0], np.cumsum(basket_sizes[self._readers])))[self._reader_offsets]
+        rows, books, counts = [], [], []
+        start = 0
+        while start < width:
+            end = max(start + 1, int(np.searchsorted(work, work[start] + BUILD_BLOCK_ENTRIES, 'right')) - 1)
+            end = min(end, width)
+            block = self._block_top_neighbours(start, end, basket_sizes, width)
+            for column, values in zip((rows, books, counts), block):
+                column.append(values)
+            start = end
+        rows, books, counts = (np.concatenate(column) if column else np.zeros(0, dtype=np.int64)
+                               for column in (rows, books, counts))
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=width))))
+        return offsets, books, counts
+
+    def _block_top_neighbours(self, start: int, end: int, basket_sizes, width: int):
+        """(book, neighbour, patrons) triples of the top k neighbours of books start to end - 1."""
+        first, last = self._reader_offsets[start], self._reader_offsets[end]
+        readers = self._readers[first:last]
+        reader_books = np.repeat(np.arange(start, end, dtype=np.int64), np.diff(self._reader_offsets[start:end + 1]))
+        # Every (book, other book in one of its readers' baskets) entry, as one code
+        sizes = basket_sizes[readers]
+        starts = self._basket_offsets[readers]
+        positions = np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(int(sizes.sum()))
+        others = self._basket_books[positions]
+        rows = np.repeat(reader_books, sizes)
+        keep = others != rows
+        codes, patrons = np.unique((rows[keep] - start) * width + others[keep], return_counts=True)
+        rows, others = codes // width + start, codes % width
+
+        # Most patrons first, then lowest ID, and the first k of each book
+        order = np.lexsort((others, -patrons, rows))
+        rows, others, patrons = rows[order], others[order], patrons[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows, 'left')
+        top = rank < self.k
+        return rows[top], others[top], patrons[top]
+
+    def _basket(self, row: int) -> List[int]:
+        books = []
+        if row < len(self._basket_offsets) - 1:
+            books = self._basket_books[self._basket_offsets[row]:self._basket_offsets[row + 1]].tolist()
+        return books + self._new_books.get(row, [])
+
+    def _count_row(self, book_id: int) -> List[Tuple[int, int]]:
+        """Recount one book's top k neighbours from its readers' baskets."""
+        readers = []
+        if book_id < len(self._reader_offsets) - 1:
+            readers = self._readers[self._reader_offsets[book_id]:self._reader_offsets[book_id + 1]].tolist()
+        counts = Counter()
+        for row in readers:
+            counts.update(self._basket(row))
+        counts.pop(book_id, None)
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:self.k]
+
+    def add_loan(self, patron_id: str, book_id: int) -> None:
+        """Count a new loan; a book the patron borrowed before changes nothing."""
+        with self._lock:
+            row = self._patron_rows.setdefault(patron_id, len(self._patron_rows))
+            basket = self._basket(row)
+            if book_id in basket or len(basket) >= MAX_BASKET_BOOKS:
+                return
+            self._new_books.setdefault(row, []).append(book_id)
+            added = self._added.setdefault(book_id, Counter())
+            for other in basket:
+                added[other] += 1
+                self._added.setdefault(other, Counter())[book_id] += 1
+
+    def related(self, book_id: int, limit: int) -> List[Tuple[int, int]]:
+        """(book ID, patrons who borrowed both) of the limit books most borrowed with book_id."""
+        with self._lock:
+            added = self._added.get(book_id)
+            if 0 <= book_id < len(self._table_offsets) - 1:
+                start = self._table_offsets[book_id]
+                end = self._table_offsets[book_id + 1] if added else min(self._table_offsets[book_id + 1],
+                                                                         start + limit)
+                row = list(zip(self._table_books[start:end].tolist(), self._table_counts[start:end].tolist()))
+            else:
+                row = []
+            if not added:
+                return row
+            counts = Counter(dict(row))
+            counts.update(added)
+            return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:min(limit, self.k)]
+
+    def __len__(self) -> int:
+        """Number of patrons in the index."""
+        return len(self._patron_rows)
+
+    def nbytes(self) -> int:
+        """Bytes held by the loan matrices and the lookup table."""
+        columns = (self._basket_offsets, self._basket_books, self._reader_offsets, self._readers,
+                   self._table_offsets, self._table_books, self._table_counts)
+        return sum(column.nbytes if np is not None else column.itemsize * len(column) for column in columns)
+
+
+related_index = RelatedBooksIndex()
+_ready = False
+
+# Loans seen while build_related_books reads the history, replayed into the new index
+_pending: Optional[List[Tuple[str, int]]] = None
+_pending_lock = threading.Lock()
+
+
+def _on_loan_created(event: Dict) -> None:
+    loan = (event['payload']['patron_id'], event['payload']['book_id'])
+    with _pending_lock:
+        if _pending is not None:
+            _pending.append(loan)
+    related_index.add_loan(*loan)
+
+
+def build_related_books() -> None:
+    """(Re)build the related books index from the loan history and keep it updated from the event log."""
+    global _pending, _ready
+    with _pending_lock:
+        _pending = []
+    subscribe_events(_on_loan_created, ['loan.created'])
+    try:
+        related_index.build(*get_patron_baskets(MAX_BASKET_BOOKS))
+    finally:
+        with _pending_lock:
+            loans, _pending = _pending, None
+    # Loans already in the history are no-ops, so replaying everything seen during the read is safe
+    for loan in loans:
+        related_index.add_loan(*loan)
+    _ready = True
+
+
+def reset_related_books() -> None:
+    """Empty the index; related book lookups scan the loan history until the next build."""
+    global _ready
+    _ready = False
+    related_index.build([], array('q', [0]), array('q'))
+
+
+def related_book_counts(book_id: int, limit: int = RELATED_TOP_K) -> Optional[List[Tuple[int, int]]]:
+    """
+    The books most borrowed by patrons who borrowed book_id.
+
+    Returns:
+        list of (book ID, patrons who borrowed both), most patrons first,
+        or None when the index is not built
+    """
+    if not _ready:
+        return None
+    return related_index.related(book_id, limit)
+
+
+class RelatedBooksRefresher(PeriodicWorker):
+    """
+    Background thread that calls build_related_books every interval_seconds,
+    folding the loans counted incrementally since the last build into the table.
+
+    Example:
+        refresher = RelatedBooksRefresher(interval_seconds=3600)
+        refresher.start()
+        ...
+        refresher.stop()
+    """
+
+    def __init__(self, interval_seconds: float = RELATED_BOOKS_REFRESH_INTERVAL):
+        super().__init__(interval_seconds, self._build, 'related-books-refresher', run_at_start=False)
+        self.builds = 0
+
+    def _build(self) -> None:
+        build_related_books()
+        self.builds += 1
@@ -0,0 +1,35 @@
+"""
+Replica Service Module - Keeps the read-only reporting snapshot fresh
+Reports read the replica so they stay off the borrow/return write path
+"""
+
+from database import refresh_replica
+from services.periodic_worker import PeriodicWorker
+
+# Seconds between replica snapshots
+REPLICA_REFRESH_INTERVAL = 30.0
+
+# Pages copied per backup step; the source read lock is released between steps
+REPLICA_PAGES_PER_STEP = 256
+
+
+class ReplicaRefresher(PeriodicWorker):
+    """
+    Background thread that snapshots the database into the replica every interval_seconds.
+
+    Example:
+        refresher = ReplicaRefresher(interval_seconds=30)
+        refresher.start()
+        ...
+        refresher.stop()
+    """
+
+    def __init__(self, interval_seconds: float = REPLICA_REFRESH_INTERVAL,
+                 pages_per_step: int = REPLICA_PAGES_PER_STEP, pause_seconds: float = 0.001):
+        super().__init__(interval_seconds, self._refresh, 'replica-refresher')
+        self.pages_per_step = pages_per_step
+        self.pause_seconds = pause_seconds
+
+    def _refresh(self) -> None:
+        if not refresh_replica(self.pages_per_step, self.pause_seconds):
+            self.failures += 1
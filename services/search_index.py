@@ -0,0 +1,143 @@
+"""
+Search Index Module - In-memory trigram index for title and author search
+Answers R6 partial matching without scanning every book in the catalog
+"""
+
+import threading
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Set
+
+from database import get_all_books, subscribe_events
+
+
+def _trigrams(text: str) -> Set[str]:
+    """Return the set of 3-character substrings of text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _contains(postings: array, book_id: int) -> bool:
+    """Binary search a sorted posting list for book_id."""
+    pos = bisect_left(postings, book_id)
+    return pos < len(postings) and postings[pos] == book_id
+
+
+class TrigramIndex:
+    """
+    Trigram inverted index over one text field of the books table.
+
+    Every trigram of the lowercased text maps to a sorted array of book IDs.
+    A query walks the shortest posting list and keeps the IDs present in all
+    the others, then verifies each candidate against the stored text, since
+    sharing trigrams does not guarantee a contiguous match.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, array] = {}
+        self._texts: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._texts.clear()
+
+    def add(self, book_id: int, text: str) -> None:
+        """Index text under book_id. IDs normally arrive in increasing order."""
+        text = text.lower()
+        with self._lock:
+            if book_id in self._texts:
+                return
+            self._texts[book_id] = text
+            for gram in _trigrams(text):
+                postings = self._postings.get(gram)
+                if postings is None:
+                    postings = self._postings[gram] = array('q')
+                if postings and postings[-1] > book_id:
+                    insort(postings, book_id)
+                else:
+                    postings.append(book_id)
+
+    def search(self, term: str) -> List[int]:
+        """Return the IDs of books whose text contains term (case-insensitive)."""
+        needle = term.strip().lower()
+        with self._lock:
+            if len(needle) < 3:
+                # Too short to form a trigram; check the stored text directly
+                return [book_id for book_id, text in self._texts.items() if needle in text]
+
+            postings = []
+            for gram in _trigrams(needle):
+                gram_postings = self._postings.get(gram)
+                if gram_postings is None:
+                    return []
+                postings.append(gram_postings)
+            postings.sort(key=len)
+
+            candidates = postings[0]
+            for other in postings[1:]:
+                candidates = [book_id for book_id in candidates if _contains(other, book_id)]
+                if not candidates:
+                    return []
+
+            return [book_id for book_id in candidates if needle in self._texts[book_id]]
+
+
+title_index = TrigramIndex()
+author_index = TrigramIndex()
+_indexes = {'title': title_index, 'author': author_index}
+_ready = False
+
+
+def index_book(book: Dict) -> None:
+    """Add a single book to the title and author indexes."""
+    title_index.add(book['id'], book['title'])
+    author_index.add(book['id'], book['author'])
+
+
+def _on_book_inserted(event: Dict) -> None:
+    index_book(event['payload'])
+
+
+def build_search_index(books: Optional[List[Dict]] = None) -> None:
+    """
+    (Re)build the indexes from the catalog and keep them updated from the event log.
+
+    Args:
+        books: Book rows to index; defaults to every book in the database
+    """
+    global _ready
+    if books is None:
+        books = get_all_books()
+
+    reset_search_index()
+    for book in books:
+        index_book(book)
+
+    subscribe_events(_on_book_inserted, ['book.inserted'])
+    _ready = True
+
+
+def reset_search_index() -> None:
+    """Empty the indexes; searches fall back to scanning until the next build."""
+    global _ready
+    _ready = False
+    title_index.clear()
+    author_index.clear()
+
+
+def search_book_ids(search_term: str, search_type: str) -> Optional[List[int]]:
+    """
+    Look up matching book IDs in the index.
+
+    Returns:
+        list of book IDs, or None when the index is not built or does not
+        cover search_type and the caller should scan instead
+    """
+    index = _indexes.get(search_type)
+    if not _ready or index is None:
+        return None
+    return index.search(search_term)
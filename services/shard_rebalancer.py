@@ -0,0 +1,99 @@
+"""
+Shard Rebalancer Module - Copies the loan tables onto a new set of patron shards
+Run it with the app stopped, then point SHARD_DATABASES at the new files
+"""
+
+import argparse
+import os
+import sqlite3
+from typing import Dict, List
+
+import database
+
+# Per-patron tables moved between shards; books, events and the rollups stay in DATABASE
+SHARDED_TABLES = ('borrow_records', 'borrow_records_archive', 'patrons')
+
+
+def rebalance_shards(targets: List[str]) -> Dict[str, int]:
+    """
+    Copy every loan, archived loan and patron account from the current shards
+    (or from DATABASE when not yet sharded) into the target files, each row
+    going to the shard patron_shard(patron_id, len(targets)) picks. Loan IDs
+    are kept, and each target numbers new loans from an ID block above every
+    block in use, so IDs in the event log stay valid.
+
+    The targets must not exist yet. The sources are left unchanged, so going
+    back is a matter of restoring the old SHARD_DATABASES. Nothing may write
+    while this runs.
+
+    Returns:
+        dict of target path -> loans copied into it (live and archived)
+    """
+    sources = list(database.SHARD_DATABASES or [database.DATABASE])
+    if not targets:
+        raise ValueError('At least one target shard is needed')
+    for path in targets:
+        if os.path.exists(path):
+            raise ValueError(f'Target shard {path} already exists')
+
+    # Anything still in a source outbox belongs in the global feed, not in a copied shard
+    if database.relay_shard_events() < 0:
+        raise RuntimeError('Could not relay the shard outboxes')
+
+    top_block = max(_top_loan_id(path) for path in sources) // database.SHARD_ID_BLOCK
+    for index, path in enumerate(targets):
+        database.init_shard_database(path, (top_block + 1 + index) * database.SHARD_ID_BLOCK)
+
+    copied = {path: 0 for path in targets}
+    for source in sources:
+        conn = sqlite3.connect(source)
+        conn.create_function('patron_shard', 2, database.patron_shard, deterministic=True)
+        for index, path in enumerate(targets):
+            conn.execute('ATTACH DATABASE ? AS ?', (path, f'target{index}'))
+        try:
+            conn.execute('BEGIN')
+            for index, path in enumerate(targets):
+                for table in SHARDED_TABLES:
+                    columns = ', '.join(row[1] for row in conn.execute(f'PRAGMA target{index}.table_info({table})'))
+                    moved = conn.execute(f'''
+                        INSERT INTO target{index}.{table} ({columns})
+                        SELECT {columns} FROM main.{table} WHERE patron_shard(patron_id, ?) = ?
+                    ''', (len(targets), index)).rowcount
+                    if table != 'patrons':
+                        copied[path] += moved
+            conn.commit()
+        finally:
+            conn.close()
+    return copied
+
+
+def _top_loan_id(path: str) -> int:
+    """Highest loan ID a source shard has used or will hand out next."""
+    conn = sqlite3.connect(path)
+    row = conn.execute('''
+        SELECT MAX(COALESCE((SELECT MAX(id) FROM borrow_records), 0),
+                   COALESCE((SELECT MAX(id) FROM borrow_records_archive), 0),
+                   COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'borrow_records'), 0))
+    ''').fetchone()
+    conn.close()
+    return row[0]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Copy the loan tables onto a new set of patron shards.')
+    parser.add_argument('--database', default=database.DATABASE, help='catalog database (DATABASE)')
+    parser.add_argument('--source', action='append', dest='sources',
+                        help='a current shard, once per shard in order; none while loans are in the catalog')
+    parser.add_argument('targets', nargs='+', help='new shard files, in SHARD_DATABASES order')
+    args = parser.parse_args(argv)
+
+    database.DATABASE = args.database
+    database.SHARD_DATABASES = args.sources or None
+    copied = rebalance_shards(args.targets)
+    for path, loans in copied.items():
+        print(f"{path}: {loans} loans")
+    print(f"Set SHARD_DATABASES = {args.targets!r} before starting the app.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Suggest Index Module - Prefix index for title and author autocomplete
+Backs the /api/suggest typeahead with sorted word-start keys and borrow popularity
+"""
+
+import heapq
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional
+
+from database import get_all_books, get_borrow_counts, subscribe_events
+
+# Prefixes this short match a large slice of the catalog, so their results are memoized
+CACHED_PREFIX_LENGTH = 2
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+def normalize(text: str) -> str:
+    """Casefold, drop punctuation and collapse whitespace."""
+    return ' '.join(_PUNCTUATION.sub('', text.casefold()).split())
+
+
+class SuggestIndex:
+    """
+    Sorted list of (key, book_id) entries for one field.
+
+    Each word of the normalized text starts a key ("to kill a mockingbird",
+    "kill a mockingbird", ...), so typing the start of any word finds the
+    book. The matches for a prefix are one contiguous slice found with two
+    binary searches; the top-k of that slice is picked by popularity.
+    """
+
+    def __init__(self):
+        self._entries: List[tuple] = []
+        self._top_cache: Dict[tuple, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = []
+            self._top_cache.clear()
+
+    @staticmethod
+    def _keys(text: str) -> List[str]:
+        words = normalize(text).split()
+        return [' '.join(words[i:]) for i in range(len(words))]
+
+    def load(self, items) -> None:
+        """Replace the contents with (book_id, text) pairs in one sort."""
+        entries = sorted((key, book_id) for book_id, text in items for key in self._keys(text))
+        with self._lock:
+            self._entries = entries
+            self._top_cache.clear()
+
+    def add(self, book_id: int, text: str) -> None:
+        with self._lock:
+            for key in self._keys(text):
+                insort(self._entries, (key, book_id))
+            self._top_cache.clear()
+
+    def clear_top_cache(self) -> None:
+        """Drop memoized results, e.g. after popularity changed."""
+        with self._lock:
+            self._top_cache.clear()
+
+    def top(self, prefix: str, limit: int, popularity: Dict[int, int]) -> List[int]:
+        """Return up to limit book IDs with a word starting with prefix, most borrowed first."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        cache_key = (prefix, limit)
+        with self._lock:
+            if cache_key in self._top_cache:
+                return self._top_cache[cache_key]
+
+            start = bisect_left(self._entries, (prefix,))
+            # U+FFFF sorts after any character a key can continue the prefix with
+            end = bisect_left(self._entries, (prefix + '\uffff',), start)
+            book_ids = {book_id for _, book_id in self._entries[start:end]}
+            best = heapq.nsmallest(limit, book_ids, key=lambda book_id: (-popularity.get(book_id, 0), book_id))
+
+            if len(prefix) <= CACHED_PREFIX_LENGTH:
+                self._top_cache[cache_key] = best
+            return best
+
+
+title_suggest = SuggestIndex()
+author_suggest = SuggestIndex()
+_indexes = {'title': title_suggest, 'author': author_suggest}
+_books: Dict[int, Dict] = {}
+_popularity: Dict[int, int] = {}
+_ready = False
+
+
+def index_book_suggestions(book: Dict) -> None:
+    """Add a single book to the title and author suggestion indexes."""
+    _books[book['id']] = {'id': book['id'], 'title': book['title'], 'author': book['author']}
+    title_suggest.add(book['id'], book['title'])
+    author_suggest.add(book['id'], book['author'])
+
+
+def _on_event(event: Dict) -> None:
+    """Index new books and count new loans toward popularity as they commit."""
+    payload = event['payload']
+    if event['type'] == 'book.inserted':
+        index_book_suggestions(payload)
+    elif event['type'] == 'loan.created':
+        _popularity[payload['book_id']] = _popularity.get(payload['book_id'], 0) + 1
+        title_suggest.clear_top_cache()
+        author_suggest.clear_top_cache()
+
+
+def build_suggest_index(books: Optional[List[Dict]] = None,
+                        popularity: Optional[Dict[int, int]] = None) -> None:
+    """
+    (Re)build the suggestion indexes and keep them updated from the event log.
+
+    Args:
+        books: Book rows to index; defaults to every book in the database
+        popularity: Borrow count per book ID; defaults to counts from borrow_records
+    """
+    global _ready
+    if books is None:
+        books = get_all_books()
+    if popularity is None:
+        popularity = get_borrow_counts()
+
+    reset_suggest_index()
+    _popularity.update(popularity)
+    for book in books:
+        _books[book['id']] = {'id': book['id'], 'title': book['title'], 'author': book['author']}
+    title_suggest.load((book['id'], book['title']) for book in books)
+    author_suggest.load((book['id'], book['author']) for book in books)
+
+    subscribe_events(_on_event, ['book.inserted', 'loan.created'])
+    _ready = True
+
+
+def reset_suggest_index() -> None:
+    """Empty the indexes; the next suggestion request rebuilds them."""
+    global _ready
+    _ready = False
+    _books.clear()
+    _popularity.clear()
+    title_suggest.clear()
+    author_suggest.clear()
+
+
+def suggest(prefix: str, suggest_type: str, limit: int) -> List[Dict]:
+    """
+    Return up to limit books whose title or author has a word starting with prefix.
+
+    Returns:
+        list of {'id', 'title', 'author'} dicts, most borrowed first
+    """
+    if not _ready:
+        build_suggest_index()
+    index = _indexes[suggest_type]
+    return [_books[book_id] for book_id in index.top(prefix, limit, _popularity)]
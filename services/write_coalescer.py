@@ -0,0 +1,152 @@
+"""
+Write Coalescer Module - Group commit for borrow/return traffic
+Request threads queue their mutations and one writer thread applies them a batch per transaction
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+# Mutations applied together in one transaction at most
+WRITE_BATCH_MAX_SIZE = 64
+
+# Seconds the writer waits for more mutations after the first one of a batch arrives
+WRITE_BATCH_MAX_DELAY = 0.002
+
+
+class WriteCoalescer:
+    """
+    Single writer thread in front of the batch write helpers.
+
+    handlers maps a mutation kind to a function that applies a list of
+    mutations of that kind in one transaction and returns one result per
+    mutation, in order (borrow_books_batch and return_books_batch). The writer
+    takes the first queued mutation, waits up to max_delay_seconds for up to
+    max_batch_size - 1 more, and hands each run of consecutive same-kind
+    mutations to its handler, so mutations still apply in submission order.
+
+    Example:
+        coalescer = WriteCoalescer({'borrow': borrow_books_batch})
+        coalescer.start()
+        result = coalescer.submit('borrow', ('123456', 1)).result()
+        coalescer.stop()
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[[List], List]],
+                 max_batch_size: int = WRITE_BATCH_MAX_SIZE, max_delay_seconds: float = WRITE_BATCH_MAX_DELAY):
+        self.handlers = handlers
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_delay_seconds = max_delay_seconds
+        self.batches = 0
+        self.mutations = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = True
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if not self.running:
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, name='write-coalescer', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Apply everything already queued, then stop the writer."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, kind: str, mutation) -> Future:
+        """Queue one mutation; the future resolves to its handler result. Raises RuntimeError once stopped."""
+        return self.submit_many(kind, [mutation])[0]
+
+    def submit_many(self, kind: str, mutations: List) -> List[Future]:
+        """Queue several mutations back to back, all or none; one future per mutation."""
+        if kind not in self.handlers:
+            raise ValueError(f"No handler for {kind!r} mutations")
+        futures = [Future() for _ in mutations]
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Write coalescer is not running")
+            for mutation, future in zip(mutations, futures):
+                self._queue.put((kind, mutation, future))
+        return futures
+
+    def _collect(self, first) -> tuple:
+        """Gather a batch starting with first; returns (batch, stop requested)."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _apply(self, batch: List) -> None:
+        start = 0
+        while start < len(batch):
+            kind = batch[start][0]
+            end = start
+            while end < len(batch) and batch[end][0] == kind:
+                end += 1
+            run = batch[start:end]
+            try:
+                results = self.handlers[kind]([mutation for _, mutation, _ in run])
+            except Exception as error:
+                for _, _, future in run:
+                    future.set_exception(error)
+            else:
+                for (_, _, future), result in zip(run, results):
+                    future.set_result(result)
+            start = end
+        self.batches += 1
+        self.mutations += len(batch)
+
+    def _run(self) -> None:
+        # The stop sentinel is the last item ever queued, so reaching it means the queue is drained
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stopping = self._collect(first)
+            self._apply(batch)
+
+_coalescer: Optional[WriteCoalescer] = None
+
+
+def install_write_coalescer(coalescer: WriteCoalescer) -> None:
+    """Start coalescer and route borrow/return writes through it."""
+    global _coalescer
+    uninstall_write_coalescer()
+    coalescer.start()
+    _coalescer = coalescer
+
+
+def uninstall_write_coalescer() -> None:
+    """Stop the installed coalescer after it applies its queue; writes go direct again."""
+    global _coalescer
+    coalescer, _coalescer = _coalescer, None
+    if coalescer is not None:
+        coalescer.stop()
+
+
+def current_write_coalescer() -> Optional[WriteCoalescer]:
+    """The installed coalescer, or None when writes commit on the calling thread."""
+    return _coalescer
@@ -0,0 +1,25 @@
+import pytest
+import database
+from database import init_database, close_pooled_connection
+from services.availability_cache import close_availability_cache
+from services.catalog_snapshot import close_catalog_snapshot
+from services.fuzzy_index import reset_fuzzy_index
+from services.isbn_index import reset_isbn_index
+from services.related_books import reset_related_books
+from services.search_index import reset_search_index
+from services.suggest_index import reset_suggest_index
+
+@pytest.fixture(autouse=True)
+def temp_db(tmp_path, monkeypatch):
+    """Run every test against a fresh database in tmp_path and drop the in-memory indexes it built."""
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "library.db"))
+    init_database()
+    yield
+    close_availability_cache()
+    close_catalog_snapshot()
+    close_pooled_connection()
+    reset_search_index()
+    reset_isbn_index()
+    reset_suggest_index()
+    reset_fuzzy_index()
+    reset_related_books()
@@ -0,0 +1,74 @@
+import threading
+import time
+from app import create_app
+from routes import borrowing_routes
+from services.admission import AdmissionGate
+
+def test_gate_queues_then_sheds():
+    gate = AdmissionGate(1, max_waiting=1, wait_timeout=0.05)
+    assert gate.acquire() is None
+    assert gate.acquire() == "timeout"
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(gate.acquire()))
+    gate.wait_timeout = 5
+    waiter.start()
+    while gate.waiting == 0:
+        time.sleep(0.001)
+    assert gate.acquire() == "queue_full"
+    gate.release()
+    waiter.join()
+    assert results == [None]
+    assert gate.snapshot()["active"] == 1
+    assert gate.snapshot()["rejected"] == 1 and gate.snapshot()["timed_out"] == 1
+
+def test_disabled_by_default():
+    app = create_app()
+    assert "admission" not in app.extensions
+    assert app.test_client().get("/api/metrics").get_json()["admission"] is None
+
+def test_write_storm_is_shed_while_reads_continue(monkeypatch):
+    release = threading.Event()
+    def stalled_borrow(patron_id, book_id):
+        release.wait(5)
+        return True, "Borrowed"
+    monkeypatch.setattr(borrowing_routes, "borrow_book_by_patron", stalled_borrow)
+    app = create_app({"ADMISSION_CONTROL": True, "ADMISSION_WRITE_CONCURRENCY": 2,
+                      "ADMISSION_QUEUE_SIZE": 2, "ADMISSION_QUEUE_TIMEOUT": 0.2})
+
+    statuses = []
+    def borrow():
+        response = app.test_client().post("/borrow", data={"patron_id": "123456", "book_id": "1"})
+        statuses.append((response.status_code, response.headers.get("Retry-After")))
+    writers = [threading.Thread(target=borrow) for _ in range(8)]
+    for writer in writers:
+        writer.start()
+    time.sleep(0.05)
+
+    started = time.perf_counter()
+    assert app.test_client().get("/catalog").status_code == 200
+    assert time.perf_counter() - started < 0.5
+    metrics = app.test_client().get("/api/metrics").get_json()["admission"]
+    assert metrics["borrowing.write"]["active"] == 2
+
+    time.sleep(0.3)
+    release.set()
+    for writer in writers:
+        writer.join()
+    codes = sorted(code for code, _ in statuses)
+    assert codes.count(302) == 2
+    assert set(codes[2:]) <= {429, 503} and len(codes) == 8
+    assert all(retry == "1" for code, retry in statuses if code != 302)
+    metrics = app.test_client().get("/api/metrics").get_json()["admission"]
+    assert metrics["borrowing.write"]["rejected"] + metrics["borrowing.write"]["timed_out"] == 6
+    assert metrics["catalog.read"]["admitted"] == 1
+
+def test_api_shed_response_is_json():
+    app = create_app({"ADMISSION_CONTROL": True, "ADMISSION_LIMITS": {"api": {"read": 1}},
+                      "ADMISSION_QUEUE_SIZE": 0})
+    gate = app.extensions["admission"].gate("api", "read")
+    assert gate.acquire() is None
+    response = app.test_client().get("/api/search?q=gatsby")
+    gate.release()
+    assert response.status_code == 429
+    assert response.get_json()["error"]
+    assert response.headers["Retry-After"] == "1"
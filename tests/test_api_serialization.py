@@ -0,0 +1,73 @@
+import gzip
+import json
+import pytest
+from app import create_app
+from routes import serialization
+from database import insert_book
+
+@pytest.fixture(autouse=True)
+def shelf_books():
+    for i in range(1, 41):
+        insert_book(f"Shelf Book {i}", "Author Ünlü", f"{1000000000000 + i}", 2, 2)
+
+@pytest.fixture
+def client():
+    return create_app().test_client()
+
+def test_json_matches_the_stdlib_encoder(client, monkeypatch):
+    fast = client.get("/api/search?q=shelf")
+    assert fast.content_type == "application/json"
+    assert fast.headers["Vary"] == "Accept, Accept-Encoding"
+    assert "Content-Encoding" not in fast.headers
+
+    monkeypatch.setattr(serialization, "orjson", None)
+    fallback = client.get("/api/search?q=shelf")
+    assert json.loads(fast.data) == json.loads(fallback.data)
+    assert fast.get_json()["count"] == 40
+
+def test_msgpack_when_accepted(client):
+    msgpack = pytest.importorskip("msgpack")
+    expected = client.get("/api/search?q=shelf").get_json()
+    response = client.get("/api/search?q=shelf", headers={"Accept": "application/msgpack"})
+    assert response.content_type == "application/msgpack"
+    assert msgpack.unpackb(response.data) == expected
+
+    # JSON stays the default for wildcards and anything not offered
+    for accept in ("*/*", "text/html", "application/json;q=1, application/msgpack;q=0.5"):
+        assert client.get("/api/search?q=shelf", headers={"Accept": accept}).content_type == "application/json"
+
+def test_fields_projection(client):
+    body = client.get("/api/search?q=shelf&fields=id, title").get_json()
+    assert body["count"] == 40 and body["search_term"] == "shelf"
+    assert all(set(book) == {"id", "title"} for book in body["results"])
+
+    body = client.get("/api/books?ids=1,999&fields=isbn,nope").get_json()
+    assert body["books"] == [{"isbn": "1000000000001"}]
+    assert body["missing"] == [999]
+
+def test_gzip_above_threshold(client):
+    response = client.get("/api/search?q=shelf", headers={"Accept-Encoding": "gzip, deflate"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.data))["count"] == 40
+
+    small = client.get("/api/search?q=shelf&fields=id", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers  # under API_GZIP_MIN_BYTES
+    refused = client.get("/api/search?q=shelf", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in refused.headers
+
+    response = create_app({"API_GZIP_MIN_BYTES": None}).test_client().get(
+        "/api/search?q=shelf", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+def test_registered_serializer(client, monkeypatch):
+    monkeypatch.setattr(serialization, "SERIALIZERS", dict(serialization.SERIALIZERS))
+    serialization.register_serializer("text/plain", lambda body: str(body["count"]).encode())
+    response = client.get("/api/search?q=shelf", headers={"Accept": "text/plain"})
+    assert response.content_type == "text/plain" and response.data == b"40"
+
+def test_json_outside_the_64_bit_range(client):
+    big = 99999999999999999999999
+    assert json.loads(serialization._encode_json({"missing": [big]})) == {"missing": [big]}
+    response = client.get(f"/api/books?ids={big}")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "ids must be 64-bit integers"}
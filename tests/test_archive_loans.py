@@ -0,0 +1,43 @@
+import pytest
+import database
+from datetime import datetime, timedelta
+from database import (
+    init_database, insert_book, insert_borrow_record, update_borrow_record_return_date,
+    get_patron_borrow_count, get_patron_borrow_history, get_borrow_counts, get_db_connection
+)
+from services.archive_service import archive_old_loans
+
+@pytest.fixture(params=["same file", "attached file"])
+def loans(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "library.db"))
+    if request.param == "attached file":
+        monkeypatch.setattr(database, "ARCHIVE_DATABASE", str(tmp_path / "archive.db"))
+    init_database()
+    insert_book("Old Book", "Author", "1000000000001", 5, 5)
+    now = datetime.now()
+    for days_ago in (800, 700, 600):
+        insert_borrow_record("123456", 1, now - timedelta(days=days_ago), now - timedelta(days=days_ago - 14))
+        update_borrow_record_return_date("123456", 1, now - timedelta(days=days_ago - 10))
+    insert_borrow_record("123456", 1, now - timedelta(days=20), now - timedelta(days=6))
+    update_borrow_record_return_date("123456", 1, now - timedelta(days=10))
+    insert_borrow_record("123456", 1, now - timedelta(days=2), now + timedelta(days=12))
+
+def live_count():
+    conn = get_db_connection()
+    count = conn.execute("SELECT COUNT(*) as count FROM borrow_records").fetchone()["count"]
+    conn.close()
+    return count
+
+def test_archive_moves_only_old_closed_loans(loans):
+    assert archive_old_loans(horizon_days=365, batch_size=2) == 3
+    assert live_count() == 2
+    assert get_patron_borrow_count("123456") == 1
+    assert archive_old_loans(horizon_days=365) == 0
+
+def test_history_spans_live_and_archive(loans):
+    archive_old_loans(horizon_days=365)
+    history = get_patron_borrow_history("123456")
+    assert len(history) == 5
+    assert history[0]["return_date"] is None
+    assert history[0]["title"] == "Old Book"
+    assert get_borrow_counts() == {1: 5}
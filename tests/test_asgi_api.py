@@ -0,0 +1,152 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+from asgi import LibraryAsgiApp
+from app import create_app
+from database import insert_book
+from services.async_executor import shutdown_db_executor
+
+@pytest.fixture(autouse=True)
+def db_executor():
+    yield
+    shutdown_db_executor()
+
+@pytest.fixture
+def apps():
+    flask_app = create_app()
+    asgi_app = LibraryAsgiApp(flask_app)
+    yield asgi_app, flask_app.test_client()
+    asgi_app.close()
+
+async def call(app, method, path, query=b"", body=b"", headers=()):
+    """Run one request through an ASGI app; returns (status, headers, body, number of body messages)."""
+    scope = {"type": "http", "method": method, "path": path, "query_string": query, "root_path": "",
+             "headers": [(b"host", b"testserver"), *headers], "http_version": "1.1", "scheme": "http",
+             "server": ("testserver", 80), "client": ("127.0.0.1", 5000)}
+    requests = [{"type": "http.request", "body": body, "more_body": False}]
+    messages = []
+
+    async def receive():
+        return requests.pop(0) if requests else {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = messages[0]
+    chunks = [m["body"] for m in messages[1:] if m.get("body")]
+    return start["status"], dict(start["headers"]), b"".join(chunks), len(messages) - 1
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_native_endpoints_match_the_blueprint(apps):
+    app, client = apps
+    for path, query in [("/api/search", b"q=gatsby"), ("/api/search", b""), ("/api/books", b"ids=1,2,99"),
+                        ("/api/books", b"ids=99999999999999999999999"),
+                        ("/api/books", b"isbns=9780451524935"), ("/api/suggest", b"q=the&limit=2"),
+                        ("/api/late_fee/123456/3", b""), ("/api/events", b"since=0&limit=3")]:
+        status, headers, body, _ = run(call(app, "GET", path, query))
+        expected = client.get(f"{path}?{query.decode()}")
+        assert (status, body) == (expected.status_code, expected.data), path
+        assert headers[b"content-type"] == b"application/json"
+
+def test_json_posts(apps):
+    app, client = apps
+    payload = json.dumps({"items": [{"patron_id": "654321", "book_id": 1}]}).encode()
+    status, _, body, _ = run(call(app, "POST", "/api/borrows/batch", body=payload,
+                                  headers=[(b"content-type", b"application/json")]))
+    assert status == 200 and json.loads(body)["succeeded"] == 1
+    assert client.get("/api/books?ids=1").get_json()["books"][0]["available_copies"] == 2
+
+    status, _, body, _ = run(call(app, "POST", "/api/books/lookup", body=b'{"ids": [1]}'))
+    assert status == 400  # not sent as JSON, like request.get_json(silent=True)
+    status, _, body, _ = run(call(app, "POST", "/api/returns/batch", body=b"{not json",
+                                  headers=[(b"content-type", b"application/json")]))
+    assert status == 400
+
+def test_long_poll_waits_without_a_thread(apps):
+    app, client = apps
+    cursor = client.get("/api/events?limit=500").get_json()["next_cursor"]
+    query = f"since={cursor}&timeout=5".encode()
+
+    async def scenario():
+        polls = [asyncio.create_task(call(app, "GET", "/api/events", query)) for _ in range(50)]
+        await asyncio.sleep(0.2)
+        waiting = sum(1 for thread in threading.enumerate() if thread.name.startswith("async-db"))
+        insert = asyncio.get_running_loop().run_in_executor(
+            None, insert_book, "Fresh Book", "Author", "1000000000009", 1, 1)
+        await insert
+        started = time.monotonic()
+        results = await asyncio.gather(*polls)
+        return waiting, time.monotonic() - started, results
+
+    waiting, elapsed, results = run(scenario())
+    # The polls share the DB executor's threads instead of holding one each
+    assert waiting <= 16
+    assert elapsed < 2
+    for status, _, body, _ in results:
+        assert status == 200
+        assert [event["type"] for event in json.loads(body)["events"]] == ["book.inserted"]
+
+def test_html_and_other_routes_go_through_flask(apps):
+    app, client = apps
+    status, headers, body, messages = run(call(app, "GET", "/catalog"))
+    assert status == 200 and headers[b"content-type"].startswith(b"text/html")
+    assert b"The Great Gatsby" in body and body == client.get("/catalog").data
+    assert messages > 1  # streamed, not buffered
+
+    status, _, body, _ = run(call(app, "GET", "/api/metrics"))
+    assert status == 200 and json.loads(body)["admission"] is None
+    status, _, _, _ = run(call(app, "DELETE", "/api/search"))
+    assert status == 405
+
+def test_lifespan_shuts_down_executors(apps):
+    app, _ = apps
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    run(app({"type": "lifespan"}, receive, send))
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+
+def test_native_endpoints_negotiate_like_the_blueprint():
+    flask_app = create_app({"API_GZIP_MIN_BYTES": 64})
+    app, client = LibraryAsgiApp(flask_app), flask_app.test_client()
+    for headers, query in [({"Accept": "application/msgpack"}, b"q=gatsby"), ({}, b"q=the&fields=title"),
+                           ({"Accept-Encoding": "gzip"}, b"q=e")]:
+        status, sent, body, _ = run(call(app, "GET", "/api/search", query,
+                                         headers=[(k.lower().encode(), v.encode()) for k, v in headers.items()]))
+        expected = client.get(f"/api/search?{query.decode()}", headers=headers)
+        assert (status, body) == (expected.status_code, expected.data)
+        assert sent[b"content-type"].decode() == expected.content_type
+        assert sent.get(b"content-encoding", b"").decode() == expected.headers.get("Content-Encoding", "")
+    assert expected.headers["Content-Encoding"] == "gzip"
+    app.close()
+
+def test_native_endpoints_take_the_admission_gates():
+    flask_app = create_app({"ADMISSION_CONTROL": True, "ADMISSION_LIMITS": {"api": {"write": 1}},
+                            "ADMISSION_QUEUE_SIZE": 0})
+    app = LibraryAsgiApp(flask_app)
+    gate = flask_app.extensions["admission"].gate("api", "write")
+    payload = json.dumps({"items": [{"patron_id": "654321", "book_id": 1}]}).encode()
+    request = call(app, "POST", "/api/borrows/batch", body=payload, headers=[(b"content-type", b"application/json")])
+
+    assert gate.acquire() is None
+    status, headers, body, _ = run(request)
+    gate.release()
+    assert status == 429 and headers[b"retry-after"] == b"1" and json.loads(body)["error"]
+
+    status, _, body, _ = run(call(app, "POST", "/api/borrows/batch", body=payload,
+                                  headers=[(b"content-type", b"application/json")]))
+    assert status == 200 and json.loads(body)["succeeded"] == 1
+    assert gate.snapshot()["active"] == 0 and gate.snapshot()["admitted"] == 2
+    assert "api.read" not in flask_app.extensions["admission"].metrics()
+    app.close()
@@ -0,0 +1,108 @@
+import multiprocessing
+import pytest
+import database
+from app import create_app
+from database import insert_book, update_book_availability, get_book_by_id
+from services import availability_cache, library_service
+from services.availability_cache import (
+    AvailabilityCache, open_availability_cache, close_availability_cache, current_availability_cache,
+    cached_available_copies, HEADER
+)
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+@pytest.fixture(autouse=True)
+def books():
+    insert_book("Zebra Crossing", "Author", "1000000000001", 3, 1)
+    insert_book("Apple Orchard", "Author", "1000000000002", 1, 0)
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "availability")
+
+def update_in_other_worker(db_path, cache_path, book_id, change):
+    database.DATABASE = db_path
+    open_availability_cache(cache_path)
+    update_book_availability(book_id, change)
+    close_availability_cache()
+
+def test_open_resyncs_from_the_database(path):
+    cache = open_availability_cache(path)
+    assert current_availability_cache() is cache
+    assert cache.get(1) == 1 and cache.get(2) == 0
+    assert cache.get(3) is None and cache.get(10**6) is None
+    assert len(cache) == availability_cache.MIN_SLOTS
+
+def test_writes_follow_the_database(path):
+    open_availability_cache(path)
+    update_book_availability(1, 1)
+    assert cached_available_copies(1) == 2
+    assert borrow_book_by_patron("123456", 1)[0] is True
+    assert cached_available_copies(1) == 1
+    assert return_book_by_patron("123456", 1)[0] is True
+    assert cached_available_copies(1) == 2
+    insert_book("New Arrival", "Author", "1000000000003", 2, 2)
+    assert cached_available_copies(3) == 2
+    close_availability_cache()
+    assert cached_available_copies(3) is None
+
+def test_table_grows_and_other_workers_remap(path, monkeypatch):
+    monkeypatch.setattr(availability_cache, "MIN_SLOTS", 4)
+    cache = open_availability_cache(path)
+    reader = AvailabilityCache(path)
+    for i in range(3, 10):
+        insert_book(f"Book {i}", "Author", f"100000000000{i}", 1, 1)
+    assert len(cache) == 16 and cache.get(9) == 1
+    assert len(reader) == 4 and reader.get(9) == 1 and len(reader) == 16
+    reader.close()
+
+def test_restart_repairs_stale_and_corrupt_files(path):
+    cache = open_availability_cache(path)
+    cache._slots[1] = 7  # a worker died between its commit and its table write
+    assert open_availability_cache(path).get(1) == 1
+    with open(path, "r+b") as f:
+        f.write(b"garbage!")
+    assert open_availability_cache(path).get(1) == 1
+    with open(path, "rb") as f:
+        assert HEADER.unpack(f.read(HEADER.size))[0] == availability_cache.MAGIC
+
+def test_updates_from_another_process(path):
+    cache = open_availability_cache(path)
+    context = multiprocessing.get_context("spawn")
+    worker = context.Process(target=update_in_other_worker, args=(database.DATABASE, path, 1, 2))
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 0
+    assert cache.get(1) == 3 == get_book_by_id(1)["available_copies"]
+
+def test_borrow_precheck_skips_loading_the_book(path, monkeypatch):
+    open_availability_cache(path)
+    monkeypatch.setattr(library_service, "get_book_by_id", lambda book_id: pytest.fail("book loaded"))
+    assert borrow_book_by_patron("123456", 2) == (False, "Book not available")
+
+def test_borrow_precheck_confirms_a_zero(path):
+    cache = open_availability_cache(path)
+    cache._slots[1] = 0  # stale: the database still has a copy
+    assert borrow_book_by_patron("123456", 1)[0] is True
+    assert cache.get(1) == 0 == get_book_by_id(1)["available_copies"]
+
+def test_borrow_still_checks_the_database(path):
+    cache = open_availability_cache(path)
+    cache._slots[2] = 1  # stale: the database has no copies left
+    assert borrow_book_by_patron("123456", 2) == (False, "Book not available")
+    assert borrow_book_by_patron("123456", 1)[0] is True
+    assert cache.get(1) == 0
+
+def test_catalog_reads_the_shared_mappings(tmp_path, monkeypatch, path):
+    app = create_app({"CATALOG_SNAPSHOT": str(tmp_path / "catalog.snap"), "AVAILABILITY_CACHE": path})
+    client = app.test_client()
+    borrow_book_by_patron("123456", 1)
+    monkeypatch.setattr(library_service, "iter_all_books", lambda: pytest.fail("database scan"))
+    page = client.get("/catalog").get_data(as_text=True)
+    assert page.index("Apple Orchard") < page.index("Zebra Crossing")
+    assert "0/3 Available" not in page and page.count("Not Available") == 2
+    # Books added after the snapshot was written are merged in, in title order
+    insert_book("Middle March", "Author", "1000000000003", 2, 2)
+    page = client.get("/catalog").get_data(as_text=True)
+    assert page.index("Apple Orchard") < page.index("Middle March") < page.index("Zebra Crossing")
+    app.extensions["availability_resyncer"].stop()
+    app.extensions["catalog_snapshot_refresher"].stop()
@@ -0,0 +1,55 @@
+import pytest
+import database
+from datetime import datetime, timedelta
+from database import insert_book, insert_borrow_record, get_book_by_id, get_patron_borrow_count
+from services.library_service import borrow_books_batch, return_books_batch
+
+@pytest.fixture(autouse=True)
+def books():
+    insert_book("Batch Book", "Author", "1000000000001", 2, 2)
+    insert_book("Other Book", "Author", "1000000000002", 10, 10)
+
+def test_batch_borrow_applies_valid_items():
+    results = borrow_books_batch([("123456", 1), ("654321", 1), ("111111", 1), ("abc", 2), ("123456", 99)])
+    assert [r["success"] for r in results] == [True, True, False, False, False]
+    assert "not available" in results[2]["message"].lower()
+    assert "invalid id" in results[3]["message"].lower()
+    assert get_book_by_id(1)["available_copies"] == 0
+    assert get_patron_borrow_count("123456") == 1
+
+def test_batch_borrow_enforces_limit_within_batch():
+    results = borrow_books_batch([("123456", 2)] * 6)
+    assert [r["success"] for r in results] == [True] * 5 + [False]
+    assert "limit" in results[5]["message"]
+    assert get_book_by_id(2)["available_copies"] == 5
+
+def test_batch_return_reports_late_fees():
+    now = datetime.now()
+    insert_borrow_record("123456", 1, now - timedelta(days=30), now - timedelta(days=16))
+    insert_borrow_record("654321", 2, now - timedelta(days=3), now + timedelta(days=11))
+    database.update_book_availability(1, -1)
+    database.update_book_availability(2, -1)
+
+    results = return_books_batch([("123456", 1), ("654321", 2), ("654321", 2), ("123456", 77)])
+    assert [r["success"] for r in results] == [True, True, False, False]
+    assert results[0]["days_overdue"] == 16
+    assert results[0]["fee_amount"] == 12.50
+    assert results[1]["fee_amount"] == 0
+    assert "not borrowed" in results[2]["message"].lower()
+    assert get_book_by_id(1)["available_copies"] == 2
+    assert get_patron_borrow_count("654321") == 0
+
+def test_batch_return_skips_loans_closed_concurrently(monkeypatch):
+    borrow_books_batch([("123456", 1), ("654321", 1)])
+    stale_loans = database.get_open_borrow_records(["123456", "654321"])
+    # Another worker returns the first loan between the read and the write
+    assert return_books_batch([("123456", 1)])[0]["success"] is True
+    monkeypatch.setattr("services.library_service.get_open_borrow_records", lambda patron_ids: stale_loans)
+
+    results = return_books_batch([("123456", 1), ("654321", 1)])
+    assert [r["success"] for r in results] == [False, True]
+    assert results[0]["message"] == "Not borrowed" and "fee_amount" not in results[0]
+    assert get_book_by_id(1)["available_copies"] == 2
+    assert get_patron_borrow_count("123456") == 0
+    assert database.update_return_dates_batch([(stale_loans[0]["id"], "123456", 1, datetime.now(), 5.0)]) == set()
+    assert get_book_by_id(1)["available_copies"] == 2
@@ -0,0 +1,63 @@
+import pytest
+from app import create_app
+from database import insert_book
+from services.library_service import lookup_books_by_ids, lookup_books_by_isbns
+from services.query_tracer import QueryTracer
+from services.isbn_index import build_isbn_index
+
+@pytest.fixture(autouse=True)
+def books():
+    for i in range(1, 6):
+        insert_book(f"Book {i}", "Author", f"100000000000{i}", 1, 1)
+
+def test_lookup_by_ids_keeps_input_order_and_reports_misses():
+    with QueryTracer() as tracer:
+        result = lookup_books_by_ids([4, 99, 2, 4, 1, 0])
+    assert len(tracer) == 1
+    assert [book["id"] for book in result["books"]] == [4, 2, 1]
+    assert result["missing"] == [99, 0]
+
+def test_lookup_by_isbns():
+    result = lookup_books_by_isbns(["1000000000003", "9999999999999", "1000000000001"])
+    assert [book["title"] for book in result["books"]] == ["Book 3", "Book 1"]
+    assert result["missing"] == ["9999999999999"]
+
+def test_isbn_index_skips_unknown_isbns():
+    build_isbn_index()
+    with QueryTracer() as tracer:
+        result = lookup_books_by_isbns(["9999999999999", "123"])
+    assert len(tracer) == 0
+    assert result == {"books": [], "missing": ["9999999999999", "123"]}
+
+def test_empty_lookup_runs_no_query():
+    with QueryTracer() as tracer:
+        assert lookup_books_by_ids([]) == {"books": [], "missing": []}
+    assert len(tracer) == 0
+
+def test_books_api_get_and_post():
+    client = create_app().test_client()
+    response = client.get("/api/books?ids=3,42,1")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [book["id"] for book in data["books"]] == [3, 1]
+    assert data["missing"] == [42]
+    assert data["count"] == 2
+
+    data = client.post("/api/books/lookup", json={"isbns": ["1000000000005", "0000000000000"]}).get_json()
+    assert [book["id"] for book in data["books"]] == [5]
+    assert data["missing"] == ["0000000000000"]
+
+    data = client.post("/api/books/lookup", json={"ids": list(range(1, 2001))}).get_json()
+    assert data["count"] == 5 and len(data["missing"]) == 1995
+
+def test_books_api_rejects_bad_input():
+    client = create_app().test_client()
+    assert client.get("/api/books").status_code == 400
+    assert client.get("/api/books?ids=1,x").status_code == 400
+    assert client.get("/api/books?ids=1&isbns=1000000000001").status_code == 400
+    assert client.post("/api/books/lookup", json={"ids": ["1"]}).status_code == 400
+    assert client.post("/api/books/lookup", json={"ids": list(range(10001))}).status_code == 400
+    assert client.post("/api/books/lookup", data="nope").status_code == 400
+    assert client.get(f"/api/books?ids={2**63}").status_code == 400
+    assert client.post("/api/books/lookup", json={"ids": [1, -2**63 - 1]}).status_code == 400
+    assert client.get(f"/api/books?ids={2**63 - 1}").get_json()["missing"] == [2**63 - 1]
@@ -1,36 +1,38 @@
 from services.library_service import borrow_book_by_patron
 from unittest.mock import patch
 
-@patch("services.library_service.get_book_by_id")
-@patch("services.library_service.insert_borrow_record")
-@patch("services.library_service.update_book_availability")
-def test_borrow_ok(mock_update, mock_insert, mock_get):
-    mock_get.return_value = {'id': 1, 'title': 'Mock Book', 'available_copies': 1}
+@patch("services.library_service.get_books_by_ids")
+@patch("services.library_service.get_patron_borrow_counts")
+@patch("services.library_service.insert_borrow_records_batch")
+def test_borrow_ok(mock_insert, mock_counts, mock_get):
+    mock_get.return_value = [{'id': 1, 'title': 'Mock Book', 'available_copies': 1}]
+    mock_counts.return_value = {"123456": 0}
     mock_insert.return_value = True
-    mock_update.return_value = True
     ok, msg = borrow_book_by_patron("123456", 1)
     assert ok
     assert "borrowed" in msg.lower()
 
-@patch("services.library_service.get_book_by_id")
+@patch("services.library_service.get_books_by_ids")
 def test_borrow_invalid_id(mock_get):
-    mock_get.return_value = {'id': 1, 'available_copies': 1}
+    mock_get.return_value = [{'id': 1, 'available_copies': 1}]
     ok, msg = borrow_book_by_patron("abc123", 1)
     assert not ok
     assert "invalid id" in msg.lower()
 
-@patch("services.library_service.get_book_by_id")
+@patch("services.library_service.get_books_by_ids")
 def test_borrow_missing_book(mock_get):
-    mock_get.return_value = None
+    mock_get.return_value = []
     ok, msg = borrow_book_by_patron("123456", 999)
     assert not ok
     assert "book not located" in msg.lower()
 
-@patch("services.library_service.get_book_by_id")
-@patch("services.library_service.insert_borrow_record")
-@patch("services.library_service.update_book_availability")
-def test_borrow_out_of_stock(mock_update, mock_insert, mock_get):
-    mock_get.return_value = {'id': 1, 'title': 'Mock Book', 'available_copies': 0}
+@patch("services.library_service.get_books_by_ids")
+@patch("services.library_service.get_patron_borrow_counts")
+@patch("services.library_service.insert_borrow_records_batch")
+def test_borrow_out_of_stock(mock_insert, mock_counts, mock_get):
+    mock_get.return_value = [{'id': 1, 'title': 'Mock Book', 'available_copies': 0}]
+    mock_counts.return_value = {"111111": 0}
     ok, msg = borrow_book_by_patron("111111", 1)
     assert not ok
     assert "not available" in msg.lower()
+    mock_insert.assert_not_called()
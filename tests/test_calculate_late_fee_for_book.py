@@ -1,5 +1,6 @@
 from services.library_service import calculate_late_fee_for_book, borrow_book_by_patron, add_book_to_catalog
-from database import init_database, get_book_by_isbn
+from datetime import datetime, timedelta
+from database import init_database, get_book_by_isbn, insert_borrow_record
 
 def setup_function():
     init_database()
@@ -29,3 +30,17 @@ def test_late_fee_invalid_book():
     fee = calculate_late_fee_for_book("123456", 999)
     assert fee['fee_amount'] == 0
     assert "invalid" in fee.get('status', '').lower()
+
+def test_late_fee_overdue_tiers():
+    book = get_book_by_isbn("1111111111111")
+    now = datetime.now()
+    insert_borrow_record("654321", book["id"], now - timedelta(days=24), now - timedelta(days=10, hours=1))
+    fee = calculate_late_fee_for_book("654321", book["id"])
+    assert fee == {'fee_amount': 6.50, 'days_overdue': 10, 'status': 'Late fee applied'}
+    # Reading the fee leaves the loan open
+    assert calculate_late_fee_for_book("654321", book["id"]) == fee
+
+def test_late_fee_not_borrowed():
+    book = get_book_by_isbn("1111111111111")
+    fee = calculate_late_fee_for_book("654321", book["id"])
+    assert fee == {'fee_amount': 0.00, 'days_overdue': 0, 'status': 'Not borrowed'}
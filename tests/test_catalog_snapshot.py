@@ -0,0 +1,89 @@
+import os
+import time
+import pytest
+import database
+from app import create_app
+from database import init_database, insert_book, get_all_books, get_catalog_version
+from services.catalog_snapshot import (
+    CatalogSnapshot, write_catalog_snapshot, open_catalog_snapshot, refresh_catalog_snapshot,
+    current_catalog_snapshot, RECORD, HEADER
+)
+
+STATIC_FIELDS = ("id", "title", "author", "isbn", "total_copies")
+
+@pytest.fixture(autouse=True)
+def books():
+    insert_book("Zebra Crossing", "Émile Zola", "1000000000001", 3, 1)
+    insert_book("Apple Orchard", "Ann Author", "1000000000002", 1, 1)
+    insert_book("Middle Earth", "Tolkien", "1000000000003", 7, 7)
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "catalog.snap")
+
+def static(book):
+    return {field: book[field] for field in STATIC_FIELDS}
+
+def test_snapshot_matches_the_books_table(path):
+    assert write_catalog_snapshot(path) == (3, 3)
+    snapshot = CatalogSnapshot(path)
+    books = get_all_books()
+    assert len(snapshot) == 3 and snapshot.version == get_catalog_version() == 3
+    assert list(snapshot) == [static(book) for book in books]  # title order
+    assert snapshot.get(1) == static(books[-1]) and snapshot.get(1)["author"] == "Émile Zola"
+    assert snapshot.get(4) is None and snapshot.get(0) is None
+    assert 2 in snapshot and 99 not in snapshot
+    assert "available_copies" not in snapshot.get(1)
+    assert os.path.getsize(path) >= HEADER.size + 3 * RECORD.size + 3 * 16
+    snapshot.close()
+
+def test_empty_catalog(tmp_path, monkeypatch, path):
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "empty.db"))
+    init_database()
+    assert write_catalog_snapshot(path) == (0, 0)
+    snapshot = CatalogSnapshot(path)
+    assert len(snapshot) == 0 and list(snapshot) == [] and snapshot.get(1) is None
+
+def test_open_rebuilds_missing_corrupt_and_stale_files(path):
+    assert open_catalog_snapshot(path).version == 3  # missing
+    with open(path, "r+b") as f:
+        f.write(b"garbage!")
+    assert len(open_catalog_snapshot(path)) == 3  # corrupt
+
+    insert_book("New Arrival", "Author", "1000000000004", 1, 1)
+    assert current_catalog_snapshot().version == 3
+    assert len(open_catalog_snapshot(path)) == 4  # stale
+
+def test_refresh_follows_the_live_catalog(path):
+    old = open_catalog_snapshot(path)
+    assert not refresh_catalog_snapshot()
+
+    insert_book("New Arrival", "Author", "1000000000004", 1, 1)
+    assert refresh_catalog_snapshot()
+    current = current_catalog_snapshot()
+    assert current is not old and current.get(4)["title"] == "New Arrival"
+    # The replaced snapshot stays mapped for whoever still holds it
+    assert len(old) == 3 and old.get(4) is None and old.get(3)["title"] == "Middle Earth"
+
+    # A snapshot another worker already refreshed is mapped without being rewritten
+    insert_book("Second Arrival", "Author", "1000000000005", 1, 1)
+    write_catalog_snapshot(path)
+    mtime = os.stat(path).st_mtime_ns
+    assert refresh_catalog_snapshot() and os.stat(path).st_mtime_ns == mtime
+    assert len(current_catalog_snapshot()) == 5
+
+def test_app_builds_indexes_from_the_snapshot(path):
+    app = create_app({"CATALOG_SNAPSHOT": path, "CATALOG_SNAPSHOT_REFRESH_INTERVAL": 0.05})
+    assert current_catalog_snapshot().path == path and os.path.exists(path)
+    body = app.test_client().get("/api/search?q=orchard").get_json()
+    assert [book["title"] for book in body["results"]] == ["Apple Orchard"]
+    assert body["results"][0]["available_copies"] == 1  # from the database, not the snapshot
+
+    refresher = app.extensions["catalog_snapshot_refresher"]
+    insert_book("New Arrival", "Author", "1000000000004", 1, 1)
+    for _ in range(100):
+        if refresher.refreshes:
+            break
+        time.sleep(0.05)
+    refresher.stop()
+    assert refresher.refreshes == 1 and len(current_catalog_snapshot()) == 4
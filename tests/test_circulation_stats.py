@@ -0,0 +1,120 @@
+import time
+import pytest
+import database
+from datetime import datetime, timedelta
+from app import create_app
+from database import (
+    init_database, insert_book, insert_borrow_record, update_borrow_record_return_date,
+    get_db_connection, rebuild_circulation_rollups
+)
+from services import analytics
+from services.analytics import update_rollups, top_books, daily_circulation, loan_duration_by_author, LoanColumns
+from services.search_index import reset_search_index
+from services.isbn_index import reset_isbn_index
+from services.suggest_index import reset_suggest_index
+
+@pytest.fixture(autouse=True)
+def books():
+    insert_book("Dune", "Frank Herbert", "1000000000001", 10, 10)
+    insert_book("Emma", "Jane Austen", "1000000000002", 10, 10)
+
+def loan(patron_id, book_id, borrowed_days_ago, returned_days_ago=None, loan_days=14):
+    now = datetime.now()
+    borrowed = now - timedelta(days=borrowed_days_ago)
+    insert_borrow_record(patron_id, book_id, borrowed, borrowed + timedelta(days=loan_days))
+    if returned_days_ago is not None:
+        update_borrow_record_return_date(patron_id, book_id, now - timedelta(days=returned_days_ago))
+
+def sample_history():
+    loan("123456", 1, 40, 30)
+    loan("123456", 1, 20, 18)
+    loan("654321", 1, 3)
+    loan("654321", 2, 25, 1)
+    loan("111111", 2, 2)
+
+def table(name):
+    conn = get_db_connection()
+    rows = [tuple(row) for row in conn.execute(f"SELECT * FROM {name} ORDER BY 1, 2")]
+    conn.close()
+    return rows
+
+def test_incremental_rollups_match_rebuild():
+    sample_history()
+    assert update_rollups(batch_size=2) == 8
+    assert update_rollups() == 0
+    tables = ("daily_book_stats", "daily_circulation", "book_circulation")
+    incremental = [table(name) for name in tables]
+
+    assert rebuild_circulation_rollups() > 0
+    assert [table(name) for name in tables] == incremental
+
+def test_top_books_window():
+    sample_history()
+    update_rollups()
+    assert [(b["title"], b["borrows"]) for b in top_books(30, 10)] == [("Dune", 2), ("Emma", 2)]
+    assert [(b["title"], b["borrows"]) for b in top_books(5, 10)] == [("Dune", 1), ("Emma", 1)]
+    assert len(top_books(30, 1)) == 1
+
+def test_daily_circulation_counts_overdue_returns():
+    sample_history()
+    update_rollups()
+    assert sum(d["borrows"] for d in daily_circulation(60)) == 5
+    yesterday = (datetime.now() - timedelta(days=1)).date().isoformat()
+    assert [d for d in daily_circulation(7) if d["date"] == yesterday][0]["overdue_returns"] == 1
+
+def test_loan_duration_by_author():
+    sample_history()
+    update_rollups()
+    durations = {a["author"]: a["average_loan_days"] for a in loan_duration_by_author()}
+    assert durations == {"Frank Herbert": 6.0, "Jane Austen": 24.0}
+
+def test_init_backfills_rollups_from_history():
+    sample_history()
+    conn = get_db_connection()
+    conn.execute("DROP TABLE rollup_state")
+    conn.commit()
+    conn.close()
+    init_database()
+    assert update_rollups() == 0
+    assert sum(d["borrows"] for d in daily_circulation(60)) == 5
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_loan_columns_match_rollups(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(analytics, "np", None)
+    sample_history()
+    loans = LoanColumns.load()
+    assert len(loans) == 5
+    since = database.to_epoch_seconds(datetime.now() - timedelta(days=30))
+    assert loans.top_books(since, 10) == [(1, 2), (2, 2)]
+    assert loans.average_loan_days_by({1: "Frank Herbert", 2: "Jane Austen"}) == {
+        "Frank Herbert": 6.0, "Jane Austen": 24.0}
+
+def test_stats_api():
+    client = create_app({"STATS_ROLLUP_INTERVAL": None}).test_client()
+    sample_history()
+    assert client.get("/api/stats/top-books?days=30").get_json()["count"] == 0  # reads never fold events in
+    update_rollups()
+    data = client.get("/api/stats/top-books?days=30&limit=1").get_json()
+    assert data["count"] == 1 and data["books"][0]["borrows"] == 2
+    assert client.get("/api/stats/circulation?days=0").status_code == 400
+    assert len(client.get("/api/stats/circulation?days=60").get_json()["daily"]) > 0
+    assert client.get("/api/stats/loan-duration").get_json()["count"] == 2
+    reset_search_index()
+    reset_isbn_index()
+    reset_suggest_index()
+
+def test_aggregator_runs_by_default():
+    sample_history()
+    app = create_app()
+    aggregator = app.extensions["rollup_aggregator"]
+    assert aggregator.interval_seconds == analytics.ROLLUP_INTERVAL
+    deadline = time.monotonic() + 5
+    while aggregator.last_applied != 8 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    aggregator.stop()
+    assert aggregator.last_applied == 8
+    assert app.test_client().get("/api/stats/loan-duration").get_json()["count"] == 2
+    reset_search_index()
+    reset_isbn_index()
+    reset_suggest_index()
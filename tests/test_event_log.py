@@ -0,0 +1,85 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from app import create_app
+from database import (
+    insert_book, insert_borrow_record, update_book_availability,
+    update_borrow_record_return_date, get_events_since, subscribe_events, unsubscribe_events
+)
+from services.event_service import wait_for_events
+from services.library_service import borrow_books_batch, return_books_batch, suggest_books
+
+def test_mutations_append_events_in_order():
+    insert_book("Event Book", "Author", "1000000000001", 3, 3)
+    now = datetime.now()
+    insert_borrow_record("123456", 1, now - timedelta(days=20), now - timedelta(days=6, hours=1))
+    update_book_availability(1, -1)
+    update_borrow_record_return_date("123456", 1, now)
+
+    events = get_events_since(0)
+    assert [e["type"] for e in events] == [
+        "book.inserted", "loan.created", "book.availability_changed", "loan.returned"]
+    assert events[0]["payload"]["isbn"] == "1000000000001"
+    assert events[1]["payload"]["record_id"] == events[3]["payload"]["record_id"]
+    assert events[3]["payload"]["fee_amount"] == 3.00
+    assert get_events_since(events[1]["id"], limit=1) == [events[2]]
+
+def test_failed_write_records_no_event():
+    insert_book("Event Book", "Author", "1000000000001", 3, 3)
+    assert not insert_book("Duplicate", "Author", "1000000000001", 3, 3)
+    assert len(get_events_since(0)) == 1
+
+def test_batch_events_carry_record_ids():
+    insert_book("Event Book", "Author", "1000000000001", 3, 3)
+    borrow_books_batch([("123456", 1), ("654321", 1)])
+    return_books_batch([("654321", 1)])
+
+    events = get_events_since(1)
+    created = [e["payload"] for e in events if e["type"] == "loan.created"]
+    returned = [e["payload"] for e in events if e["type"] == "loan.returned"]
+    assert [(c["record_id"], c["patron_id"]) for c in created] == [(1, "123456"), (2, "654321")]
+    assert [r["record_id"] for r in returned] == [2]
+    assert sum(e["payload"]["change"] for e in events if e["type"] == "book.availability_changed") == -1
+
+def test_subscribers_filter_by_type_and_survive_errors():
+    seen = []
+    def failing(event):
+        raise RuntimeError("subscriber bug")
+    subscribe_events(failing)
+    subscribe_events(seen.append, ["loan.created"])
+    try:
+        insert_book("Event Book", "Author", "1000000000001", 3, 3)
+        assert insert_borrow_record("123456", 1, datetime.now(), datetime.now() + timedelta(days=14))
+    finally:
+        unsubscribe_events(failing)
+        unsubscribe_events(seen.append)
+    assert [e["type"] for e in seen] == ["loan.created"]
+
+def test_suggestions_follow_new_books_and_loans():
+    insert_book("Dune", "Frank Herbert", "1000000000001", 3, 3)
+    insert_book("Dune Messiah", "Frank Herbert", "1000000000002", 3, 3)
+    assert [b["id"] for b in suggest_books("dune", "title")] == [1, 2]
+    insert_borrow_record("123456", 2, datetime.now(), datetime.now() + timedelta(days=14))
+    insert_book("Dune Children", "Frank Herbert", "1000000000003", 3, 3)
+    assert [b["id"] for b in suggest_books("dune", "title")] == [2, 1, 3]
+
+def test_wait_wakes_on_new_event():
+    insert_book("Event Book", "Author", "1000000000001", 3, 3)
+    timer = threading.Timer(0.2, update_book_availability, (1, -1))
+    timer.start()
+    start = time.monotonic()
+    events = wait_for_events(1, timeout=5)
+    timer.join()
+    assert [e["type"] for e in events] == ["book.availability_changed"]
+    assert time.monotonic() - start < 2
+
+def test_events_api_cursor():
+    client = create_app().test_client()
+    insert_book("Event Book", "Author", "1000000000001", 3, 3)
+    data = client.get("/api/events").get_json()
+    assert [e["payload"]["title"] for e in data["events"]] == ["Event Book"]
+    cursor = data["next_cursor"]
+
+    data = client.get(f"/api/events?since={cursor}&timeout=0.1").get_json()
+    assert data == {"events": [], "count": 0, "next_cursor": cursor}
+    assert client.get("/api/events?since=-1").status_code == 400
@@ -0,0 +1,79 @@
+import pytest
+import database
+from app import create_app
+from database import insert_book
+from services.fuzzy_index import FuzzyWordIndex, edit_distance, max_distance, fuzzy_book_ids, reset_fuzzy_index
+from services.library_service import search_books_in_catalog
+from services.search_index import reset_search_index
+from services.isbn_index import reset_isbn_index
+from services.suggest_index import reset_suggest_index
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "library.db"))
+    app = create_app()
+    yield app.test_client()
+    reset_search_index()
+    reset_isbn_index()
+    reset_suggest_index()
+    reset_fuzzy_index()
+
+def titles(books):
+    return [book["title"] for book in books]
+
+def test_edit_distance():
+    assert edit_distance("orwell", "orwell", 2) == 0
+    assert edit_distance("orwel", "orwell", 2) == 1
+    assert edit_distance("gatsbby", "gatsby", 2) == 1
+    assert edit_distance("fitzgreald", "fitzgerald", 2) == 1  # adjacent transposition
+    assert edit_distance("kitten", "sitting", 2) == 3  # capped at limit + 1
+    assert edit_distance("a", "abcd", 1) == 2
+    assert [max_distance(word) for word in ("dune", "abc", "orwell", "mockingbird")] == [1, 0, 1, 2]
+
+def test_index_matches_words_within_their_budget():
+    index = FuzzyWordIndex()
+    index.add(1, ["The Great Gatsby", "F. Scott Fitzgerald"])
+    index.add(2, ["Dune", "Frank Herbert"])
+    index.add(3, ["Great Expectations", "Charles Dickens"])
+    assert index.search("Gatsbby") == [1]
+    assert index.search("fitzgreald scot") == [1]
+    assert index.search("graet") == [1, 3]
+    assert index.search("dnue") == [2]
+    assert index.search("dun") == []  # three-letter words must match exactly
+    assert index.search("great dickins") == [3]  # every word must match
+    assert index.search("great herbert") == []
+    assert index.search("  ") == []
+    assert len(index) == 3 and index.word_count() == 12
+
+def test_index_ranks_by_total_edits():
+    index = FuzzyWordIndex()
+    index.add(1, ["Orwell Collected", "Someone"])
+    index.add(2, ["Orwel", "Someone"])
+    index.add(3, ["Orwells", "Someone"])
+    index.add(4, ["Orwellian", "Someone"])
+    assert index.search("orwel") == [2, 1]
+    assert index.search("orwell") == [1, 2, 3]
+
+def test_fuzzy_search_finds_misspelled_titles_and_authors(client):
+    assert titles(search_books_in_catalog("Gatsbby", "fuzzy")) == ["The Great Gatsby"]
+    assert titles(search_books_in_catalog("George Orwel", "fuzzy")) == ["1984"]
+    assert titles(search_books_in_catalog("Mockinbird Harpper", "fuzzy")) == ["To Kill a Mockingbird"]
+    assert search_books_in_catalog("Tolkein", "fuzzy") == []
+
+def test_fuzzy_index_tracks_new_books(client):
+    insert_book("Animal Farm", "George Orwell", "9780451526342", 2, 2)
+    assert titles(search_books_in_catalog("Orwel", "fuzzy")) == ["1984", "Animal Farm"]
+    assert titles(search_books_in_catalog("animl farn", "fuzzy")) == ["Animal Farm"]
+
+def test_fuzzy_search_without_index_scans(client):
+    reset_fuzzy_index()
+    assert fuzzy_book_ids("Gatsbby") is None
+    assert titles(search_books_in_catalog("Gatsbby", "fuzzy")) == ["The Great Gatsby"]
+
+def test_fuzzy_search_routes(client):
+    data = client.get("/api/search?q=Fitzgerlad&type=fuzzy").get_json()
+    assert data["search_type"] == "fuzzy" and titles(data["results"]) == ["The Great Gatsby"]
+    response = client.get("/search?q=Harpr+Lee&type=fuzzy")
+    assert response.status_code == 200
+    assert b"To Kill a Mockingbird" in response.data
+    assert b'<option value="fuzzy" selected' in response.data
@@ -0,0 +1,65 @@
+import pytest
+from database import insert_book
+from services.library_service import add_book_to_catalog, search_books_in_catalog
+from services.isbn_index import IsbnIndex, build_isbn_index, reset_isbn_index
+
+@pytest.fixture(autouse=True)
+def indexed_books():
+    insert_book("The Great Gatsby", "F. Scott Fitzgerald", "9780743273565", 3, 3)
+    insert_book("To Kill a Mockingbird", "Harper Lee", "9780061120084", 2, 2)
+    build_isbn_index()
+
+def test_exact_and_prefix_lookup():
+    index = IsbnIndex()
+    index.add("9780743273565", 1)
+    index.add("9780061120084", 2)
+    index.add("9791234567896", 3)
+    assert index.get("9780061120084") == 2
+    assert index.get("9780061120085") is None
+    assert index.prefix("978") == [2, 1]
+    assert index.prefix("979") == [3]
+    assert index.prefix("97807") == [1]
+
+def test_find_existing_bulk():
+    index = IsbnIndex()
+    index.add("9780743273565", 1)
+    index.add("9780061120084", 2)
+    existing = index.find_existing(["9780061120084", "1111111111111", "9780743273565", "bad"])
+    assert existing == ["9780061120084", "9780743273565"]
+
+def test_add_duplicate_rejected_from_index():
+    ok, msg = add_book_to_catalog("Copy", "Someone", "9780743273565", 1)
+    assert not ok
+    assert "already exists" in msg.lower()
+
+def test_insert_keeps_index_consistent():
+    ok, _ = add_book_to_catalog("Dune", "Frank Herbert", "9780441172719", 1)
+    assert ok
+    ok, msg = add_book_to_catalog("Dune", "Frank Herbert", "9780441172719", 1)
+    assert not ok
+    results = search_books_in_catalog("9780441172719", "isbn")
+    assert [b["title"] for b in results] == ["Dune"]
+
+def test_isbn_search_by_block():
+    results = search_books_in_catalog("978006", "isbn")
+    assert [b["title"] for b in results] == ["To Kill a Mockingbird"]
+
+@pytest.mark.parametrize("term", ["3273565", "978006", "9780743273565", "0000"])
+def test_isbn_search_same_with_and_without_index(term):
+    indexed = [b["title"] for b in search_books_in_catalog(term, "isbn")]
+    reset_isbn_index()
+    assert [b["title"] for b in search_books_in_catalog(term, "isbn")] == indexed
+
+def test_partial_isbn_matches_anywhere():
+    results = search_books_in_catalog("3273565", "isbn")
+    assert [b["title"] for b in results] == ["The Great Gatsby"]
+
+def test_non_ascii_digits_are_not_isbns():
+    superscripts = "²" * 13
+    assert add_book_to_catalog("T", "A", superscripts, 1) == (False, "ISBN must be exactly 13 digits.")
+    assert search_books_in_catalog(superscripts, "isbn") == []
+    assert search_books_in_catalog("²", "isbn") == []
+    index = IsbnIndex()
+    index.add(superscripts, 1)
+    assert len(index) == 0 and index.get(superscripts) is None and index.prefix("²") == []
+    assert index.find_existing([superscripts]) == []
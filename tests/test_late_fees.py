@@ -0,0 +1,60 @@
+import sqlite3
+import database
+from datetime import datetime, timedelta
+from database import (
+    init_database, insert_book, insert_borrow_record, get_patron_borrowed_books,
+    to_epoch_seconds, from_epoch_seconds, get_db_connection
+)
+from services import late_fees
+from services.late_fees import late_fee_for_days, compute_late_fees
+from services.library_service import get_overdue_loans
+
+def test_late_fee_tiers():
+    assert late_fee_for_days(0) == 0
+    assert late_fee_for_days(7) == 3.50
+    assert late_fee_for_days(10) == 6.50
+    assert late_fee_for_days(40) == 15.00
+
+def test_vectorized_matches_scalar(monkeypatch):
+    now = to_epoch_seconds(datetime(2025, 3, 1, 12))
+    dues = [now + 3600, now - 1, now - 86400, now - 9 * 86400 - 5, now - 60 * 86400]
+    expected_days = [0, 0, 1, 9, 60]
+    expected_fees = [late_fee_for_days(d) for d in expected_days]
+    assert compute_late_fees(dues, now) == (expected_days, expected_fees)
+    monkeypatch.setattr(late_fees, "np", None)
+    assert compute_late_fees(dues, now) == (expected_days, expected_fees)
+
+def test_epoch_round_trip():
+    moment = datetime(2024, 2, 29, 23, 59, 30)
+    assert from_epoch_seconds(to_epoch_seconds(moment)) == moment
+
+def test_migration_backfills_old_schema(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "old.db"))
+    conn = sqlite3.connect(database.DATABASE)
+    conn.execute("CREATE TABLE borrow_records (id INTEGER PRIMARY KEY AUTOINCREMENT, patron_id TEXT NOT NULL, "
+                 "book_id INTEGER NOT NULL, borrow_date TEXT NOT NULL, due_date TEXT NOT NULL, return_date TEXT)")
+    conn.execute("INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) VALUES (?, ?, ?, ?)",
+                 ("123456", 1, "2025-01-01T10:00:00.500000", "2025-01-15T10:00:00.500000"))
+    conn.commit()
+    conn.close()
+
+    init_database()
+    conn = get_db_connection()
+    row = conn.execute("SELECT borrow_epoch, due_epoch, return_epoch FROM borrow_records").fetchone()
+    conn.close()
+    assert row["due_epoch"] == to_epoch_seconds(datetime(2025, 1, 15, 10))
+    assert row["return_epoch"] is None
+
+def test_overdue_loans_and_borrowed_books():
+    init_database()
+    insert_book("Late Book", "Author", "1000000000001", 2, 2)
+    now = datetime.now()
+    insert_borrow_record("123456", 1, now - timedelta(days=30), now - timedelta(days=16, hours=1))
+    insert_borrow_record("654321", 1, now - timedelta(days=1), now + timedelta(days=13))
+
+    overdue = get_overdue_loans()
+    assert [(loan["patron_id"], loan["days_overdue"], loan["fee_amount"]) for loan in overdue] == [("123456", 16, 12.50)]
+
+    borrowed = get_patron_borrowed_books("123456")
+    assert borrowed[0]["is_overdue"]
+    assert isinstance(borrowed[0]["due_date"], datetime)
@@ -0,0 +1,108 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from database import (
+    init_database, insert_book, insert_borrow_record, update_borrow_record_return_date,
+    get_patron_account, get_patron_borrow_count, get_db_connection, repair_patron_accounts
+)
+from services.library_service import (
+    borrow_book_by_patron, return_books_batch, pay_late_fees, get_patron_status_report
+)
+from services.payment_service import PaymentGateway
+
+@pytest.fixture(autouse=True)
+def book():
+    insert_book("Account Book", "Author", "1000000000001", 10, 10)
+
+def borrow_overdue(patron_id, days_late):
+    now = datetime.now()
+    insert_borrow_record(patron_id, 1, now - timedelta(days=14 + days_late), now - timedelta(days=days_late, hours=1))
+
+def test_borrow_and_return_maintain_counts():
+    borrow_book_by_patron("123456", 1)
+    borrow_book_by_patron("123456", 1)
+    assert get_patron_borrow_count("123456") == 2
+    update_borrow_record_return_date("123456", 1, datetime.now())
+    assert get_patron_borrow_count("123456") == 0
+
+def test_limit_served_from_patrons_table():
+    for _ in range(5):
+        assert borrow_book_by_patron("123456", 1)[0]
+    ok, msg = borrow_book_by_patron("123456", 1)
+    assert not ok
+    assert "limit" in msg
+
+def test_returns_accrue_fees():
+    borrow_overdue("123456", 10)
+    borrow_overdue("654321", 3)
+    return_books_batch([("123456", 1)])
+    update_borrow_record_return_date("654321", 1, datetime.now())
+    assert get_patron_account("123456")["outstanding_fees"] == 6.50
+    assert get_patron_account("654321")["outstanding_fees"] == 1.50
+    assert get_patron_account("654321")["open_loan_count"] == 0
+
+def paying_gateway():
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.side_effect = [(True, f"txn_{i}", "ok") for i in range(1, 4)]
+    return gateway
+
+def test_payment_reduces_outstanding_fees():
+    borrow_overdue("123456", 10)
+    gateway = paying_gateway()
+    # Fees are assessed at return; an open overdue loan owes nothing yet
+    assert pay_late_fees("123456", 1, gateway) == (False, "No late fees to pay for this book.", None)
+    update_borrow_record_return_date("123456", 1, datetime.now())
+    assert pay_late_fees("123456", 1, gateway)[0]
+    assert gateway.process_payment.call_args.kwargs["amount"] == 6.50
+    account = get_patron_account("123456")
+    assert account["outstanding_fees"] == 0
+    assert account["fees_paid"] == 6.50
+
+def test_fees_are_charged_once():
+    borrow_overdue("123456", 10)
+    borrow_overdue("123456", 3)
+    return_books_batch([("123456", 1)])
+    gateway = paying_gateway()
+    assert pay_late_fees("123456", 1, gateway)[0]
+    assert pay_late_fees("123456", 1, gateway)[1] == "No late fees to pay for this book."
+    # The second loan's fee is owed once it is returned
+    return_books_batch([("123456", 1)])
+    assert pay_late_fees("123456", 1, gateway)[0]
+    assert [call.kwargs["amount"] for call in gateway.process_payment.call_args_list] == [6.50, 1.50]
+    assert get_patron_account("123456")["outstanding_fees"] == 0
+
+def test_status_report_lists_open_loans():
+    borrow_overdue("123456", 10)
+    borrow_overdue("123456", 10)
+    report = get_patron_status_report("123456")
+    assert [book["title"] for book in report["borrowed_books"]] == ["Account Book", "Account Book"]
+    assert report["count"] == 2
+    assert report["late fees"] == [{"title": "Account Book", "fee": 13.0}]
+    assert report["total fees"] == 13.0
+    assert report["outstanding_fees"] == 0
+    assert get_patron_status_report("654321")["borrowed_books"] == []
+
+def test_repair_recomputes_from_history():
+    borrow_overdue("123456", 10)
+    borrow_overdue("123456", 0)
+    update_borrow_record_return_date("123456", 1, datetime.now())
+    borrow_overdue("123456", 0)
+    conn = get_db_connection()
+    conn.execute("UPDATE patrons SET open_loan_count = 42, outstanding_fees = 99")
+    conn.commit()
+    conn.close()
+
+    assert repair_patron_accounts() == 1
+    account = get_patron_account("123456")
+    assert account["open_loan_count"] == 1
+    assert account["outstanding_fees"] == 6.50
+
+def test_init_seeds_accounts_for_existing_loans():
+    borrow_overdue("123456", 0)
+    conn = get_db_connection()
+    conn.execute("DROP TABLE patrons")
+    conn.commit()
+    conn.close()
+
+    init_database()
+    assert get_patron_borrow_count("123456") == 1
@@ -9,9 +9,9 @@ def test_pay_late_fees_success():
     fake_gateway = Mock(spec=PaymentGateway)
     fake_gateway.process_payment.return_value = (True, "txn_123", "Success")
 
-    # Patch calculate_late_fee_for_book to return a positive fee
-    with patch("services.library_service.calculate_late_fee_for_book") as mock_fee:
-        mock_fee.return_value = {'fee_amount': 5.0, 'days_overdue': 2, 'status': 'Late fee applied'}
+    # Patch late_fees_owed_for_book to return a positive fee
+    with patch("services.library_service.late_fees_owed_for_book") as mock_fee:
+        mock_fee.return_value = 5.0
         with patch("services.library_service.get_book_by_id") as mock_book:
             mock_book.return_value = {'id': 1, 'title': 'Some Book'}
             ok, msg, txn = pay_late_fees("123456", 1, fake_gateway)
@@ -25,8 +25,8 @@ def test_pay_late_fees_declined():
     fake_gateway = Mock(spec=PaymentGateway)
     fake_gateway.process_payment.return_value = (False, None, "Card declined")
 
-    with patch("services.library_service.calculate_late_fee_for_book") as mock_fee:
-        mock_fee.return_value = {'fee_amount': 5.0, 'days_overdue': 2, 'status': 'Late fee applied'}
+    with patch("services.library_service.late_fees_owed_for_book") as mock_fee:
+        mock_fee.return_value = 5.0
         with patch("services.library_service.get_book_by_id") as mock_book:
             mock_book.return_value = {'id': 1, 'title': 'Some Book'}
             ok, msg, txn = pay_late_fees("123456", 1, fake_gateway)
@@ -46,8 +46,8 @@ def test_pay_late_fees_invalid_patron():
 
 def test_pay_late_fees_zero_fee():
     fake_gateway = Mock(spec=PaymentGateway)
-    with patch("services.library_service.calculate_late_fee_for_book") as mock_fee:
-        mock_fee.return_value = {'fee_amount': 0.0, 'days_overdue': 0, 'status': 'No late fee'}
+    with patch("services.library_service.late_fees_owed_for_book") as mock_fee:
+        mock_fee.return_value = 0.0
         ok, msg, txn = pay_late_fees("123456", 1, fake_gateway)
 
     assert not ok
@@ -59,8 +59,8 @@ def test_pay_late_fees_network_error():
     fake_gateway = Mock(spec=PaymentGateway)
     fake_gateway.process_payment.side_effect = Exception("Network error")
 
-    with patch("services.library_service.calculate_late_fee_for_book") as mock_fee:
-        mock_fee.return_value = {'fee_amount': 5.0, 'days_overdue': 2, 'status': 'Late fee applied'}
+    with patch("services.library_service.late_fees_owed_for_book") as mock_fee:
+        mock_fee.return_value = 5.0
         with patch("services.library_service.get_book_by_id") as mock_book:
             mock_book.return_value = {'id': 1, 'title': 'Some Book'}
             ok, msg, txn = pay_late_fees("123456", 1, fake_gateway)
@@ -0,0 +1,155 @@
+import csv
+import sqlite3
+import threading
+import time
+import pytest
+from unittest.mock import Mock, patch
+import database
+from database import (
+    init_database, add_sample_data, record_fee_payment, get_payments_by_transaction,
+    get_patron_account, get_payment_discrepancies, shard_for_patron
+)
+from services.library_service import pay_late_fees, refund_late_fee_payment
+from services.payment_service import PaymentGateway
+from services.payment_reconciliation import reconcile_payments, RateLimiter
+
+@pytest.fixture(autouse=True)
+def sample_data():
+    add_sample_data()
+
+class LedgerGateway(PaymentGateway):
+    """Answers verify_payment_status from a dict of transaction ID -> (status, amount), without the stub's delay."""
+
+    def __init__(self, settled):
+        super().__init__()
+        self.settled = settled
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def verify_payment_status(self, transaction_id):
+        with self.lock:
+            self.calls.append(transaction_id)
+        if transaction_id not in self.settled:
+            return {"status": "not_found", "message": "Transaction not found"}
+        status, amount = self.settled[transaction_id]
+        return {"transaction_id": transaction_id, "status": status, "amount": amount}
+
+def record_charges(count):
+    for i in range(count):
+        assert record_fee_payment(f"{100000 + i % 50}", 2.5, f"txn_{i}", 1)
+    return {f"txn_{i}": ("completed", 2.5) for i in range(count)}
+
+def test_charges_and_refunds_are_recorded():
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_123456_1", "Success")
+    gateway.refund_payment.return_value = (True, "Refunded")
+    with patch("services.library_service.late_fees_owed_for_book", return_value=4.5):
+        assert pay_late_fees("123456", 1, gateway)[0]
+    outstanding = get_patron_account("123456")["outstanding_fees"]
+    assert refund_late_fee_payment("txn_123456_1", 1.5, gateway)[0]
+
+    rows = get_payments_by_transaction("txn_123456_1")
+    assert [(row["kind"], row["patron_id"], row["book_id"], row["amount"], row["status"]) for row in rows] == [
+        ("charge", "123456", 1, 4.5, "recorded"), ("refund", "123456", 1, 1.5, "recorded")]
+    account = get_patron_account("123456")
+    assert account["fees_paid"] == 3.0
+    assert account["outstanding_fees"] == round(outstanding + 1.5, 2)
+
+    # Refunds of charges made before the ledger existed are kept too
+    assert refund_late_fee_payment("txn_999999_1", 2.0, gateway)[0]
+    assert get_payments_by_transaction("txn_999999_1")[0]["patron_id"] is None
+
+def test_unrecorded_charge_is_reported():
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_123456_2", "Success")
+    with patch("services.library_service.late_fees_owed_for_book", return_value=4.5), \
+            patch("services.library_service.record_fee_payment", return_value=False):
+        ok, message, transaction_id = pay_late_fees("123456", 1, gateway)
+    assert not ok and "could not be recorded" in message
+    assert transaction_id == "txn_123456_2"
+
+def test_sharded_charges_commit_with_the_patron_account(tmp_path, monkeypatch):
+    paths = [str(tmp_path / f"loans-{i}.db") for i in range(2)]
+    monkeypatch.setattr(database, "SHARD_DATABASES", paths)
+    init_database()
+    assert record_fee_payment("123456", 3.0, "txn_a", 1)
+    assert get_patron_account("123456")["fees_paid"] == 3.0
+    assert get_payments_by_transaction("txn_a")[0]["amount"] == 3.0
+    assert database.record_refund("txn_a", 1.0)
+    assert get_patron_account("123456")["fees_paid"] == 2.0
+    assert [row["kind"] for row in get_payments_by_transaction("txn_a")] == ["charge", "refund"]
+    conn = sqlite3.connect(paths[shard_for_patron("123456")])
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'payments'").fetchall() == []
+    conn.close()
+
+def test_reconcile_reports_discrepancies(tmp_path):
+    settled = record_charges(40)
+    settled["txn_3"] = ("completed", 1.0)
+    settled["txn_7"] = ("pending", 2.5)
+    del settled["txn_11"]
+    gateway = LedgerGateway(settled)
+    report = tmp_path / "discrepancies.csv"
+
+    run = reconcile_payments(gateway, workers=8, rate_limit=None, chunk_size=16, report_path=str(report))
+    assert (run["checked"], run["discrepancies"], run["last_payment_id"]) == (40, 3, 40)
+    assert run["finished_at"] is not None
+    assert sorted(gateway.calls) == sorted(f"txn_{i}" for i in range(40))
+
+    problems = [(row["transaction_id"], row["problem"]) for row in get_payment_discrepancies(run["id"])]
+    assert problems == [("txn_3", "amount_mismatch"), ("txn_7", "not_settled"), ("txn_11", "not_found")]
+    with open(report, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["problem"] for row in rows] == ["amount_mismatch", "not_settled", "not_found"]
+    assert rows[0]["gateway_amount"] == "1.0" and rows[0]["recorded_amount"] == "2.5"
+
+    # The next run only checks what has not settled yet
+    settled["txn_7"] = ("completed", 2.5)
+    gateway.calls.clear()
+    run = reconcile_payments(gateway, workers=8, rate_limit=None)
+    assert sorted(gateway.calls) == ["txn_11", "txn_3", "txn_7"]
+    assert (run["checked"], run["discrepancies"]) == (3, 2)
+    assert get_payments_by_transaction("txn_7")[0]["status"] == "settled"
+
+class Crash(BaseException):
+    pass
+
+def test_resumes_from_checkpoint_after_a_crash():
+    gateway = LedgerGateway(record_charges(100))
+    verify = gateway.verify_payment_status
+
+    def crash_at_60(transaction_id):
+        if transaction_id == "txn_60":
+            raise Crash()
+        return verify(transaction_id)
+
+    gateway.verify_payment_status = crash_at_60
+    with pytest.raises(Crash):
+        reconcile_payments(gateway, workers=4, rate_limit=None, chunk_size=25)
+    record_fee_payment("100000", 2.5, "txn_late", 1)  # after the run started, so left for the next run
+
+    gateway.verify_payment_status = verify
+    gateway.calls.clear()
+    run = reconcile_payments(gateway, workers=4, rate_limit=None, chunk_size=25)
+    # Chunks 1 and 2 were checkpointed; the resumed run starts at payment 51
+    assert sorted(gateway.calls) == sorted(f"txn_{i}" for i in range(50, 100))
+    assert (run["checked"], run["discrepancies"], run["upto_payment_id"]) == (100, 0, 100)
+
+    run = reconcile_payments(gateway, rate_limit=None)
+    assert run["checked"] == 1 and gateway.calls[-1] == "txn_late"
+
+def test_gateway_errors_are_discrepancies():
+    gateway = LedgerGateway(record_charges(3))
+    gateway.verify_payment_status = Mock(side_effect=ConnectionError("gateway down"))
+    run = reconcile_payments(gateway, rate_limit=None)
+    assert run["discrepancies"] == 3
+    assert {row["problem"] for row in get_payment_discrepancies(run["id"])} == {"gateway_error"}
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(200)
+    threads = [threading.Thread(target=limiter.acquire) for _ in range(21)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - started >= 0.095
@@ -0,0 +1,34 @@
+import threading
+from services.periodic_worker import PeriodicWorker
+
+def test_runs_at_start_then_on_each_interval():
+    calls = threading.Semaphore(0)
+    worker = PeriodicWorker(0.01, calls.release, "test-worker")
+    worker.start()
+    for _ in range(3):
+        assert calls.acquire(timeout=5)
+    worker.stop()
+    assert not worker._thread.is_alive() and worker.failures == 0
+
+def test_waits_an_interval_when_not_run_at_start():
+    calls = []
+    worker = PeriodicWorker(60, lambda: calls.append(1), "test-worker", run_at_start=False)
+    worker.start()
+    worker.stop()
+    assert calls == []
+
+def test_failures_are_counted_and_the_schedule_continues():
+    done = threading.Event()
+    calls = []
+    def flaky():
+        calls.append(1)
+        if len(calls) == 3:
+            done.set()
+        raise RuntimeError("database is locked")
+    worker = PeriodicWorker(0.01, flaky, "test-worker")
+    worker.start()
+    assert done.wait(5)
+    worker.stop()
+    assert worker.failures == len(calls) >= 3
+    worker.start()  # restartable after stop
+    worker.stop()
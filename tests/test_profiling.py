@@ -0,0 +1,102 @@
+import marshal
+import threading
+import time
+import pytest
+import database
+from app import create_app
+from database import insert_book
+from services.profiling import StackSampler, collapse_stack, profile_store, stop_global_sampling
+from services.search_index import reset_search_index
+from services.isbn_index import reset_isbn_index
+from services.suggest_index import reset_suggest_index
+
+TOKEN = {"X-Profile-Token": "secret"}
+
+def make_client(tmp_path, monkeypatch, token):
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "library.db"))
+    return create_app({"PROFILING_TOKEN": token}).test_client()
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    yield make_client(tmp_path, monkeypatch, "secret")
+    stop_global_sampling()
+    profile_store.clear()
+    reset_search_index()
+    reset_isbn_index()
+    reset_suggest_index()
+
+def test_disabled_by_default(tmp_path, monkeypatch):
+    app_client = make_client(tmp_path, monkeypatch, None)
+    response = app_client.get("/search?q=gatsby", headers={"X-Profile": "cprofile", **TOKEN})
+    assert "X-Profile-Id" not in response.headers
+    assert app_client.get("/admin/profiles", headers=TOKEN).status_code == 404
+    assert not app_client.application.before_request_funcs.get(None)
+
+def test_cprofile_request(client):
+    # The page is streamed; its profile is stored once the response is closed
+    response = client.get("/search?q=gatsby", headers={"X-Profile": "cprofile", **TOKEN}, buffered=True)
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    report = client.get(f"/admin/profiles/{profile_id}", headers=TOKEN).get_data(as_text=True)
+    assert "Ordered by: cumulative time" in report
+    raw = client.get(f"/admin/profiles/{profile_id}?format=pstats", headers=TOKEN).get_data()
+    assert any(name == "search_books_in_catalog" for _, _, name in marshal.loads(raw))
+    summaries = client.get("/admin/profiles", headers=TOKEN).get_json()["profiles"]
+    assert summaries[0]["label"] == "GET /search?q=gatsby"
+
+def test_streamed_page_is_profiled_until_closed(client):
+    for i in range(300):
+        insert_book(f"Streamed Book {i}", "Author", f"{1000000000000 + i}", 1, 1)
+    response = client.get("/catalog", headers={"X-Profile": "cprofile", **TOKEN})
+    profile_id = response.headers["X-Profile-Id"]
+    assert client.get(f"/admin/profiles/{profile_id}", headers=TOKEN).status_code == 404
+    assert response.get_data(as_text=True).count("Streamed Book") == 300
+    response.close()
+    raw = client.get(f"/admin/profiles/{profile_id}?format=pstats", headers=TOKEN).get_data()
+    names = {name for _, _, name in marshal.loads(raw)}
+    assert {"iter_all_books", "_buffered"} <= names
+
+def test_profile_requires_token(client):
+    response = client.get("/search?q=gatsby&profile=cprofile", headers={"X-Profile-Token": "wrong"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert client.get("/admin/profiles").status_code == 403
+
+def test_stack_sampler_folds_thread_stacks():
+    def busy_wait_for_sampler():
+        end = time.monotonic() + 0.3
+        while time.monotonic() < end:
+            pass
+    worker = threading.Thread(target=busy_wait_for_sampler)
+    worker.start()
+    sampler = StackSampler(interval_seconds=0.005, thread_id=worker.ident)
+    sampler.start()
+    worker.join()
+    sampler.stop()
+    lines = sampler.folded().splitlines()
+    assert sampler.samples > 0
+    assert any("busy_wait_for_sampler" in line.rsplit(" ", 1)[0].split(";")[-1] for line in lines)
+
+def test_collapse_stack_is_root_first():
+    def inner():
+        import sys
+        return collapse_stack(sys._getframe())
+    assert inner().split(";")[-1].startswith("inner (test_profiling.py")
+
+def test_global_sampling_lifecycle(client):
+    assert client.post("/admin/profiling/sampler?interval=0.002", headers=TOKEN).status_code == 200
+    assert client.post("/admin/profiling/sampler", headers=TOKEN).status_code == 409
+    time.sleep(0.05)
+    assert client.get("/admin/profiling/sampler", headers=TOKEN).status_code == 200
+    profile_id = client.delete("/admin/profiling/sampler", headers=TOKEN).get_json()["profile_id"]
+    assert client.get(f"/admin/profiles/{profile_id}?format=pstats", headers=TOKEN).status_code == 400
+    assert client.delete("/admin/profiling/sampler", headers=TOKEN).status_code == 409
+
+def test_sampler_interval_is_validated_and_clamped(client):
+    for interval in ("0", "-1", "abc", "nan", "inf"):
+        response = client.post(f"/admin/profiling/sampler?interval={interval}", headers=TOKEN)
+        assert response.status_code == 400
+    response = client.post("/admin/profiling/sampler?interval=0.0000001", headers=TOKEN)
+    assert response.status_code == 200 and response.get_json()["interval"] == 0.001
+    assert StackSampler(interval_seconds=0).interval_seconds == 0.001
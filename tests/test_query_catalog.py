@@ -0,0 +1,62 @@
+import threading
+import pytest
+import database
+from database import (
+    init_database, add_sample_data, insert_book, get_book_by_id, get_books_by_ids, get_patron_borrow_counts,
+    insert_borrow_record, get_open_borrow_records, QUERIES
+)
+from datetime import datetime, timedelta
+from services.query_tracer import QueryTracer
+
+@pytest.fixture(autouse=True)
+def sample_data():
+    add_sample_data()
+
+def test_reads_reuse_the_pooled_connection():
+    assert get_book_by_id(1) is not None
+    conn = database._pool.conns[None]
+    assert get_book_by_id(2) is not None
+    assert database._pool.conns[None] is conn
+
+def test_pool_reopens_when_database_changes(tmp_path, monkeypatch):
+    get_book_by_id(1)
+    conn = database._pool.conns[None]
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "other.db"))
+    init_database()
+    get_book_by_id(1)
+    assert database._pool.conns[None] is not conn
+
+def test_pool_is_per_thread():
+    get_book_by_id(1)
+    conns = []
+    worker = threading.Thread(target=lambda: (get_book_by_id(1), conns.append(database._pool.conns[None])))
+    worker.start()
+    worker.join()
+    assert conns[0] is not database._pool.conns[None]
+
+def test_reads_see_committed_writes():
+    assert get_book_by_id(4) is None
+    assert insert_book("Fresh Book", "Author", "1000000000099", 1, 1)
+    assert get_book_by_id(4)["title"] == "Fresh Book"
+
+def test_batch_lookups_run_one_statement():
+    ids = list(range(1, 2000))
+    with QueryTracer() as tracer:
+        books = get_books_by_ids(ids)
+        counts = get_patron_borrow_counts(["123456"] + [f"{i:06d}" for i in range(1500)])
+    assert len(tracer) == 2
+    assert [book["id"] for book in books] == [book["id"] for book in database.get_all_books()]
+    assert counts["123456"] == 1 and counts["000000"] == 0
+
+def test_open_records_for_many_patrons():
+    now = datetime.now()
+    insert_borrow_record("222222", 1, now, now + timedelta(days=14))
+    records = get_open_borrow_records(["222222", "123456", "222222"])
+    assert sorted(record["patron_id"] for record in records) == ["123456", "222222"]
+
+def test_request_helpers_use_catalog_sql():
+    with QueryTracer() as tracer:
+        get_book_by_id(1)
+        get_books_by_ids([1, 2])
+    assert [record.sql for record in tracer.records] == [QUERIES["book_by_id"], QUERIES["books_by_ids"]]
+    assert database.STATEMENT_CACHE_SIZE >= len(QUERIES)
@@ -0,0 +1,80 @@
+import sqlite3
+import pytest
+import database
+from app import create_app
+from database import insert_book, get_book_by_id, get_db_connection
+from services import query_tracer
+from services.query_tracer import QueryTracer, normalize_sql, TracedConnection
+
+@pytest.fixture(autouse=True)
+def query_logs():
+    yield
+    query_tracer.slow_query_log.clear()
+    query_tracer.repeated_query_log.clear()
+
+def test_normalize_sql():
+    assert normalize_sql("SELECT *\n  FROM books WHERE id IN (?, ?,?) AND title = 'x' LIMIT 5") == \
+        "SELECT * FROM books WHERE id IN (...) AND title = ? LIMIT ?"
+
+def test_untraced_connections_are_plain():
+    conn = get_db_connection()
+    assert type(conn) is sqlite3.Connection
+    conn.close()
+
+def test_records_statements_and_rows():
+    with QueryTracer() as tracer:
+        insert_book("Traced Book", "Author", "1000000000001", 3, 3)
+        assert get_book_by_id(1)["title"] == "Traced Book"
+        assert get_book_by_id(2) is None
+    select = [r for r in tracer.records if r.shape == "SELECT * FROM books WHERE id = ?"]
+    assert [r.rows for r in select] == [1, 0]
+    assert select[0].params == "1 params"
+    insert = next(r for r in tracer.records if r.shape.startswith("INSERT INTO books"))
+    assert insert.rows == 1
+    assert all(r.duration_ms >= 0 for r in tracer.records)
+
+def test_repeated_statement_shapes_are_flagged():
+    with QueryTracer() as tracer:
+        for book_id in range(12):
+            get_book_by_id(book_id)
+    assert tracer.repeated() == {"SELECT * FROM books WHERE id = ?": 12}
+    assert tracer.repeated(threshold=20) == {}
+
+def test_slow_query_log_captures_plan(monkeypatch):
+    monkeypatch.setattr(query_tracer, "SLOW_QUERY_MS", 0.0)
+    conn = get_db_connection()
+    assert isinstance(conn, TracedConnection)
+    conn.close()
+    get_book_by_id(1)
+    entry = next(e for e in query_tracer.slow_query_log if e["sql"] == "SELECT * FROM books WHERE id = ?")
+    assert any("INTEGER PRIMARY KEY" in step for step in entry["plan"])
+
+def test_endpoint_query_budgets():
+    client = create_app().test_client()
+    with QueryTracer() as tracer:
+        assert client.get("/catalog", buffered=True).status_code == 200
+    assert len(tracer) <= 2
+    with QueryTracer() as tracer:
+        assert client.get("/api/search?q=gatsby").status_code == 200
+    assert len(tracer) <= 1
+    assert not tracer.repeated(threshold=1)
+
+def test_request_tracing_logs_repeats():
+    client = create_app({"SQL_TRACE_REQUESTS": True, "SQL_REPEAT_THRESHOLD": 0}).test_client()
+    response = client.get("/api/search?q=gatsby")
+    assert int(response.headers["X-Query-Count"]) >= 1
+    assert query_tracer.repeated_query_log[-1]["request"] == "GET /api/search?q=gatsby"
+
+def test_streamed_page_is_traced_until_closed():
+    for i in range(5):
+        insert_book(f"Book {i}", "Author", f"100000000000{i}", 1, 1)
+    client = create_app({"SQL_TRACE_REQUESTS": True, "SQL_REPEAT_THRESHOLD": 0}).test_client()
+    response = client.get("/catalog")
+    assert "X-Query-Count" not in response.headers
+    assert not query_tracer.repeated_query_log
+    response.get_data()
+    response.close()
+    entry = query_tracer.repeated_query_log[-1]
+    assert entry["request"] == "GET /catalog"
+    # iter_all_books runs its first page query once the body is being sent
+    assert normalize_sql(database.QUERIES["books_first_page"]) in entry["statements"]
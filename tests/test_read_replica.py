@@ -0,0 +1,69 @@
+import pytest
+import database
+from datetime import datetime, timedelta
+from app import create_app
+from database import (
+    insert_book, insert_borrow_record, refresh_replica, get_replica_lag,
+    get_overdue_borrow_records, get_patron_borrow_history
+)
+from services.search_index import reset_search_index
+from services.isbn_index import reset_isbn_index
+from services.suggest_index import reset_suggest_index
+
+@pytest.fixture(autouse=True)
+def replica(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "REPLICA_DATABASE", str(tmp_path / "replica.db"))
+    monkeypatch.setattr(database, "REPLICA_MAX_STALENESS", 60.0)
+    monkeypatch.setattr(database, "_replica_synced_at", None)
+    insert_book("Replica Book", "Author", "1000000000001", 5, 5)
+
+def borrow_overdue(patron_id):
+    now = datetime.now()
+    insert_borrow_record(patron_id, 1, now - timedelta(days=20), now - timedelta(days=6))
+
+def test_reports_use_primary_until_first_snapshot():
+    borrow_overdue("123456")
+    assert get_replica_lag() is None
+    assert len(get_patron_borrow_history("123456")) == 1
+
+def test_reports_read_snapshot_within_staleness_bound():
+    borrow_overdue("123456")
+    assert refresh_replica(pages_per_step=1)
+    borrow_overdue("654321")
+
+    assert 0 <= get_replica_lag() < 60
+    assert [r["patron_id"] for r in get_overdue_borrow_records(datetime.now())] == ["123456"]
+    assert get_patron_borrow_history("654321") == []
+
+    assert refresh_replica()
+    assert len(get_overdue_borrow_records(datetime.now())) == 2
+
+def test_stale_replica_falls_back_to_primary(monkeypatch):
+    assert refresh_replica()
+    borrow_overdue("123456")
+    monkeypatch.setattr(database, "_replica_synced_at", database._replica_synced_at - 120)
+    assert len(get_patron_borrow_history("123456")) == 1
+
+def test_replica_is_read_only():
+    assert refresh_replica()
+    conn = database.get_report_connection()
+    with pytest.raises(Exception):
+        conn.execute("DELETE FROM books")
+    conn.close()
+
+def test_app_starts_refresher_and_reports_lag(tmp_path):
+    app = create_app({"REPLICA_DATABASE": str(tmp_path / "replica.db"), "REPLICA_REFRESH_INTERVAL": 60})
+    refresher = app.extensions["replica_refresher"]
+    try:
+        lag = None
+        for _ in range(100):
+            lag = app.test_client().get("/api/metrics").get_json()["replica_lag_seconds"]
+            if lag is not None:
+                break
+            refresher._stop.wait(0.05)
+        assert lag is not None and lag < 60
+    finally:
+        refresher.stop()
+        reset_search_index()
+        reset_isbn_index()
+        reset_suggest_index()
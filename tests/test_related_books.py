@@ -0,0 +1,127 @@
+import random
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+import pytest
+from app import create_app
+from database import insert_book, insert_borrow_record, get_patron_baskets
+from services import related_books
+from services.library_service import get_related_books
+from services.related_books import (
+    RelatedBooksIndex, build_related_books, related_book_counts
+)
+
+@pytest.fixture(autouse=True)
+def books():
+    for i in range(1, 7):
+        insert_book(f"Book {i}", "Author", f"100000000000{i}", 10, 10)
+
+@pytest.fixture(params=[True, False], ids=["numpy", "arrays"])
+def use_numpy(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(related_books, "np", None)
+    elif related_books.np is None:
+        pytest.skip("NumPy is not installed")
+
+def loan(patron_id, book_id):
+    now = datetime.now()
+    assert insert_borrow_record(patron_id, book_id, now, now + timedelta(days=14))
+
+def sample_history():
+    for patron_id, book_ids in (("100001", [1, 2, 3]), ("100002", [1, 2]), ("100003", [1, 4]),
+                                ("100004", [2, 3, 5]), ("100005", [1, 2, 2])):
+        for book_id in book_ids:
+            loan(patron_id, book_id)
+
+def baskets(patrons):
+    offsets, books = array("q", [0]), array("q")
+    for basket in patrons.values():
+        books.extend(basket)
+        offsets.append(len(books))
+    return list(patrons), offsets, books
+
+def brute_force(patrons, book_id, k):
+    counts = Counter(other for basket in patrons.values() if book_id in basket for other in basket if other != book_id)
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+def test_index_counts_co_borrowers(use_numpy):
+    index = RelatedBooksIndex(k=2)
+    index.build(*baskets({"a": [1, 2, 3], "b": [2, 1], "c": [1, 4], "d": [3, 2, 5]}))
+    assert index.related(1, 10) == [(2, 2), (3, 1)]
+    assert index.related(2, 10) == [(1, 2), (3, 2)]
+    assert index.related(5, 1) == [(2, 1)]
+    assert index.related(6, 10) == [] and index.related(0, 10) == []
+    assert len(index) == 4 and index.nbytes() > 0
+
+def test_index_matches_brute_force_across_blocks(use_numpy, monkeypatch):
+    monkeypatch.setattr(related_books, "BUILD_BLOCK_ENTRIES", 50)
+    rng = random.Random(49)
+    patrons = {str(p): rng.sample(range(1, 60), rng.randint(1, 8)) for p in range(300)}
+    index = RelatedBooksIndex(k=5)
+    index.build(*baskets(patrons))
+    for book_id in range(70):
+        assert index.related(book_id, 5) == brute_force(patrons, book_id, 5)
+
+def test_new_loans_update_the_rows_they_touch(use_numpy):
+    patrons = {"a": [1, 2], "b": [2, 3]}
+    index = RelatedBooksIndex(k=5)
+    index.build(*baskets(patrons))
+    index.add_loan("a", 3)
+    index.add_loan("a", 2)  # already counted
+    index.add_loan("c", 7)  # new patron, new book
+    index.add_loan("c", 1)
+    patrons["a"].append(3)
+    patrons["c"] = [7, 1]
+    for book_id in range(1, 8):
+        assert index.related(book_id, 5) == brute_force(patrons, book_id, 5)
+
+def test_new_loans_on_full_rows_until_the_next_build(use_numpy):
+    patrons = {"a": [1, 2], "b": [1, 2], "c": [1, 3]}
+    index = RelatedBooksIndex(k=1)
+    index.build(*baskets(patrons))
+    assert index.related(1, 5) == [(2, 2)]
+    for patron in ("d", "e", "f"):
+        index.add_loan(patron, 1)
+        index.add_loan(patron, 3)
+        patrons[patron] = [1, 3]
+    assert index.related(3, 5) == [(1, 4)]
+    assert index.related(1, 5) == [(3, 3)]  # book 3 was cut from the row: only its new loans count
+    index.build(*baskets(patrons))
+    assert index.related(1, 5) == [(3, 4)]
+
+def test_patron_baskets_are_distinct_newest_first_and_capped():
+    sample_history()
+    patron_ids, offsets, books = get_patron_baskets(2)
+    assert patron_ids == ["100001", "100002", "100003", "100004", "100005"]
+    assert [books[offsets[i]:offsets[i + 1]].tolist() for i in range(5)] == [[3, 2], [2, 1], [4, 1], [5, 3], [2, 1]]
+
+def test_related_books_from_the_loan_history():
+    sample_history()
+    scanned = get_related_books(1)
+    build_related_books()
+    assert related_book_counts(1) == [(2, 3), (3, 1), (4, 1)]
+    books = get_related_books(1, 2)
+    assert [(book["title"], book["patrons"]) for book in books] == [("Book 2", 3), ("Book 3", 1)]
+    assert get_related_books(1) == scanned  # the scan without the index agrees
+    assert get_related_books(99) is None
+
+def test_related_books_follow_new_loans():
+    sample_history()
+    build_related_books()
+    loan("100003", 6)
+    loan("100004", 6)
+    assert related_book_counts(6) == [(1, 1), (2, 1), (3, 1), (4, 1), (5, 1)]
+    assert related_book_counts(1)[-1] == (6, 1)
+
+def test_related_api():
+    app = create_app()
+    app.extensions["related_books_refresher"].stop()
+    assert app.extensions["related_books_refresher"].interval_seconds == related_books.RELATED_BOOKS_REFRESH_INTERVAL
+    client = app.test_client()
+    sample_history()
+    build_related_books()
+    data = client.get("/api/books/2/related?limit=1").get_json()
+    assert data["book_id"] == 2 and data["count"] == 1
+    assert data["related"][0]["title"] == "Book 1" and data["related"][0]["patrons"] == 3
+    assert client.get("/api/books/999/related").status_code == 404
+    assert b"Also borrowed" in client.get("/catalog").data
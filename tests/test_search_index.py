@@ -0,0 +1,46 @@
+import pytest
+from database import insert_book
+from services.library_service import search_books_in_catalog
+from services.search_index import TrigramIndex, build_search_index
+
+@pytest.fixture(autouse=True)
+def indexed_books():
+    insert_book("To Kill a Mockingbird", "Harper Lee", "9780061120084", 2, 2)
+    insert_book("The Great Gatsby", "F. Scott Fitzgerald", "9780743273565", 3, 3)
+    build_search_index()
+
+def test_index_mid_word_substring():
+    index = TrigramIndex()
+    index.add(1, "To Kill a Mockingbird")
+    index.add(2, "The Great Gatsby")
+    assert index.search("ockingb") == [1]
+    assert index.search("OCKINGB") == [1]
+    assert index.search("zzz") == []
+
+def test_index_rejects_scattered_trigrams():
+    index = TrigramIndex()
+    index.add(1, "abcd xbcy")
+    # "abc" and "bcy" both occur, but never as one contiguous "abcy"
+    assert index.search("bcy") == [1]
+    assert index.search("abcy") == []
+
+def test_index_short_term():
+    index = TrigramIndex()
+    index.add(1, "1984")
+    index.add(2, "Dune")
+    assert index.search("un") == [2]
+
+def test_search_uses_index():
+    results = search_books_in_catalog("ockingb", "title")
+    assert [b["title"] for b in results] == ["To Kill a Mockingbird"]
+    assert results[0]["available_copies"] == 2
+
+def test_search_author_index():
+    results = search_books_in_catalog("fitz", "author")
+    assert len(results) == 1
+    assert results[0]["isbn"] == "9780743273565"
+
+def test_insert_updates_index():
+    insert_book("Mockingjay", "Suzanne Collins", "9780439023511", 1, 1)
+    titles = [b["title"] for b in search_books_in_catalog("mocking", "title")]
+    assert titles == ["Mockingjay", "To Kill a Mockingbird"]
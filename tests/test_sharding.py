@@ -0,0 +1,164 @@
+import sqlite3
+import time
+import zlib
+import pytest
+import database
+from datetime import datetime, timedelta
+from app import create_app
+from database import (
+    init_database, insert_book, insert_borrow_record, patron_shard, shard_for_patron,
+    get_patron_borrowed_books, get_patron_borrow_counts, get_patron_account, get_open_borrow_records,
+    get_overdue_borrow_records, get_patron_borrow_history, get_borrow_counts, get_loan_columns, get_book_by_id,
+    get_events_since, subscribe_events, unsubscribe_events, apply_circulation_events, rebuild_circulation_rollups,
+    repair_patron_accounts, SHARD_ID_BLOCK
+)
+from services.library_service import (
+    borrow_book_by_patron, return_book_by_patron, borrow_books_batch, return_books_batch
+)
+from services.shard_rebalancer import rebalance_shards
+
+SHARDS = 4
+
+# One patron per shard, so every test touches all four
+PATRONS = []
+for number in range(100000, 101000):
+    if patron_shard(str(number), SHARDS) == len(PATRONS):
+        PATRONS.append(str(number))
+    if len(PATRONS) == SHARDS:
+        break
+
+@pytest.fixture
+def shards(tmp_path, monkeypatch):
+    paths = [str(tmp_path / f"loans-{i}.db") for i in range(SHARDS)]
+    monkeypatch.setattr(database, "SHARD_DATABASES", paths)
+    init_database()
+    insert_book("Sharded Book", "Author", "1000000000001", 10, 10)
+    insert_book("Other Book", "Author", "1000000000002", 10, 10)
+    return paths
+
+def shard_rows(path, sql):
+    conn = sqlite3.connect(path)
+    rows = conn.execute(sql).fetchall()
+    conn.close()
+    return rows
+
+def test_patron_shard_is_a_stable_hash():
+    assert patron_shard("123456", 8) == zlib.crc32(b"123456") % 8
+    assert shard_for_patron("123456") is None
+    assert [patron_shard(p, SHARDS) for p in PATRONS] == list(range(SHARDS))
+
+def test_loans_are_written_to_the_patrons_shard(shards):
+    for patron_id in PATRONS:
+        assert borrow_book_by_patron(patron_id, 1)[0]
+
+    for shard, path in enumerate(shards):
+        rows = shard_rows(path, "SELECT id, patron_id FROM borrow_records")
+        assert [patron_id for _, patron_id in rows] == [PATRONS[shard]]
+        assert rows[0][0] > (shard + 1) * SHARD_ID_BLOCK
+        assert shard_rows(path, "SELECT open_loan_count FROM patrons") == [(1,)]
+        assert "books" not in {name for name, in shard_rows(path, "SELECT name FROM sqlite_master")}
+    assert shard_rows(database.DATABASE, "SELECT COUNT(*) FROM borrow_records") == [(0,)]
+    assert get_book_by_id(1)["available_copies"] == 10 - SHARDS
+
+    assert [book["title"] for book in get_patron_borrowed_books(PATRONS[2])] == ["Sharded Book"]
+    assert get_patron_borrow_counts(PATRONS + ["999999"]) == {**{p: 1 for p in PATRONS}, "999999": 0}
+    assert get_patron_account(PATRONS[3])["open_loan_count"] == 1
+
+    assert return_book_by_patron(PATRONS[1], 1)[0]
+    assert get_patron_account(PATRONS[1])["open_loan_count"] == 0
+    assert [loan["return_date"] is not None for loan in get_patron_borrow_history(PATRONS[1])] == [True]
+
+def test_cross_shard_reads_merge_every_shard(shards):
+    now = datetime.now()
+    for days, patron_id in zip((3, 9, 1, 5), PATRONS):
+        insert_borrow_record(patron_id, 1, now - timedelta(days=20), now - timedelta(days=days))
+    insert_borrow_record(PATRONS[0], 2, now, now + timedelta(days=14))
+
+    overdue = get_overdue_borrow_records(now)
+    assert [loan["patron_id"] for loan in overdue] == [PATRONS[1], PATRONS[3], PATRONS[0], PATRONS[2]]
+    assert overdue[0]["title"] == "Sharded Book"
+    assert get_borrow_counts() == {1: 4, 2: 1}
+    assert len(get_open_borrow_records(PATRONS)) == 5
+    assert [len(column) for column in get_loan_columns()] == [5, 5, 5, 5]
+    assert repair_patron_accounts() == SHARDS
+
+def test_batches_commit_on_every_shard(shards):
+    borrowed = borrow_books_batch([(patron_id, 2) for patron_id in PATRONS])
+    assert all(result["success"] for result in borrowed)
+    assert get_book_by_id(2)["available_copies"] == 10 - SHARDS
+
+    returned = return_books_batch([(patron_id, 2) for patron_id in reversed(PATRONS)])
+    assert all(result["success"] for result in returned)
+    assert get_book_by_id(2)["available_copies"] == 10
+    for path in shards:
+        assert shard_rows(path, "SELECT COUNT(*) FROM borrow_records WHERE return_date IS NULL") == [(0,)]
+
+def test_shard_events_reach_the_global_feed(shards):
+    received = []
+    subscribe_events(received.append, ["loan.created"])
+    try:
+        for patron_id in PATRONS:
+            borrow_book_by_patron(patron_id, 1)
+        # Published when relayed into the feed, not when committed on the shard
+        assert received == []
+        feed = [event for event in get_events_since(0, 1000) if event["type"] == "loan.created"]
+    finally:
+        unsubscribe_events(received.append)
+
+    assert [event["id"] for event in received] == [event["id"] for event in feed]
+    assert [event["payload"]["patron_id"] for event in feed] == PATRONS
+    for path in shards:
+        assert shard_rows(path, "SELECT COUNT(*) FROM events") == [(0,)]
+
+    return_book_by_patron(PATRONS[0], 1)
+    assert apply_circulation_events() == SHARDS + 1
+    incremental = shard_rows(database.DATABASE, "SELECT * FROM daily_book_stats ORDER BY day, book_id")
+    assert rebuild_circulation_rollups() >= 1
+    assert shard_rows(database.DATABASE, "SELECT * FROM daily_book_stats ORDER BY day, book_id") == incremental
+
+def test_rebalance_moves_loans_onto_new_shards(tmp_path, monkeypatch):
+    init_database()
+    insert_book("Sharded Book", "Author", "1000000000001", 10, 10)
+    now = datetime.now()
+    for patron_id in PATRONS:
+        insert_borrow_record(patron_id, 1, now - timedelta(days=30), now - timedelta(days=16))
+        return_book_by_patron(patron_id, 1)
+        insert_borrow_record(patron_id, 1, now, now + timedelta(days=14))
+    history = {p: get_patron_borrow_history(p) for p in PATRONS}
+    accounts = {p: get_patron_account(p) for p in PATRONS}
+
+    targets = [str(tmp_path / f"new-{i}.db") for i in range(SHARDS)]
+    assert rebalance_shards(targets) == {path: 2 for path in targets}
+    with pytest.raises(ValueError):
+        rebalance_shards(targets)
+
+    monkeypatch.setattr(database, "SHARD_DATABASES", targets)
+    init_database()
+    assert {p: get_patron_borrow_history(p) for p in PATRONS} == history
+    assert {p: get_patron_account(p) for p in PATRONS} == accounts
+    assert insert_borrow_record(PATRONS[0], 1, now, now + timedelta(days=14))
+    ids = [row[0] for row in shard_rows(targets[0], "SELECT id FROM borrow_records ORDER BY id")]
+    assert ids[-1] > SHARD_ID_BLOCK > ids[0]
+
+def test_app_config_enables_sharding(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "SHARD_DATABASES", None)
+    paths = [str(tmp_path / "a.db"), str(tmp_path / "b.db")]
+    app = create_app({"SHARD_DATABASES": paths, "SHARD_RELAY_INTERVAL": 0.01})
+    relay = app.extensions["shard_event_relay"]
+    try:
+        assert database.SHARD_DATABASES == paths
+        assert app.test_client().get("/catalog").status_code == 200
+        assert shard_rows(paths[shard_for_patron("123456")], "SELECT patron_id FROM borrow_records") == [("123456",)]
+        insert_borrow_record("123456", 1, datetime.now(), datetime.now() + timedelta(days=14))
+        deadline = time.monotonic() + 5
+        while relay.relayed < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert relay.relayed >= 1
+    finally:
+        relay.stop()
+
+def test_archive_database_cannot_be_combined_with_shards(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "SHARD_DATABASES", [str(tmp_path / "a.db")])
+    monkeypatch.setattr(database, "ARCHIVE_DATABASE", str(tmp_path / "archive.db"))
+    with pytest.raises(ValueError):
+        init_database()
@@ -0,0 +1,44 @@
+import pytest
+from app import create_app
+from database import insert_book, iter_all_books, get_db_connection
+
+@pytest.fixture
+def client(tmp_path):
+    return create_app({"TEMPLATE_BYTECODE_CACHE_DIR": str(tmp_path)}).test_client()
+
+def test_iter_all_books_pages_in_title_order():
+    for i, title in enumerate(["Delta", "Alpha", "Alpha", "Charlie", "Alpha", "Bravo"]):
+        insert_book(title, "Author", f"100000000000{i}", 1, 1)
+    books = list(iter_all_books(page_size=2))
+    assert [(book["title"], book["id"]) for book in books] == \
+        [("Alpha", 2), ("Alpha", 3), ("Alpha", 5), ("Bravo", 6), ("Charlie", 4), ("Delta", 1)]
+    assert list(iter_all_books(page_size=6)) == books
+
+def test_catalog_is_streamed(client):
+    response = client.get("/catalog")
+    assert response.is_streamed
+    page = response.get_data(as_text=True)
+    assert page.index("1984") < page.index("The Great Gatsby") < page.index("To Kill a Mockingbird")
+    assert page.rstrip().endswith("</html>")
+
+def test_empty_catalog_message(client):
+    conn = get_db_connection()
+    conn.execute("DELETE FROM books")
+    conn.commit()
+    conn.close()
+    assert "No books in catalog" in client.get("/catalog").get_data(as_text=True)
+
+def test_flashed_message_shown_once(client):
+    response = client.post("/add_book", data={"title": "Flash Book", "author": "Author",
+                                              "isbn": "1000000000077", "total_copies": "1"}, follow_redirects=True)
+    assert "successfully added" in response.get_data(as_text=True)
+    assert "successfully added" not in client.get("/catalog").get_data(as_text=True)
+
+def test_search_page_is_streamed(client):
+    response = client.get("/search?q=gatsby")
+    assert response.is_streamed
+    assert "The Great Gatsby" in response.get_data(as_text=True)
+
+def test_bytecode_cache_written(client, tmp_path):
+    client.get("/catalog")
+    assert list(tmp_path.glob("__jinja2_*.cache"))
@@ -0,0 +1,49 @@
+import pytest
+import database
+from app import create_app
+from database import insert_book, get_book_by_isbn
+from services.library_service import suggest_books
+from services.search_index import reset_search_index
+from services.isbn_index import reset_isbn_index
+from services.suggest_index import SuggestIndex, reset_suggest_index
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "library.db"))
+    app = create_app()
+    yield app.test_client()
+    reset_search_index()
+    reset_isbn_index()
+    reset_suggest_index()
+
+def test_index_word_prefix_ranked_by_popularity():
+    index = SuggestIndex()
+    index.load([(1, "The Great Gatsby"), (2, "Great Expectations"), (3, "Dune")])
+    assert index.top("gre", 10, {}) == [1, 2]
+    assert index.top("gre", 10, {2: 5, 1: 1}) == [2, 1]
+    assert index.top("GREAT exp", 10, {}) == [2]
+    assert index.top("x", 10, {}) == []
+
+def test_index_limit_and_incremental_add():
+    index = SuggestIndex()
+    index.load([(1, "Dune"), (2, "Dune Messiah")])
+    assert index.top("d", 1, {2: 3}) == [2]
+    index.add(3, "Dune Children")
+    assert index.top("dune c", 10, {}) == [3]
+
+def test_suggest_api(client):
+    response = client.get("/api/suggest?q=mock&type=title")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [s["title"] for s in data["suggestions"]] == ["To Kill a Mockingbird"]
+
+def test_suggest_api_validation(client):
+    assert client.get("/api/suggest?type=title").status_code == 400
+    assert client.get("/api/suggest?q=abc&type=isbn").status_code == 400
+
+def test_suggest_tracks_new_books(client):
+    insert_book("Orwell Essays", "George Orwell", "9780141187235", 1, 1)
+    authors = [s["id"] for s in suggest_books("orw", "author")]
+    assert len(authors) == 2
+    # the sample data has 1984 on loan, so it outranks the new book
+    assert authors[0] == get_book_by_isbn("9780451524935")["id"]
@@ -0,0 +1,110 @@
+import threading
+import pytest
+from app import create_app
+from database import insert_book, get_book_by_id, get_patron_borrow_count
+from services.library_service import (
+    borrow_book_by_patron, return_book_by_patron, borrow_books_batch, return_books_batch
+)
+from services.write_coalescer import (
+    WriteCoalescer, install_write_coalescer, uninstall_write_coalescer, current_write_coalescer
+)
+from services.search_index import reset_search_index
+from services.isbn_index import reset_isbn_index
+from services.suggest_index import reset_suggest_index
+
+@pytest.fixture(autouse=True)
+def books():
+    insert_book("Scarce Book", "Author", "1000000000001", 5, 5)
+    insert_book("Common Book", "Author", "1000000000002", 50, 50)
+    yield
+    uninstall_write_coalescer()
+
+@pytest.fixture
+def coalescer():
+    writer = WriteCoalescer({"borrow": borrow_books_batch, "return": return_books_batch},
+                            max_batch_size=16, max_delay_seconds=0.02)
+    install_write_coalescer(writer)
+    return writer
+
+def run_concurrently(calls):
+    results = [None] * len(calls)
+    def worker(i, call):
+        results[i] = call()
+    threads = [threading.Thread(target=worker, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_borrows_respect_availability(coalescer):
+    results = run_concurrently([lambda i=i: borrow_book_by_patron(f"{100000 + i}", 1) for i in range(20)])
+    assert sum(success for success, _ in results) == 5
+    assert get_book_by_id(1)["available_copies"] == 0
+    assert coalescer.mutations == 20
+    assert coalescer.batches < 20
+
+def test_concurrent_borrows_respect_patron_limit(coalescer):
+    results = run_concurrently([lambda: borrow_book_by_patron("123456", 2)] * 8)
+    assert sum(success for success, _ in results) == 5
+    assert get_patron_borrow_count("123456") == 5
+    assert get_book_by_id(2)["available_copies"] == 45
+
+def test_mixed_batch_applies_in_submission_order(coalescer):
+    futures = [coalescer.submit("borrow", ("123456", 1)), coalescer.submit("return", ("123456", 1)),
+               coalescer.submit("return", ("123456", 1))]
+    results = [future.result() for future in futures]
+    assert [result["success"] for result in results] == [True, True, False]
+    assert get_book_by_id(1)["available_copies"] == 5
+
+def test_return_through_coalescer(coalescer):
+    assert borrow_book_by_patron("123456", 2)[0]
+    success, message = return_book_by_patron("123456", 2)
+    assert success and "returned" in message
+    assert return_book_by_patron("123456", 2) == (False, "Not borrowed")
+
+def test_direct_and_coalesced_writes_agree(request):
+    def attempts():
+        return [borrow_book_by_patron("123456", 99), return_book_by_patron("123456", 99),
+                return_book_by_patron("123456", 1), borrow_book_by_patron("12345x", 1),
+                *[borrow_book_by_patron("123456", 2) for _ in range(6)],
+                *[return_book_by_patron("123456", 2) for _ in range(6)]]
+    direct = attempts()
+    request.getfixturevalue("coalescer")
+    coalesced = attempts()
+    assert [message for _, message in direct] == [message for _, message in coalesced]
+    assert direct[:4] == [(False, "Book not located."), (False, "Book DNE"), (False, "Not borrowed"),
+                          (False, "Invalid ID")]
+    assert direct[9] == (False, "You have reached the maximum borrowing limit of 5 books.")
+
+def test_handler_errors_reach_every_caller():
+    def broken(items):
+        raise ValueError("disk full")
+    writer = WriteCoalescer({"borrow": broken})
+    writer.start()
+    futures = writer.submit_many("borrow", [("123456", 1), ("654321", 1)])
+    writer.stop()
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result()
+
+def test_stop_applies_queue_then_rejects(coalescer):
+    futures = coalescer.submit_many("borrow", [(f"{200000 + i}", 2) for i in range(10)])
+    uninstall_write_coalescer()
+    assert all(future.result()["success"] for future in futures)
+    with pytest.raises(RuntimeError):
+        coalescer.submit("borrow", ("123456", 2))
+    assert current_write_coalescer() is None
+    assert borrow_book_by_patron("123456", 2)[0]
+    assert get_book_by_id(2)["available_copies"] == 39
+
+def test_app_config_installs_coalescer():
+    app = create_app({"WRITE_COALESCING": True, "WRITE_BATCH_MAX_SIZE": 8})
+    assert current_write_coalescer() is app.extensions["write_coalescer"]
+    response = app.test_client().post("/api/borrows/batch", json={"items": [
+        {"patron_id": "123456", "book_id": 1}, {"patron_id": "654321", "book_id": 99}]})
+    assert response.get_json()["succeeded"] == 1
+    assert app.extensions["write_coalescer"].mutations == 2
+    reset_search_index()
+    reset_isbn_index()
+    reset_suggest_index()